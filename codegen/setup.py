@@ -7,5 +7,6 @@ setuptools.setup(
     version=os.environ.get("BUILD_VERSION", "0.0.0.dev-1"),
     package_dir={"": "src"},
     packages=setuptools.find_packages("src"),
+    package_data={"nimbus_codegen": ["CloudFormationResourceSpecification.json*"]},
     provides=setuptools.find_packages("src"),
 )
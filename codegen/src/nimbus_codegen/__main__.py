@@ -1,11 +1,62 @@
-import sys
+import argparse
+import os
+from typing import List, Optional
 
-from .codegen import write_resources_package
+from .codegen import FORMATTER_BLACK, FORMATTER_NONE, write_resources_package
 from .spec import load
 
 
-def main():
-    write_resources_package(load(), sys.argv[1])
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="nimbus_codegen", description="Generate the nimbus_resources package.",
+    )
+    parser.add_argument("directory", help="where to write the package")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of processes generating modules (0 for one per CPU)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="regenerate every module, even if its inputs haven't changed",
+    )
+    parser.add_argument(
+        "--black",
+        action="store_true",
+        help="also run black on the modules, which are generated formatted "
+        "(cached in the user's cache directory)",
+    )
+    parser.add_argument(
+        "--include",
+        action="append",
+        metavar="GLOB",
+        help="only generate resource types matching GLOB, e.g. 'AWS::S3::*' "
+        "(repeatable; default all)",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        metavar="GLOB",
+        help="don't generate resource types matching GLOB (repeatable)",
+    )
+    args = parser.parse_args(argv)
+    workers = args.workers or os.cpu_count() or 1
+    spec = load()
+    if args.include or args.exclude:
+        try:
+            spec = spec.select(args.include or ["*"], args.exclude)
+        except ValueError as e:
+            parser.error(str(e))
+    write_resources_package(
+        spec,
+        args.directory,
+        formatter=FORMATTER_BLACK if args.black else FORMATTER_NONE,
+        workers=workers,
+        force=args.force,
+    )
 
 
 if __name__ == "__main__":
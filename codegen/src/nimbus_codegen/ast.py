@@ -1,9 +1,40 @@
-from typing import List, NamedTuple, Optional, Tuple, Union
+"""The subset of Python the generator emits. Nodes emit the same source
+black would format them to: expressions emit leaves, which statements lay
+out into lines that fit at their indentation and append to a `Writer`."""
+
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
 
 from typing_extensions import Protocol
 
+from .layout import (
+    ATOM,
+    COLON,
+    COMMA,
+    COMP_FOR,
+    COMP_OP,
+    DOT,
+    EQUAL,
+    LBRACE,
+    LINE_LENGTH,
+    LPAR,
+    LSQB,
+    NAME,
+    RARROW,
+    RBRACE,
+    RPAR,
+    RSQB,
+    STRING,
+    TEST,
+    TRAILER,
+    Leaf,
+    layout,
+)
+
 KEYWORDS = ("None",)
 
+INDENT = "    "
+
 
 class _Type(Protocol):
     """Workaround for mypy's lack of support for recursive types."""
@@ -11,6 +42,9 @@ class _Type(Protocol):
     def serialize_type(self) -> str:
         ...
 
+    def emit(self, leaves: List[Leaf]) -> None:
+        ...
+
     def modules(self) -> List[str]:
         ...
 
@@ -50,8 +84,21 @@ class Type(NamedTuple):
             return f"{self.module}.{base}"
         return base
 
-    def serialize_expr(self) -> str:
-        return self.serialize_type()
+    def emit(self, leaves: List[Leaf]) -> None:
+        if self.module is not None:
+            leaves.append(Leaf(NAME, self.module))
+            leaves.append(Leaf(DOT, "."))
+        if self.name:
+            leaves.append(Leaf(NAME, self.name))
+        if len(self.type_arguments) > 0:
+            # A nameless type is the list of argument types of a Callable.
+            parent = TRAILER if self.name else ATOM
+            leaves.append(Leaf(LSQB, "[", parent))
+            for i, arg in enumerate(self.type_arguments):
+                if i > 0:
+                    leaves.append(Leaf(COMMA, ","))
+                arg.emit(leaves)
+            leaves.append(Leaf(RSQB, "]", parent))
 
     def modules(self) -> List[str]:
         modules = [] if self.module is None else [self.module]
@@ -60,26 +107,79 @@ class Type(NamedTuple):
         return modules
 
 
+def _string(s: str, quote: str = '"') -> Leaf:
+    # black prefers double quotes
+    if '"' not in s:
+        quote = '"'
+    return Leaf(STRING, quote + s + quote)
+
+
+def _optional_parens(leaves: List[Leaf], expr: "Expr") -> None:
+    """Emit `expr` in the invisible parentheses black puts around the right
+    hand sides of (unannotated) assignments, return values and conditions,
+    which become visible if the line is split at them."""
+    leaves.append(Leaf(LPAR, "", ATOM))
+    _parsed(expr).emit(leaves)
+    leaves.append(Leaf(RPAR, "", ATOM))
+
+
+class Writer:
+    """Source code being written: lines are appended to one buffer, at the
+    current indentation, so writing takes time linear in the output."""
+
+    def __init__(self) -> None:
+        self.parts: List[str] = []
+        self.depth = 0
+        self._indents: Dict[int, str] = {0: ""}
+
+    @contextmanager
+    def indented(self) -> Iterator[None]:
+        self.depth += 1
+        self._indents.setdefault(self.depth, INDENT * self.depth)
+        try:
+            yield
+        finally:
+            self.depth -= 1
+
+    def line(self, text: str) -> None:
+        self.parts += (self._indents[self.depth], text, "\n")
+
+    def statement(self, leaves: List[Leaf]) -> None:
+        """Lay out a statement into lines that fit at the current
+        indentation."""
+        indent = self._indents[self.depth]
+        for text in layout(leaves, LINE_LENGTH - len(indent)):
+            self.parts += (indent, text, "\n")
+
+    def blank_line(self) -> None:
+        self.parts.append("\n")
+
+    def getvalue(self) -> str:
+        return "".join(self.parts)
+
+
 class TypeDef(Protocol):
-    def serialize_type_def(self) -> Tuple[str, List[str]]:
+    def imports(self) -> List[str]:
+        ...
+
+    def write_type_def(self, writer: Writer) -> None:
         ...
 
 
 class Stmt(Protocol):
-    def serialize_stmt(self) -> str:
+    def write_stmt(self, writer: Writer) -> None:
         ...
 
 
 class Block(NamedTuple):
     stmts: List[Stmt]
 
-    def serialize(self) -> str:
-        if len(self.stmts) < 1:
-            return "    pass"
-        output = ""
-        for stmt in self.stmts:
-            output += "\n    " + stmt.serialize_stmt().replace("\n", "\n    ")
-        return output
+    def write(self, writer: Writer) -> None:
+        with writer.indented():
+            if len(self.stmts) < 1:
+                writer.line("pass")
+            for stmt in self.stmts:
+                stmt.write_stmt(writer)
 
 
 class Method(NamedTuple):
@@ -105,19 +205,26 @@ class Method(NamedTuple):
             decorators=[] if decorators is None else decorators,
         )
 
-    def serialize_method(self) -> str:
-        formatted_arguments = ", ".join(
-            ["self"]
-            + [
-                f"{arg_name}: {arg_type.serialize_type()}"
-                for arg_name, arg_type in self.arguments
-            ]
-        )
-        output = ""
+    def write_method(self, writer: Writer) -> None:
         for decorator in self.decorators:
-            output += f"@{decorator}\n"
-        output += f"def {self.name}({formatted_arguments}) -> {self.return_type.serialize_type()}:"
-        return output + self.body.serialize()
+            writer.line(f"@{decorator}")
+        leaves = [
+            Leaf(NAME, "def"),
+            Leaf(NAME, self.name),
+            Leaf(LPAR, "(", "parameters"),
+            Leaf(NAME, "self"),
+        ]
+        for arg_name, arg_type in self.arguments:
+            leaves.append(Leaf(COMMA, ","))
+            leaves.append(Leaf(NAME, arg_name))
+            leaves.append(Leaf(COLON, ":"))
+            arg_type.emit(leaves)
+        leaves.append(Leaf(RPAR, ")", "parameters"))
+        leaves.append(Leaf(RARROW, "->"))
+        self.return_type.emit(leaves)
+        leaves.append(Leaf(COLON, ":"))
+        writer.statement(leaves)
+        self.body.write(writer)
 
     def modules(self) -> List[str]:
         # TODO: this doesn't account for modules depended upon by the body
@@ -135,25 +242,59 @@ class ClassDef(NamedTuple):
     optional_properties: List[Tuple[str, Type]]
     methods: List[Method]
 
-    def serialize_type_def(self) -> Tuple[str, List[str]]:
+    def imports(self) -> List[str]:
         imports = ["typing"]
-        output = f"class {self.name}(typing.NamedTuple):"
-        for property_name, property_type in self.required_properties:
-            property_name = (
-                property_name if property_name not in KEYWORDS else f"{property_name}_"
-            )
-            output += f"\n    {property_name}: '{property_type.serialize_type()}'"
+        for _, property_type in self.required_properties:
             imports.extend(property_type.modules())
-        for property_name, property_type in self.optional_properties:
-            property_name = (
-                property_name if property_name not in KEYWORDS else f"{property_name}_"
-            )
-            output += f"\n    {property_name}: typing.Optional['{property_type.serialize_type()}'] = None"
+        for _, property_type in self.optional_properties:
             imports.extend(property_type.modules())
         for method in self.methods:
-            output += "\n    " + method.serialize_method().replace("\n", "\n    ")
             imports.extend(method.modules())
-        return output, imports
+        return imports
+
+    def write_type_def(self, writer: Writer) -> None:
+        writer.statement(
+            [
+                Leaf(NAME, "class"),
+                Leaf(NAME, self.name),
+                Leaf(LPAR, "(", "classdef"),
+                Leaf(NAME, "typing"),
+                Leaf(DOT, "."),
+                Leaf(NAME, "NamedTuple"),
+                Leaf(RPAR, ")", "classdef"),
+                Leaf(COLON, ":"),
+            ]
+        )
+        with writer.indented():
+            for property_name, property_type in self.required_properties:
+                property_name = (
+                    property_name
+                    if property_name not in KEYWORDS
+                    else f"{property_name}_"
+                )
+                leaves = [Leaf(NAME, property_name), Leaf(COLON, ":")]
+                StringLiteral(property_type.serialize_type()).emit(leaves)
+                writer.statement(leaves)
+            for property_name, property_type in self.optional_properties:
+                property_name = (
+                    property_name
+                    if property_name not in KEYWORDS
+                    else f"{property_name}_"
+                )
+                # black doesn't put annotated assignments in parentheses.
+                leaves = [Leaf(NAME, property_name), Leaf(COLON, ":")]
+                DictKeyAccess(
+                    Attr(Variable("typing"), "Optional"),
+                    StringLiteral(property_type.serialize_type()),
+                ).emit(leaves)
+                leaves.append(Leaf(EQUAL, "="))
+                NoneLiteral.emit(leaves)
+                writer.statement(leaves)
+            for i, method in enumerate(self.methods):
+                # black separates methods from each other and from the fields
+                if i > 0 or self.required_properties or self.optional_properties:
+                    writer.blank_line()
+                method.write_method(writer)
 
 
 class NewTypeDef(NamedTuple):
@@ -161,70 +302,106 @@ class NewTypeDef(NamedTuple):
     parent_type: Type
     module: Optional[str] = None
 
-    def serialize_type_def(self) -> Tuple[str, List[str]]:
-        return (
-            f"{self.name} = typing.NewType('"
-            f"{self.name}', {self.parent_type.serialize_type()})",
-            ["typing"]
-            if self.parent_type.module is None
-            else ["typing", self.parent_type.module],
+    def imports(self) -> List[str]:
+        if self.parent_type.module is None:
+            return ["typing"]
+        return ["typing", self.parent_type.module]
+
+    def write_type_def(self, writer: Writer) -> None:
+        leaves = [Leaf(NAME, self.name), Leaf(EQUAL, "=")]
+        _optional_parens(
+            leaves,
+            CallExpr(
+                Attr(Variable("typing"), "NewType"),
+                [StringLiteral(self.name), self.parent_type],
+            ),
         )
+        writer.statement(leaves)
 
 
 class Expr(Protocol):
-    def serialize_expr(self) -> str:
+    def emit(self, leaves: List[Leaf]) -> None:
         ...
 
 
+def _parsed(expr: Expr) -> Expr:
+    """`expr` as Python parses its source, which has no parentheses: a
+    conditional expression swallows calls and comparisons of its `else`
+    value, and the conditional expressions that follow it."""
+    if isinstance(expr, CallExpr):
+        fn = _parsed(expr.fn)
+        if isinstance(fn, IfExpr):
+            return fn._replace(false_value=_parsed(CallExpr(fn.false_value, expr.args)))
+    elif isinstance(expr, IsNotExpr):
+        left = _parsed(expr.left)
+        if isinstance(left, IfExpr):
+            return left._replace(
+                false_value=_parsed(IsNotExpr(left.false_value, expr.right))
+            )
+    elif isinstance(expr, IfExpr):
+        true_value = _parsed(expr.true_value)
+        if isinstance(true_value, IfExpr):
+            return true_value._replace(
+                false_value=_parsed(expr._replace(true_value=true_value.false_value))
+            )
+    return expr
+
+
 class CallExpr(NamedTuple):
     fn: Expr
     args: List[Expr]
 
-    def serialize_expr(self) -> str:
-        return "{}({})".format(
-            self.fn.serialize_expr(),
-            ", ".join([arg.serialize_expr() for arg in self.args]),
-        )
+    def emit(self, leaves: List[Leaf]) -> None:
+        self.fn.emit(leaves)
+        leaves.append(Leaf(LPAR, "(", TRAILER))
+        for i, arg in enumerate(self.args):
+            if i > 0:
+                leaves.append(Leaf(COMMA, ","))
+            _parsed(arg).emit(leaves)
+        leaves.append(Leaf(RPAR, ")", TRAILER))
 
 
 class ReturnStmt(NamedTuple):
     value: Expr
 
-    def serialize_stmt(self) -> str:
-        return f"return {self.value.serialize_expr()}"
+    def write_stmt(self, writer: Writer) -> None:
+        leaves = [Leaf(NAME, "return")]
+        _optional_parens(leaves, self.value)
+        writer.statement(leaves)
 
 
 class DictLiteral(NamedTuple):
     entries: List[Tuple[Expr, Expr]]
 
-    def serialize_expr(self) -> str:
-        return (
-            "{"
-            + ", ".join(
-                [
-                    f"{keyexpr.serialize_expr()}: {valexpr.serialize_expr()}"
-                    for keyexpr, valexpr in self.entries
-                ]
-            )
-            + "}"
-        )
+    def emit(self, leaves: List[Leaf]) -> None:
+        leaves.append(Leaf(LBRACE, "{", ATOM))
+        for i, (keyexpr, valexpr) in enumerate(self.entries):
+            if i > 0:
+                leaves.append(Leaf(COMMA, ","))
+            _parsed(keyexpr).emit(leaves)
+            leaves.append(Leaf(COLON, ":"))
+            _parsed(valexpr).emit(leaves)
+        leaves.append(Leaf(RBRACE, "}", ATOM))
 
 
 class Attr(NamedTuple):
     parent: Expr
     label: str
 
-    def serialize_expr(self) -> str:
-        return f"{self.parent.serialize_expr()}.{self.label}"
+    def emit(self, leaves: List[Leaf]) -> None:
+        self.parent.emit(leaves)
+        leaves.append(Leaf(DOT, "."))
+        leaves.append(Leaf(NAME, self.label))
 
 
 class Variable(NamedTuple):
     label: Union[str, Attr]
 
-    def serialize_expr(self) -> str:
+    def emit(self, leaves: List[Leaf]) -> None:
         if isinstance(self.label, str):
-            return self.label
-        return self.label.serialize_expr()
+            leaves.append(Leaf(NAME, self.label))
+        else:
+            self.label.emit(leaves)
 
 
 class DeclareAssignStmt(NamedTuple):
@@ -232,32 +409,43 @@ class DeclareAssignStmt(NamedTuple):
     type_: Type
     value: Expr
 
-    def serialize_stmt(self) -> str:
-        return f"{self.label}: {self.type_.serialize_type()} = {self.value.serialize_expr()}"
+    def write_stmt(self, writer: Writer) -> None:
+        leaves = [Leaf(NAME, self.label), Leaf(COLON, ":")]
+        self.type_.emit(leaves)
+        leaves.append(Leaf(EQUAL, "="))
+        _parsed(self.value).emit(leaves)
+        writer.statement(leaves)
 
 
 class StringLiteral(NamedTuple):
     s: str
     quote: str = '"'
 
-    def serialize_expr(self) -> str:
-        return self.quote + self.s + self.quote
+    def emit(self, leaves: List[Leaf]) -> None:
+        leaves.append(_string(self.s, self.quote))
 
 
 class DictKeyAccess(NamedTuple):
     dict_: Expr
     key: Expr
 
-    def serialize_expr(self) -> str:
-        return f"{self.dict_.serialize_expr()}[{self.key.serialize_expr()}]"
+    def emit(self, leaves: List[Leaf]) -> None:
+        self.dict_.emit(leaves)
+        leaves.append(Leaf(LSQB, "[", TRAILER))
+        _parsed(self.key).emit(leaves)
+        leaves.append(Leaf(RSQB, "]", TRAILER))
 
 
 class AssignStmt(NamedTuple):
     left: Union[Variable, DictKeyAccess]
     right: Expr
 
-    def serialize_stmt(self) -> str:
-        return f"{self.left.serialize_expr()} = {self.right.serialize_expr()}"
+    def write_stmt(self, writer: Writer) -> None:
+        leaves: List[Leaf] = []
+        self.left.emit(leaves)
+        leaves.append(Leaf(EQUAL, "="))
+        _optional_parens(leaves, self.right)
+        writer.statement(leaves)
 
 
 class IfExpr(NamedTuple):
@@ -265,23 +453,30 @@ class IfExpr(NamedTuple):
     condition: Expr
     false_value: Expr
 
-    def serialize_expr(self) -> str:
-        return f"{self.true_value.serialize_expr()} if {self.condition.serialize_expr()} else {self.false_value.serialize_expr()}"
+    def emit(self, leaves: List[Leaf]) -> None:
+        _parsed(self.true_value).emit(leaves)
+        leaves.append(Leaf(NAME, "if", TEST))
+        _parsed(self.condition).emit(leaves)
+        leaves.append(Leaf(NAME, "else", TEST))
+        _parsed(self.false_value).emit(leaves)
 
 
 class IsNotExpr(NamedTuple):
     left: Expr
     right: Expr
 
-    def serialize_expr(self) -> str:
-        return f"{self.left.serialize_expr()} is not {self.right.serialize_expr()}"
+    def emit(self, leaves: List[Leaf]) -> None:
+        _parsed(self.left).emit(leaves)
+        leaves.append(Leaf(NAME, "is", COMP_OP))
+        leaves.append(Leaf(NAME, "not", COMP_OP))
+        _parsed(self.right).emit(leaves)
 
 
 class KeywordLiteral(NamedTuple):
     keyword: str
 
-    def serialize_expr(self) -> str:
-        return self.keyword
+    def emit(self, leaves: List[Leaf]) -> None:
+        leaves.append(Leaf(NAME, self.keyword))
 
 
 NoneLiteral = KeywordLiteral("None")
@@ -293,8 +488,12 @@ class IfStmt(NamedTuple):
     condition: Expr
     body: Block
 
-    def serialize_stmt(self) -> str:
-        return f"if {self.condition.serialize_expr()}:" + self.body.serialize()
+    def write_stmt(self, writer: Writer) -> None:
+        leaves = [Leaf(NAME, "if")]
+        _optional_parens(leaves, self.condition)
+        leaves.append(Leaf(COLON, ":"))
+        writer.statement(leaves)
+        self.body.write(writer)
 
 
 class ElifStmt(NamedTuple):
@@ -302,22 +501,30 @@ class ElifStmt(NamedTuple):
     elif_condition: Expr
     elif_body: Block
 
-    def serialize_stmt(self) -> str:
-        return (
-            f"{self.if_stmt.serialize_stmt()}\n"
-            + f"elif {self.elif_condition.serialize_expr()}:"
-            + self.elif_body.serialize().replace("\n", "\n    ")
-        )
+    def write_stmt(self, writer: Writer) -> None:
+        self.if_stmt.write_stmt(writer)
+        leaves = [Leaf(NAME, "elif")]
+        _optional_parens(leaves, self.elif_condition)
+        leaves.append(Leaf(COLON, ":"))
+        writer.statement(leaves)
+        self.elif_body.write(writer)
 
 
 class ElseStmt(NamedTuple):
     previous: Union[IfStmt, ElifStmt]
     else_body: Block
 
-    def serialize_stmt(self) -> str:
-        return f"{self.previous.serialize_stmt()}\nelse:" + self.else_body.serialize().replace(
-            "\n", "\n    "
-        )
+    def write_stmt(self, writer: Writer) -> None:
+        self.previous.write_stmt(writer)
+        writer.line("else:")
+        self.else_body.write(writer)
+
+
+def _emit_comprehension(leaves: List[Leaf], forexpr: Expr, inexpr: Expr) -> None:
+    leaves.append(Leaf(NAME, "for", COMP_FOR))
+    forexpr.emit(leaves)
+    leaves.append(Leaf(NAME, "in", COMP_FOR))
+    _parsed(inexpr).emit(leaves)
 
 
 class ListComprehension(NamedTuple):
@@ -325,15 +532,21 @@ class ListComprehension(NamedTuple):
     forexpr: Expr
     inexpr: Expr
 
-    def serialize_expr(self) -> str:
-        return f"[{self.expr.serialize_expr()} for {self.forexpr.serialize_expr()} in {self.inexpr.serialize_expr()}]"
+    def emit(self, leaves: List[Leaf]) -> None:
+        leaves.append(Leaf(LSQB, "[", ATOM))
+        _parsed(self.expr).emit(leaves)
+        _emit_comprehension(leaves, self.forexpr, self.inexpr)
+        leaves.append(Leaf(RSQB, "]", ATOM))
 
 
 class MultiExpr(NamedTuple):
     exprs: List[Expr]
 
-    def serialize_expr(self) -> str:
-        return ", ".join([expr.serialize_expr() for expr in self.exprs])
+    def emit(self, leaves: List[Leaf]) -> None:
+        for i, expr in enumerate(self.exprs):
+            if i > 0:
+                leaves.append(Leaf(COMMA, ","))
+            expr.emit(leaves)
 
 
 class DictComprehension(NamedTuple):
@@ -342,5 +555,10 @@ class DictComprehension(NamedTuple):
     forexpr: Expr
     inexpr: Expr
 
-    def serialize_expr(self) -> str:
-        return f"{{{self.keyexpr.serialize_expr()}: {self.valexpr.serialize_expr()} for {self.forexpr.serialize_expr()} in {self.inexpr.serialize_expr()}}}"
+    def emit(self, leaves: List[Leaf]) -> None:
+        leaves.append(Leaf(LBRACE, "{", ATOM))
+        _parsed(self.keyexpr).emit(leaves)
+        leaves.append(Leaf(COLON, ":"))
+        _parsed(self.valexpr).emit(leaves)
+        _emit_comprehension(leaves, self.forexpr, self.inexpr)
+        leaves.append(Leaf(RBRACE, "}", ATOM))
@@ -1,87 +1,325 @@
+import functools
+import hashlib
+import json
 import os
-from typing import Callable, List, Set
-
-import black
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import nimbus_codegen.ast as py
-from .spec import Specification
+from .spec import NonPrimitivePropertyType, Specification, cache_directory
 from .typedef import resource_namespace
 
 Formatter = Callable[[str], str]
 
 
 def FORMATTER_NONE(s: str) -> str:
+    """The generated source as is, which is already formatted the way black
+    formats it."""
     return s
 
 
+@functools.lru_cache(maxsize=None)
+def _black_mode() -> Any:
+    import black
+
+    return black.FileMode(target_versions={black.TargetVersion.PY36})
+
+
 def FORMATTER_BLACK(s: str) -> str:
-    return black.format_str(
-        s, mode=black.FileMode(target_versions={black.TargetVersion.PY36})
-    )
+    """Format with black, which is only needed to check the generated source
+    against it (or to format it the way a different black version would)."""
+    import black
+
+    return black.format_str(s, mode=_black_mode())
+
+
+# Name of the file recording what each generated module was generated from.
+MANIFEST = "nimbus-codegen-manifest.json"
+MANIFEST_FORMAT = 1
+
+
+@functools.lru_cache(maxsize=None)
+def codegen_version() -> str:
+    """A digest of the code generator's own source, which changes whenever
+    the generated code might."""
+    digest = hashlib.sha256()
+    directory = os.path.dirname(__file__)
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".py"):
+            with open(os.path.join(directory, name), "rb") as f:
+                digest.update(name.encode())
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def formatter_version(formatter: Formatter) -> str:
+    if formatter is FORMATTER_BLACK:
+        import black
+
+        return f"black {black.__version__} {_black_mode()!r}"
+    return f"{formatter.__module__}.{formatter.__qualname__}"
+
+
+def _formatted_path(key: str) -> str:
+    return os.path.join(cache_directory(), "formatted", f"{key}.py")
+
+
+def _store_formatted(key: str, text: str) -> None:
+    path = _formatted_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(text)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+    except OSError:
+        pass
+
+
+def format_source(formatter: Formatter, source: str, cache: bool = True) -> str:
+    """`formatter(source)`, read from the user's cache directory if `source`
+    was formatted the same way before. Only black's output is cached, as
+    other formatters have no version to tell their outputs apart."""
+    if not cache or formatter is not FORMATTER_BLACK:
+        return formatter(source)
+    key = hashlib.sha256(
+        f"{formatter_version(formatter)}\0{source}".encode()
+    ).hexdigest()
+    try:
+        with open(_formatted_path(key)) as f:
+            return f.read()
+    except OSError:
+        pass
+    text = formatter(source)
+    _store_formatted(key, text)
+    return text
 
 
 def render_module(module: str, typedefs: List[py.TypeDef]) -> str:
-    typedef_output = ""
-    import_output = f"from . import {module}"
+    writer = py.Writer()
+    writer.line(f"from . import {module}")
     imports = {module}
     for typedef in typedefs:
-        typedefstr, typedefimports = typedef.serialize_type_def()
-        typedef_output += f"\n\n{typedefstr}"
-        for import_ in typedefimports:
+        for import_ in typedef.imports():
             if import_ not in imports:
-                import_output += f"\nimport {import_}"
+                writer.line(f"import {import_}")
             imports.add(import_)
-    return f"{import_output}{typedef_output}"
+    previous: Optional[py.TypeDef] = None
+    for typedef in typedefs:
+        # black puts two blank lines around classes and keeps one between
+        # other top level statements.
+        writer.blank_line()
+        if isinstance(typedef, py.ClassDef) or isinstance(previous, py.ClassDef):
+            writer.blank_line()
+        typedef.write_type_def(writer)
+        previous = typedef
+    return writer.getvalue()
+
+
+def _module(resource_type: str) -> str:
+    idx = resource_type.rfind("::")
+    if idx < 0:
+        idx = 0
+    else:
+        idx += len("::")
+    return resource_type[idx:].lower()
+
+
+def _filepath(directory: str, resource_type: str) -> str:
+    rt = resource_type
+    if rt.startswith("AWS::"):
+        rt = rt[len("AWS::") :]
+    return os.path.join(
+        directory, "src", "nimbus_resources", f"{rt.lower().replace('::', '/')}.py"
+    )
+
+
+def _inputs_digest(
+    spec: Specification, formatter: Formatter, resource_type: str
+) -> str:
+    """A digest of everything the module of `resource_type` is generated
+    from."""
+    tag = NonPrimitivePropertyType("Tag")
+    inputs = (
+        codegen_version(),
+        formatter_version(formatter),
+        resource_type,
+        spec.ResourceTypes[resource_type],
+        list(spec.namespace(resource_type).items()),
+        spec.PropertyTypes[tag],
+    )
+    return hashlib.sha256(repr(inputs).encode()).hexdigest()
+
+
+def _write_if_changed(path: str, text: str) -> None:
+    """Write `text` to `path` unless it's already there, leaving the file's
+    mtime (and the caches keyed by it) alone."""
+    try:
+        with open(path) as f:
+            if f.read() == text:
+                return
+    except OSError:
+        pass
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def _read_manifest(directory: str) -> Dict[str, str]:
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(manifest, dict) or manifest.get("format") != MANIFEST_FORMAT:
+        return {}
+    return manifest.get("modules", {})
+
+
+def _write_manifest(directory: str, modules: Dict[str, str]) -> None:
+    path = os.path.join(directory, MANIFEST)
+    with open(f"{path}.{os.getpid()}.tmp", "w") as f:
+        json.dump(
+            {"format": MANIFEST_FORMAT, "modules": modules},
+            f,
+            indent=1,
+            sort_keys=True,
+        )
+    os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+
+def _remove_empty_packages(root: str, directory: str) -> None:
+    """Remove `directory` and its parents below `root` while only an
+    `__init__.py` (and its bytecode) is left in them, e.g. the package of a
+    service none of whose resource types are generated anymore."""
+    while os.path.relpath(directory, root) != ".":
+        try:
+            entries = set(os.listdir(directory))
+        except FileNotFoundError:
+            return
+        if entries - {"__init__.py", "__pycache__"}:
+            return
+        shutil.rmtree(directory, ignore_errors=True)
+        directory = os.path.dirname(directory)
+
+
+def _write_resource_module(
+    spec: Specification,
+    directory: str,
+    formatter: Formatter,
+    cache: bool,
+    resource_type: str,
+) -> None:
+    module = _module(resource_type)
+    source = render_module(module, resource_namespace(module, spec, resource_type))
+    _write_if_changed(
+        _filepath(directory, resource_type), format_source(formatter, source, cache)
+    )
+
+
+# The specification, formatter and formatter cache switch of a worker
+# process, sent once when the worker starts rather than with every resource
+# type.
+_worker_state: Optional[Tuple[Specification, Formatter, bool]] = None
+
+
+def _init_worker(spec: Specification, formatter: Formatter, cache: bool) -> None:
+    global _worker_state
+    _worker_state = (spec, formatter, cache)
+
+
+def _write_resource_modules(directory: str, resource_types: List[str]) -> None:
+    assert _worker_state is not None
+    spec, formatter, cache = _worker_state
+    for resource_type in resource_types:
+        _write_resource_module(spec, directory, formatter, cache, resource_type)
 
 
 def write_resources_package(
-    spec: Specification, directory: str, formatter: Formatter = FORMATTER_NONE
+    spec: Specification,
+    directory: str,
+    formatter: Formatter = FORMATTER_NONE,
+    workers: int = 1,
+    force: bool = False,
+    cache: bool = True,
 ) -> None:
-    known_packages: Set[str] = set()
+    """Generate the nimbus_resources package for `spec` in `directory`.
+
+    The digest of every module's inputs is recorded in a manifest in
+    `directory`, and later runs only regenerate modules whose inputs changed
+    (all of them with `force`). Files whose content doesn't change aren't
+    rewritten, and modules of resource types that are no longer in `spec`
+    (see `Specification.select()`) are removed, along with the packages
+    they leave empty.
+
+    Formatted modules are cached by `format_source()` unless `cache` is
+    false. With `workers` > 1 the resource modules are rendered, formatted
+    (cache misses included) and written by that many processes;
+    `formatter` must then be picklable (a module-level function). Every
+    module only depends on its own resource type, so the output doesn't
+    depend on scheduling.
+    """
+    # Make the Python packages (not to be confused with a Pypi package,
+    # which is what this whole function creates) up front, so workers never
+    # race to create them.
+    for parent_directory in sorted(
+        {os.path.dirname(_filepath(directory, rt)) for rt in spec.ResourceTypes}
+    ):
+        os.makedirs(parent_directory, exist_ok=True)
+        _write_if_changed(os.path.join(parent_directory, "__init__.py"), "")
+
+    previous = {} if force else _read_manifest(directory)
+    modules: Dict[str, str] = {}
+    resource_types = []
     for resource_type in spec.ResourceTypes:
-        # Compute module name
-        idx = resource_type.rfind("::")
-        if idx < 0:
-            idx = 0
-        else:
-            idx += len("::")
-        module = resource_type[idx:].lower()
-
-        # Compute file path
-        rt = resource_type
-        if rt.startswith("AWS::"):
-            rt = rt[len("AWS::") :]
-        filepath = os.path.join(
-            directory, "src", "nimbus_resources", f"{rt.lower().replace('::', '/')}.py"
+        filepath = _filepath(directory, resource_type)
+        path = os.path.relpath(filepath, directory)
+        modules[path] = _inputs_digest(spec, formatter, resource_type)
+        if previous.get(path) != modules[path] or not os.path.exists(filepath):
+            resource_types.append(resource_type)
+    for path in sorted(previous.keys() - modules.keys()):
+        try:
+            os.remove(os.path.join(directory, path))
+        except FileNotFoundError:
+            pass
+        _remove_empty_packages(
+            os.path.join(directory, "src", "nimbus_resources"),
+            os.path.dirname(os.path.join(directory, path)),
         )
 
-        # Make it a Python package (not to be confused with a Pypi package,
-        # which is what this whole function creates)
-        parent_directory = os.path.dirname(filepath)
-        if parent_directory not in known_packages:
-            os.makedirs(parent_directory, exist_ok=True)
-            with open(os.path.join(parent_directory, "__init__.py"), "w") as f:
-                f.write("")
-            known_packages.add(parent_directory)
-
-        # Render the file
-        with open(filepath, "w") as f:
-            f.write(
-                formatter(
-                    render_module(
-                        module, resource_namespace(module, spec, resource_type)
-                    )
-                )
-            )
-
-    with open(
-        os.path.join(directory, "src", "nimbus_resources", "__init__.py"), "w"
-    ) as f:
-        f.write("")
-
-    with open(os.path.join(directory, "setup.py"), "w") as f:
-        f.write(
-            """import os
+    if workers <= 1 or not resource_types:
+        for resource_type in resource_types:
+            _write_resource_module(spec, directory, formatter, cache, resource_type)
+    else:
+        # A few chunks per worker balances uneven module sizes without
+        # paying for a round trip per module.
+        chunk_size = max(1, len(resource_types) // (workers * 4))
+        chunks = [
+            resource_types[i : i + chunk_size]
+            for i in range(0, len(resource_types), chunk_size)
+        ]
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(spec, formatter, cache),
+        ) as executor:
+            for _ in executor.map(
+                _write_resource_modules, [directory] * len(chunks), chunks
+            ):
+                pass
+
+    _write_if_changed(
+        os.path.join(directory, "src", "nimbus_resources", "__init__.py"), ""
+    )
+
+    _write_if_changed(
+        os.path.join(directory, "setup.py"),
+        """import os
 
 import setuptools
 
@@ -91,5 +329,9 @@ setuptools.setup(
     package_dir={"": "src"},
     packages=setuptools.find_packages("src"),
     provides=setuptools.find_packages("src"),
-)"""
-        )
+)
+""",
+    )
+
+    # Written last, so an interrupted run regenerates whatever it touched.
+    _write_manifest(directory, modules)
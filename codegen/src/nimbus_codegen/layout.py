@@ -0,0 +1,520 @@
+"""Layout of logical lines of generated code into physical lines the way
+black 19.10b0 (the version pinned in 3rdParty/BUILD) does it, so formatted
+modules can be emitted without running black.
+
+Statements are given as sequences of leaves (tokens) carrying what black
+would know about them from the parse tree: the kind of node they belong to
+and where black inserts invisible parentheses.
+The splitting follows black's `split_line()` (right hand splits with omitted
+trailers and optional parentheses, delimiter splits and left hand splits of
+function definitions) for the subset of Python the generator produces: no
+comments, multiline strings, trailing commas in the input, unpacking or
+operators other than comparisons.
+"""
+
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+LINE_LENGTH = 88
+
+# Leaf kinds
+NAME = "NAME"
+STRING = "STRING"
+OP = "OP"
+DOT = "."
+COMMA = ","
+COLON = ":"
+EQUAL = "="
+RARROW = "->"
+LPAR = "("
+RPAR = ")"
+LSQB = "["
+RSQB = "]"
+LBRACE = "{"
+RBRACE = "}"
+
+# Parents (node types in black's grammar) that affect splitting
+ATOM = "atom"
+TRAILER = "trailer"
+TEST = "test"
+COMP_FOR = "comp_for"
+COMP_OP = "comp_op"
+
+_OPENING = {LPAR: RPAR, LSQB: RSQB, LBRACE: RBRACE}
+_CLOSING = {RPAR, RSQB, RBRACE}
+_BRACKETS = set(_OPENING) | _CLOSING
+
+COMPREHENSION_PRIORITY = 20
+COMMA_PRIORITY = 18
+TERNARY_PRIORITY = 16
+COMPARATOR_PRIORITY = 10
+DOT_PRIORITY = 1
+
+
+class Leaf:
+    __slots__ = (
+        "kind",
+        "value",
+        "prefix",
+        "parent",
+        "opening_bracket",
+        "bracket_depth",
+    )
+
+    def __init__(self, kind: str, value: str, parent: Optional[str] = None) -> None:
+        # `kind` is NAME, STRING or the operator itself; invisible parentheses
+        # are LPAR and RPAR leaves with an empty value.
+        self.kind = kind
+        self.value = value
+        self.prefix = ""
+        self.parent = parent
+        self.opening_bracket: Optional[Leaf] = None
+        self.bracket_depth = 0
+
+    def __str__(self) -> str:
+        return self.prefix + self.value
+
+
+def _whitespace(leaf: Leaf, previous: Leaf) -> str:
+    """The whitespace black puts between `previous` and `leaf`."""
+    if leaf.kind in (COMMA, COLON, DOT) or leaf.kind in _CLOSING:
+        return ""
+    if previous.kind in _OPENING or previous.kind == DOT:
+        return ""
+    if leaf.kind in _OPENING and leaf.parent != ATOM:
+        # calls, subscripts, parameters and base classes
+        return ""
+    return " "
+
+
+def _split_before_priority(leaf: Leaf, previous: Optional[Leaf]) -> int:
+    if leaf.kind == DOT and (previous is None or previous.kind in _CLOSING):
+        return DOT_PRIORITY
+    if leaf.kind != NAME:
+        return 0
+    if leaf.value == "for" and leaf.parent == COMP_FOR:
+        return COMPREHENSION_PRIORITY
+    if leaf.value in ("if", "else") and leaf.parent == TEST:
+        return TERNARY_PRIORITY
+    if leaf.value == "is":
+        return COMPARATOR_PRIORITY
+    if (
+        leaf.value == "not"
+        and leaf.parent == COMP_OP
+        and not (previous is not None and previous.value == "is")
+    ):
+        return COMPARATOR_PRIORITY
+    return 0
+
+
+def _split_after_priority(leaf: Leaf) -> int:
+    return COMMA_PRIORITY if leaf.kind == COMMA else 0
+
+
+class _BracketTracker:
+    def __init__(self) -> None:
+        self.depth = 0
+        self.bracket_match: Dict[Tuple[int, str], Leaf] = {}
+        self.delimiters: Dict[int, int] = {}
+        self.previous: Optional[Leaf] = None
+        self.for_loop_depths: List[int] = []
+
+    def mark(self, leaf: Leaf) -> None:
+        if (
+            self.for_loop_depths
+            and self.for_loop_depths[-1] == self.depth
+            and leaf.kind == NAME
+            and leaf.value == "in"
+        ):
+            self.depth -= 1
+            self.for_loop_depths.pop()
+        if leaf.kind in _CLOSING:
+            self.depth -= 1
+            leaf.opening_bracket = self.bracket_match.pop((self.depth, leaf.kind))
+        leaf.bracket_depth = self.depth
+        if self.depth == 0:
+            priority = _split_before_priority(leaf, self.previous)
+            if priority and self.previous is not None:
+                self.delimiters[id(self.previous)] = priority
+            else:
+                priority = _split_after_priority(leaf)
+                if priority:
+                    self.delimiters[id(leaf)] = priority
+        if leaf.kind in _OPENING:
+            self.bracket_match[self.depth, _OPENING[leaf.kind]] = leaf
+            self.depth += 1
+        self.previous = leaf
+        if leaf.kind == NAME and leaf.value == "for":
+            self.depth += 1
+            self.for_loop_depths.append(self.depth)
+
+    def max_priority(self, exclude: Set[int] = frozenset()) -> int:
+        """The highest delimiter priority; raises ValueError without any."""
+        return max(v for k, v in self.delimiters.items() if k not in exclude)
+
+    def count(self, priority: int) -> int:
+        return sum(1 for p in self.delimiters.values() if p == priority)
+
+
+class Line:
+    def __init__(self, depth: int = 0, inside_brackets: bool = False) -> None:
+        self.depth = depth
+        self.leaves: List[Leaf] = []
+        self.inside_brackets = inside_brackets
+        self.should_explode = False
+        self.brackets = _BracketTracker()
+
+    def append(self, leaf: Leaf, preformatted: bool = False) -> None:
+        if self.leaves and not preformatted:
+            leaf.prefix = _whitespace(leaf, self.leaves[-1])
+        if self.inside_brackets or not preformatted:
+            self.brackets.mark(leaf)
+        self.leaves.append(leaf)
+
+    @property
+    def is_def(self) -> bool:
+        return bool(self.leaves) and self.leaves[0].value == "def"
+
+    def __str__(self) -> str:
+        if not self.leaves:
+            return ""
+        first = self.leaves[0]
+        return f"{first.prefix}{'    ' * self.depth}{first.value}" + "".join(
+            str(leaf) for leaf in self.leaves[1:]
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.leaves)
+
+    def lengths(self, reverse: bool = False) -> Iterator[Tuple[int, Leaf, int]]:
+        indices = range(len(self.leaves))
+        for index in reversed(indices) if reverse else indices:
+            leaf = self.leaves[index]
+            yield index, leaf, len(leaf.prefix) + len(leaf.value)
+
+
+class CannotSplit(Exception):
+    pass
+
+
+def _fits(line: Line, line_length: int, line_str: str = "") -> bool:
+    return len(line_str or str(line)) <= line_length
+
+
+def _ensure_visible(leaf: Leaf) -> None:
+    if leaf.kind == LPAR:
+        leaf.value = "("
+    elif leaf.kind == RPAR:
+        leaf.value = ")"
+
+
+def _split_line(line: Line, line_length: int) -> List[Line]:
+    line_str = str(line)
+    if not line.should_explode and _fits(line, line_length, line_str):
+        return [line]
+    if line.is_def:
+        transforms = [_left_hand_split]
+    elif line.inside_brackets:
+        transforms = [_delimiter_split, _rhs]
+    else:
+        transforms = [_rhs]
+    for transform in transforms:
+        result: List[Line] = []
+        try:
+            for transformed in transform(line, line_length):
+                if str(transformed) == line_str:
+                    raise CannotSplit("unchanged result")
+                result.extend(_split_line(transformed, line_length))
+        except CannotSplit:
+            continue
+        return result
+    return [line]
+
+
+def _should_explode(line: Line, opening: Leaf) -> bool:
+    """Whether the body of a split should be split at its commas, one item
+    per line, even if it fits. Invisible parentheses count as brackets of
+    a collection here, as they do in black."""
+    if not (opening.parent == ATOM and opening.value in "[{("):
+        return False
+    exclude: Set[int] = set()
+    if line.leaves and line.leaves[-1].kind == COMMA:
+        exclude.add(id(line.leaves[-1]))
+    try:
+        return line.brackets.max_priority(exclude) == COMMA_PRIORITY
+    except ValueError:
+        return False
+
+
+def _build_line(
+    leaves: List[Leaf], original: Line, opening: Leaf, is_body: bool = False
+) -> Line:
+    result = Line(original.depth)
+    if is_body:
+        result.inside_brackets = True
+        result.depth += 1
+        if leaves:
+            leaves[0].prefix = ""
+            # A lone parameter of a def gets a trailing comma.
+            if (
+                original.is_def
+                and opening.value == "("
+                and not any(leaf.kind == COMMA for leaf in leaves)
+            ):
+                leaves.append(Leaf(COMMA, ","))
+    for leaf in leaves:
+        result.append(leaf, preformatted=True)
+    if is_body:
+        result.should_explode = _should_explode(result, opening)
+    return result
+
+
+def _split_succeeded_or_raise(head: Line, body: Line, tail: Line) -> None:
+    tail_len = len(str(tail).strip())
+    if not body:
+        if tail_len == 0:
+            raise CannotSplit("splitting brackets produced the same line")
+        if tail_len < 3:
+            raise CannotSplit("not worth it")
+
+
+def _left_hand_split(line: Line, line_length: int) -> Iterator[Line]:
+    head: List[Leaf] = []
+    body: List[Leaf] = []
+    tail: List[Leaf] = []
+    current = head
+    matching: Optional[Leaf] = None
+    for leaf in line.leaves:
+        if (
+            current is body
+            and leaf.kind in _CLOSING
+            and leaf.opening_bracket is matching
+        ):
+            current = tail if body else head
+        current.append(leaf)
+        if current is head and leaf.kind in _OPENING:
+            matching = leaf
+            current = body
+    if not matching:
+        raise CannotSplit("no brackets found")
+    lines = (
+        _build_line(head, line, matching),
+        _build_line(body, line, matching, is_body=True),
+        _build_line(tail, line, matching),
+    )
+    _split_succeeded_or_raise(*lines)
+    for result in lines:
+        if result:
+            yield result
+
+
+def _can_be_split(line: Line) -> bool:
+    leaves = line.leaves
+    if len(leaves) < 2:
+        return False
+    if leaves[0].kind == STRING and leaves[1].kind == DOT:
+        call_count = 0
+        dot_count = 0
+        following = leaves[-1]
+        for leaf in leaves[-2::-1]:
+            if leaf.kind in _OPENING:
+                if following.kind not in _CLOSING:
+                    return False
+                call_count += 1
+            elif leaf.kind == DOT:
+                dot_count += 1
+            elif leaf.kind == NAME:
+                if not (following.kind == DOT or following.kind in _OPENING):
+                    return False
+            elif leaf.kind not in _CLOSING:
+                return False
+            if dot_count > 1 and call_count > 1:
+                return False
+    return True
+
+
+def _can_omit_opening_paren(line: Line, first: Leaf, line_length: int) -> bool:
+    remainder = False
+    length = 4 * line.depth
+    for _, leaf, leaf_length in line.lengths():
+        if leaf.kind in _CLOSING and leaf.opening_bracket is first:
+            remainder = True
+        if remainder:
+            length += leaf_length
+            if length > line_length:
+                return False
+            if leaf.kind in _OPENING:
+                remainder = False
+    return True
+
+
+def _can_omit_closing_paren(line: Line, last: Leaf, line_length: int) -> bool:
+    length = 4 * line.depth
+    seen_other_brackets = False
+    for _, leaf, leaf_length in line.lengths():
+        length += leaf_length
+        if leaf is last.opening_bracket:
+            if seen_other_brackets or length <= line_length:
+                return True
+        elif leaf.kind in _OPENING:
+            seen_other_brackets = True
+    return False
+
+
+def _can_omit_invisible_parens(line: Line, line_length: int) -> bool:
+    brackets = line.brackets
+    if not brackets.delimiters:
+        return True
+    max_priority = brackets.max_priority()
+    if brackets.count(max_priority) > 1:
+        return False
+    if max_priority == DOT_PRIORITY:
+        return True
+    first, second = line.leaves[0], line.leaves[1]
+    if first.kind in _OPENING and second.kind not in _CLOSING:
+        if _can_omit_opening_paren(line, first, line_length):
+            return True
+    penultimate, last = line.leaves[-2], line.leaves[-1]
+    if (
+        last.kind == RPAR
+        or last.kind == RBRACE
+        or (last.kind == RSQB and last.parent != TRAILER)
+    ):
+        if penultimate.kind in _OPENING:
+            return False
+        if _can_omit_closing_paren(line, last, line_length):
+            return True
+    return False
+
+
+def _right_hand_split(
+    line: Line, line_length: int, omit: Set[int] = frozenset()
+) -> Iterator[Line]:
+    tail_leaves: List[Leaf] = []
+    body_leaves: List[Leaf] = []
+    head_leaves: List[Leaf] = []
+    current = tail_leaves
+    opening: Optional[Leaf] = None
+    closing: Optional[Leaf] = None
+    for leaf in reversed(line.leaves):
+        if current is body_leaves and leaf is opening:
+            current = head_leaves if body_leaves else tail_leaves
+        current.append(leaf)
+        if current is tail_leaves and leaf.kind in _CLOSING and id(leaf) not in omit:
+            opening = leaf.opening_bracket
+            closing = leaf
+            current = body_leaves
+    if not (opening and closing and head_leaves):
+        raise CannotSplit("no brackets found")
+    tail_leaves.reverse()
+    body_leaves.reverse()
+    head_leaves.reverse()
+    head = _build_line(head_leaves, line, opening)
+    body = _build_line(body_leaves, line, opening, is_body=True)
+    tail = _build_line(tail_leaves, line, opening)
+    _split_succeeded_or_raise(head, body, tail)
+    if (
+        not body.should_explode
+        and opening.kind == LPAR
+        and not opening.value
+        and closing.kind == RPAR
+        and not closing.value
+        and _can_omit_invisible_parens(body, line_length)
+    ):
+        try:
+            yield from _right_hand_split(line, line_length, {id(closing), *omit})
+            return
+        except CannotSplit as e:
+            if not (_can_be_split(body) or _fits(body, line_length)):
+                raise CannotSplit("body is still too long and can't be split") from e
+    _ensure_visible(opening)
+    _ensure_visible(closing)
+    for result in (head, body, tail):
+        if result:
+            yield result
+
+
+def _trailers_to_omit(line: Line, line_length: int) -> Iterator[Set[int]]:
+    omit: Set[int] = set()
+    yield omit
+    length = 4 * line.depth
+    opening: Optional[Leaf] = None
+    closing: Optional[Leaf] = None
+    inner_brackets: Set[int] = set()
+    for index, leaf, leaf_length in line.lengths(reverse=True):
+        length += leaf_length
+        if length > line_length:
+            break
+        if opening:
+            if leaf is opening:
+                opening = None
+            elif leaf.kind in _CLOSING:
+                inner_brackets.add(id(leaf))
+        elif leaf.kind in _CLOSING:
+            if index > 0 and line.leaves[index - 1].kind in _OPENING:
+                inner_brackets.add(id(leaf))
+                continue
+            if closing:
+                omit.add(id(closing))
+                omit.update(inner_brackets)
+                inner_brackets.clear()
+                yield omit
+            if leaf.value:
+                opening = leaf.opening_bracket
+                closing = leaf
+
+
+def _rhs(line: Line, line_length: int) -> Iterator[Line]:
+    for omit in _trailers_to_omit(line, line_length):
+        lines = list(_right_hand_split(line, line_length, omit))
+        if _fits(lines[0], line_length):
+            yield from lines
+            return
+    # As in black, the fallback split is done with a line length of 1.
+    yield from _right_hand_split(line, 1)
+
+
+def _delimiter_split(line: Line, line_length: int) -> Iterator[Line]:
+    if not line.leaves:
+        raise CannotSplit("line empty")
+    last_leaf = line.leaves[-1]
+    brackets = line.brackets
+    try:
+        priority = brackets.max_priority(exclude={id(last_leaf)})
+    except ValueError:
+        raise CannotSplit("no delimiters found") from None
+    if priority == DOT_PRIORITY and brackets.count(priority) == 1:
+        raise CannotSplit("splitting a single attribute from its owner looks wrong")
+
+    def new_line() -> Line:
+        return Line(line.depth, line.inside_brackets)
+
+    current = new_line()
+    for leaf in line.leaves:
+        current.append(leaf, preformatted=True)
+        if brackets.delimiters.get(id(leaf)) == priority:
+            current.leaves[0].prefix = ""
+            yield current
+            current = new_line()
+    if current:
+        if priority == COMMA_PRIORITY and current.leaves[-1].kind != COMMA:
+            current.append(Leaf(COMMA, ","))
+        current.leaves[0].prefix = ""
+        yield current
+
+
+def layout(leaves: List[Leaf], line_length: int = LINE_LENGTH) -> List[str]:
+    """Lay out a logical line (a statement, or the header of a compound
+    statement) into lines no longer than `line_length` where black would
+    manage that, without indentation."""
+    previous = None
+    for leaf in leaves:
+        leaf.prefix = "" if previous is None else _whitespace(leaf, previous)
+        previous = leaf
+    text = "".join(leaf.prefix + leaf.value for leaf in leaves)
+    if len(text) <= line_length:
+        # Most lines fit, and don't need their brackets tracked.
+        return [text]
+    line = Line()
+    for leaf in leaves:
+        line.append(leaf)
+    return [str(ln) for ln in _split_line(line, line_length)]
@@ -110,6 +110,14 @@ def _non_primitive_property_type_reference_expression(
             )
         return base_expr
 
+    _, property_type_definition = property_types[property_type]
+    if isinstance(property_type_definition, CompoundPropertyTypeDefinition):
+        # Call `reference()` on the value rather than on its class so
+        # intrinsic functions like `If` can stand in for the value.
+        return py.CallExpr(
+            fn=py.Attr(parent=property_variable, label="reference"),
+            args=[resource_logical_id_variable, parameter_logical_id_variable],
+        )
     return py.CallExpr(
         fn=type_expr(module, property_type, required),
         args=[
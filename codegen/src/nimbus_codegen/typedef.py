@@ -290,23 +290,18 @@ def resource_namespace(
 ) -> List[py.TypeDef]:
     # Build type definitions for all property types in the resource's namespace
     # as well as the type definition for the resource itself.
-    prefix = f"{resource_id}."
+    namespace = spec.namespace(resource_id)
     properties: Dict[
         NonPrimitivePropertyType, Tuple[Optional[py.Variable], PropertyTypeDefinition]
-    ] = {
-        NonPrimitivePropertyType(name[len(prefix) :]): (None, typedef)
-        for name, typedef in spec.PropertyTypes.items()
-        if name.startswith(prefix)
-    }
+    ] = {name: (None, typedef) for name, typedef in namespace.items()}
     properties[NonPrimitivePropertyType("Tag")] = (
         py.Variable("nimbus_core"),
         spec.PropertyTypes[NonPrimitivePropertyType("Tag")],
     )
 
     return [
-        _ToPythonType.from_property_type(module, name[len(prefix) :], properties, defn)
-        for name, defn in spec.PropertyTypes.items()
-        if name.startswith(prefix)
+        _ToPythonType.from_property_type(module, name, properties, defn)
+        for name, defn in namespace.items()
     ] + [
         _ToPythonType.from_resource_spec(
             module, resource_id, properties, spec.ResourceTypes[resource_id]
@@ -1,8 +1,23 @@
 from nimbus_core.attribute import *
+from nimbus_core.columns import *
+from nimbus_core.condition import *
+from nimbus_core.exports import *
+from nimbus_core.function import *
+from nimbus_core.graph import *
+from nimbus_core.hints import *
+from nimbus_core.ingest import *
 from nimbus_core.intrinsic import *
+from nimbus_core.loader import *
+from nimbus_core.mapping import *
+from nimbus_core.output import *
 from nimbus_core.parameter import *
+from nimbus_core.pickling import *
+from nimbus_core.profile import *
 from nimbus_core.property import *
+from nimbus_core.prototype import *
 from nimbus_core.reference import *
 from nimbus_core.resource import *
+from nimbus_core.serialize import *
+from nimbus_core.specialize import *
 from nimbus_core.tag import *
 from nimbus_core.template import *
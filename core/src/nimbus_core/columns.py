@@ -0,0 +1,239 @@
+"""Rendering of many resources of one class given as columns of values."""
+
+import functools
+import typing
+from typing import Any, Callable, Dict, Iterable, Iterator, Sequence, Tuple
+
+from nimbus_core.hints import compile_hint
+from nimbus_core.parameter import Parameter
+from nimbus_core.property import (
+    PropertyBoolean,
+    PropertyDouble,
+    PropertyInteger,
+    PropertyJSON,
+    PropertyLong,
+    PropertyString,
+    PropertyTimestamp,
+)
+from nimbus_core.reference import (
+    property_boolean_reference,
+    property_double_reference,
+    property_integer_reference,
+    property_json_reference,
+    property_long_reference,
+    property_string_reference,
+    property_timestamp_reference,
+)
+from nimbus_core.resource import Resource, property_name
+from nimbus_core.template import LogicalIDIndex, Template
+
+# Renders one value given the resource and parameter logical ID lookups.
+_Render = Callable[[Any, Any, Any], Any]
+
+_PRIMITIVE_RENDERERS: Dict[Any, _Render] = {
+    PropertyString: property_string_reference,
+    PropertyInteger: lambda v, r, p: property_integer_reference(v, p),
+    PropertyLong: lambda v, r, p: property_long_reference(v, p),
+    PropertyDouble: lambda v, r, p: property_double_reference(v, p),
+    PropertyBoolean: lambda v, r, p: property_boolean_reference(v, p),
+    PropertyTimestamp: lambda v, r, p: property_timestamp_reference(v, p),
+    PropertyJSON: property_json_reference,
+}
+
+
+def _list_renderer(item: _Render) -> _Render:
+    return lambda v, r, p: [item(x, r, p) for x in v]
+
+
+def _dict_renderer(item: _Render) -> _Render:
+    return lambda v, r, p: {k: item(x, r, p) for k, x in v.items()}
+
+
+def _struct_renderer(cls: type) -> _Render:
+    return lambda v, r, p: v.reference(r, p)
+
+
+def _renderer(hint: Any) -> _Render:
+    """Compile a renderer for a type hint of a generated class, rendering
+    values the way the class's generated method does."""
+    return compile_hint(
+        hint, _PRIMITIVE_RENDERERS, _list_renderer, _dict_renderer, _struct_renderer
+    )
+
+
+class _Placeholder:
+    """Stands in for the value of every field of a generated class, so that
+    a render shows the resource type and the order of all its properties."""
+
+    def intrinsic_to_cloudformation(self, r: Any, p: Any) -> Any:
+        return {}
+
+    def reference(self, r: Any, p: Any) -> Any:
+        return {}
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(())
+
+    def items(self) -> Iterable[Tuple[Any, Any]]:
+        return ()
+
+
+@functools.lru_cache(maxsize=None)
+def _layout(cls: type) -> Tuple[str, Dict[str, int]]:
+    """The resource type of generated class `cls` and the position of each
+    property in its rendered output."""
+    placeholder = _Placeholder()
+    rendered = cls(
+        **{field: placeholder for field in cls._fields}  # type: ignore
+    ).resource_to_cloudformation(None, None)
+    return (
+        rendered["Type"],
+        {name: i for i, name in enumerate(rendered["Properties"])},
+    )
+
+
+_Serializer = Callable[..., Iterator[Tuple[str, Dict[str, Any]]]]
+
+
+@functools.lru_cache(maxsize=None)
+def _serializer(cls: type, resource_type: str, fields: Tuple[str, ...]) -> _Serializer:
+    """Compile a loop rendering rows of `fields` (in rendering order) of
+    `cls`: `serialize(logical_ids, column, ..., resource_logical_id,
+    parameter_logical_id)`."""
+    hints = typing.get_type_hints(cls)
+    required = set(cls._fields) - set(cls._field_defaults)  # type: ignore
+    namespace: Dict[str, Any] = {
+        "property_string_reference": property_string_reference,
+        "resource_type": resource_type,
+    }
+    columns = [f"c{i}" for i in range(len(fields))]
+    lines = [
+        f"def serialize({', '.join(['logical_ids'] + columns + ['r', 'p'])}):",
+        f"    for {', '.join(['logical_id'] + columns)}, in "
+        f"zip({', '.join(['logical_ids'] + columns)}):",
+        "        output = {}",
+    ]
+    for i, field in enumerate(fields):
+        name = property_name(field)
+        render = _renderer(hints[field])
+        value = f"c{i}"
+        if render is property_string_reference:
+            # Most string properties are literals.
+            expression = (
+                f"{value} if {value}.__class__ is str "
+                f"else property_string_reference({value}, r, p)"
+            )
+        else:
+            namespace[f"render{i}"] = render
+            expression = f"render{i}({value}, r, p)"
+        if field in required:
+            lines.append(f"        output[{name!r}] = {expression}")
+        else:
+            lines.append(f"        if {value} is not None:")
+            lines.append(f"            output[{name!r}] = {expression}")
+    lines.append(
+        '        yield logical_id, {"Type": resource_type, "Properties": output}'
+    )
+    exec("\n".join(lines), namespace)
+    return namespace["serialize"]
+
+
+class ResourceColumns:
+    """Resources of one generated class given as columns of field values,
+    e.g. 50,000 record sets as
+
+        ResourceColumns(
+            RecordSet,
+            logical_ids,
+            Name=names,
+            Type=types,
+            ResourceRecords=values,
+            HostedZoneId=[zone] * len(names),
+        )
+
+    Rows are rendered by a loop compiled once per class and set of fields,
+    without creating a resource object per row. Fields that aren't given
+    take their defaults; `None` in a column of an optional field omits the
+    property for that row. Since rows have no objects, nothing can
+    reference them, but their values can reference the template's
+    resources and parameters.
+    """
+
+    def __init__(
+        self, cls: type, logical_ids: Sequence[str], **columns: Sequence[Any]
+    ) -> None:
+        fields = cls._fields  # type: ignore
+        defaults = cls._field_defaults  # type: ignore
+        for field in columns:
+            if field not in fields:
+                raise TypeError(f"{cls.__name__} has no field {field!r}")
+        missing = [f for f in fields if f not in columns and f not in defaults]
+        if missing:
+            raise TypeError(
+                f"{cls.__name__} columns are missing required fields: "
+                f"{', '.join(missing)}"
+            )
+        for field, column in columns.items():
+            if len(column) != len(logical_ids):
+                raise ValueError(
+                    f"column {field!r} has {len(column)} values, expected "
+                    f"{len(logical_ids)}"
+                )
+        if len(set(logical_ids)) != len(logical_ids):
+            seen = set()
+            for logical_id in logical_ids:
+                if logical_id in seen:
+                    raise ValueError(f"duplicate logical ID {logical_id!r}")
+                seen.add(logical_id)
+        self.cls = cls
+        self.logical_ids = logical_ids
+        # Fields left at a non-None default are columns of their default.
+        self.columns = {
+            field: (
+                columns[field]
+                if field in columns
+                else [defaults[field]] * len(logical_ids)
+            )
+            for field in fields
+            if field in columns or defaults[field] is not None
+        }
+
+    def __len__(self) -> int:
+        return len(self.logical_ids)
+
+    def render(
+        self,
+        resource_logical_id: Callable[[Resource], str],
+        parameter_logical_id: Callable[[Parameter], str],
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield `(logical_id, rendered_resource)` for every row."""
+        if not self.logical_ids:
+            return
+        resource_type, order = _layout(self.cls)
+        fields = tuple(sorted(self.columns, key=lambda f: order[property_name(f)]))
+        serialize = _serializer(self.cls, resource_type, fields)
+        yield from serialize(
+            self.logical_ids,
+            *(self.columns[field] for field in fields),
+            resource_logical_id,
+            parameter_logical_id,
+        )
+
+
+def columns_to_cloudformation(
+    template: Template, columns: Iterable[ResourceColumns]
+) -> Dict[str, Any]:
+    """Render `template` with the rows of `columns` added to its resources."""
+    index = LogicalIDIndex(template)
+    resources = {
+        logical_id: template.render_resource(logical_id, resource, index)
+        for logical_id, resource in template.resources.items()
+    }
+    for rows in columns:
+        for logical_id, rendered in rows.render(
+            index.resource_logical_id, index.parameter_logical_id
+        ):
+            if logical_id in resources:
+                raise ValueError(f"duplicate logical ID {logical_id!r}")
+            resources[logical_id] = rendered
+    return template.document(index, resources)
@@ -0,0 +1,323 @@
+from typing import Any, Callable, Dict, List, NamedTuple, Set, Union
+
+from nimbus_core.parameter import Parameter
+from nimbus_core.reference import property_json_reference
+from nimbus_core.resource import Resource
+
+# Conditions
+# https://docs.aws.amazon.com/AWSCloudFormation/latest/UserGuide/conditions-section-structure.html
+# https://docs.aws.amazon.com/AWSCloudFormation/latest/UserGuide/intrinsic-function-reference-conditions.html
+#
+# Conditions are declared by name in `Template.conditions` and referred to by
+# name from `If`, `Condition`, `Template.resource_conditions` and
+# `Output.Condition`, just like in CloudFormation.
+
+
+def _operand(
+    value: Any,
+    resource_logical_id: Callable[[Resource], str],
+    parameter_logical_id: Callable[[Parameter], str],
+) -> Any:
+    # Property type objects (and `Tag`s) render themselves.
+    if hasattr(value, "_fields") and hasattr(value, "reference"):
+        return value.reference(resource_logical_id, parameter_logical_id)
+    return property_json_reference(value, resource_logical_id, parameter_logical_id)
+
+
+class Condition(NamedTuple):
+    """A reference to a named condition, for use inside `And`, `Or` and
+    `Not`."""
+
+    name: str
+
+    def intrinsic_to_cloudformation(
+        self,
+        resource_logical_id: Callable[[Resource], str],
+        parameter_logical_id: Callable[[Parameter], str],
+    ) -> Dict[str, Any]:
+        return {"Condition": self.name}
+
+
+class Equals(NamedTuple):
+    left: Any
+    right: Any
+
+    def intrinsic_to_cloudformation(
+        self,
+        resource_logical_id: Callable[[Resource], str],
+        parameter_logical_id: Callable[[Parameter], str],
+    ) -> Dict[str, Any]:
+        return {
+            "Fn::Equals": [
+                _operand(self.left, resource_logical_id, parameter_logical_id),
+                _operand(self.right, resource_logical_id, parameter_logical_id),
+            ]
+        }
+
+
+class And(NamedTuple):
+    conditions: List["ConditionExpression"]
+
+    def intrinsic_to_cloudformation(
+        self,
+        resource_logical_id: Callable[[Resource], str],
+        parameter_logical_id: Callable[[Parameter], str],
+    ) -> Dict[str, Any]:
+        return {
+            "Fn::And": [
+                _operand(condition, resource_logical_id, parameter_logical_id)
+                for condition in self.conditions
+            ]
+        }
+
+
+class Or(NamedTuple):
+    conditions: List["ConditionExpression"]
+
+    def intrinsic_to_cloudformation(
+        self,
+        resource_logical_id: Callable[[Resource], str],
+        parameter_logical_id: Callable[[Parameter], str],
+    ) -> Dict[str, Any]:
+        return {
+            "Fn::Or": [
+                _operand(condition, resource_logical_id, parameter_logical_id)
+                for condition in self.conditions
+            ]
+        }
+
+
+class Not(NamedTuple):
+    condition: "ConditionExpression"
+
+    def intrinsic_to_cloudformation(
+        self,
+        resource_logical_id: Callable[[Resource], str],
+        parameter_logical_id: Callable[[Parameter], str],
+    ) -> Dict[str, Any]:
+        return {
+            "Fn::Not": [
+                _operand(self.condition, resource_logical_id, parameter_logical_id)
+            ]
+        }
+
+
+ConditionExpression = Union[Condition, Equals, And, Or, Not]
+
+
+class If(NamedTuple):
+    """`Fn::If`. Use `AWS_NO_VALUE` as a branch to omit the property."""
+
+    condition: str
+    value_if_true: Any
+    value_if_false: Any
+
+    def intrinsic_to_cloudformation(
+        self,
+        resource_logical_id: Callable[[Resource], str],
+        parameter_logical_id: Callable[[Parameter], str],
+    ) -> Dict[str, Any]:
+        return {
+            "Fn::If": [
+                self.condition,
+                _operand(self.value_if_true, resource_logical_id, parameter_logical_id),
+                _operand(
+                    self.value_if_false, resource_logical_id, parameter_logical_id
+                ),
+            ]
+        }
+
+    # Generated code renders property type objects with
+    # `value.reference(...)`, so an `If` can stand in for one of those too.
+    reference = intrinsic_to_cloudformation
+
+
+class UnknownCondition(Exception):
+    pass
+
+
+class CircularCondition(Exception):
+    pass
+
+
+_NO_VALUE = {"Ref": "AWS::NoValue"}
+
+# Returned by `_ConditionFolder.prune()` for values that must be removed from
+# their parent, i.e. `Fn::If`s that fold to `AWS::NoValue`.
+_REMOVE = object()
+
+# A folded condition is either a constant or the residual expression that
+# still depends on unknown parameters.
+_Folded = Union[bool, Dict[str, Any]]
+
+
+def _as_string(value: Any) -> str:
+    # CloudFormation compares `Fn::Equals` operands as strings.
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+class _ConditionFolder:
+    def __init__(self, conditions: Dict[str, Any], parameters: Dict[str, Any]):
+        self.conditions = conditions
+        self.parameters = parameters
+        self.folded: Dict[str, _Folded] = {}
+        self.folding: Set[str] = set()
+
+    def condition(self, name: str) -> _Folded:
+        folded = self.folded.get(name)
+        if folded is not None:
+            return folded
+        if name in self.folding:
+            raise CircularCondition(name)
+        try:
+            expression = self.conditions[name]
+        except KeyError:
+            raise UnknownCondition(name)
+        self.folding.add(name)
+        folded = self.fold(expression)
+        # A condition's definition must be a function, not a bare reference
+        # to another condition, so inline the other condition's residual.
+        if isinstance(folded, dict) and "Condition" in folded:
+            folded = self.condition(folded["Condition"])
+        self.folding.discard(name)
+        self.folded[name] = folded
+        return folded
+
+    def operand(self, value: Any) -> Any:
+        if isinstance(value, (str, int, float)):
+            return _as_string(value)
+        if isinstance(value, dict) and len(value) == 1 and "Ref" in value:
+            if value["Ref"] in self.parameters:
+                return _as_string(self.parameters[value["Ref"]])
+        return None
+
+    def fold(self, expression: Any) -> _Folded:
+        if not isinstance(expression, dict) or len(expression) != 1:
+            return expression
+        [(function, args)] = expression.items()
+        if function == "Condition":
+            folded = self.condition(args)
+            return folded if isinstance(folded, bool) else expression
+        if function == "Fn::Equals":
+            left, right = self.operand(args[0]), self.operand(args[1])
+            if left is None or right is None:
+                return expression
+            return left == right
+        if function == "Fn::Not":
+            folded = self.fold(args[0])
+            if isinstance(folded, bool):
+                return not folded
+            return {"Fn::Not": [folded]}
+        if function in ("Fn::And", "Fn::Or"):
+            # `absorbing` decides the result on its own (False for And, True
+            # for Or); the other constant can be dropped from the operands.
+            absorbing = function == "Fn::Or"
+            residual = []
+            for arg in args:
+                folded = self.fold(arg)
+                if folded is absorbing:
+                    return absorbing
+                if not isinstance(folded, bool):
+                    residual.append(folded)
+            if not residual:
+                return not absorbing
+            if len(residual) == 1:
+                return residual[0]
+            return {function: residual}
+        return expression
+
+    def prune(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            if len(value) == 1 and "Fn::If" in value:
+                name, value_if_true, value_if_false = value["Fn::If"]
+                folded = self.condition(name)
+                if isinstance(folded, bool):
+                    chosen = value_if_true if folded else value_if_false
+                    if chosen == _NO_VALUE:
+                        return _REMOVE
+                    return self.prune(chosen)
+                # A branch can't be left out of a residual Fn::If, so one
+                # that prunes away becomes AWS::NoValue instead.
+                branches = [self.prune(value_if_true), self.prune(value_if_false)]
+                return {
+                    "Fn::If": [name]
+                    + [dict(_NO_VALUE) if b is _REMOVE else b for b in branches]
+                }
+            output = {}
+            for key, item in value.items():
+                pruned = self.prune(item)
+                if pruned is not _REMOVE:
+                    output[key] = pruned
+            return output
+        if isinstance(value, list):
+            return [
+                pruned
+                for pruned in (self.prune(item) for item in value)
+                if pruned is not _REMOVE
+            ]
+        return value
+
+    def prune_section(self, section: Dict[str, Any]) -> Dict[str, Any]:
+        """Drop the entries of a Resources or Outputs section whose condition
+        is false and prune the remaining ones."""
+        output = {}
+        for logical_id, entry in section.items():
+            name = entry.get("Condition")
+            if name is not None:
+                folded = self.condition(name)
+                if folded is False:
+                    continue
+                if folded is True:
+                    entry = {k: v for k, v in entry.items() if k != "Condition"}
+            output[logical_id] = self.prune(entry)
+        return output
+
+
+def fold_conditions(
+    document: Dict[str, Any], parameters: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Specialize a rendered template for known parameter values.
+
+    `parameters` maps parameter logical IDs (or pseudo parameters such as
+    `AWS::Region`) to their values. Every condition that only depends on
+    known values is folded to a constant: resources and outputs whose
+    condition is false are dropped, `Fn::If`s on constant conditions are
+    replaced by the chosen branch (or removed, for `AWS::NoValue`), and
+    constant conditions are removed from the Conditions section. Conditions
+    that still depend on unknown parameters are simplified and kept.
+    """
+    folder = _ConditionFolder(document.get("Conditions", {}), parameters)
+    output = dict(document)
+    resources = folder.prune_section(document.get("Resources", {}))
+    for resource in resources.values():
+        depends_on = resource.get("DependsOn")
+        if isinstance(depends_on, str) and depends_on not in resources:
+            del resource["DependsOn"]
+        elif isinstance(depends_on, list):
+            depends_on = [d for d in depends_on if d in resources]
+            if depends_on:
+                resource["DependsOn"] = depends_on
+            else:
+                del resource["DependsOn"]
+    output["Resources"] = resources
+    if "Outputs" in document:
+        outputs = folder.prune_section(document["Outputs"])
+        if outputs:
+            output["Outputs"] = outputs
+        else:
+            del output["Outputs"]
+
+    conditions = {
+        name: folded
+        for name, folded in (
+            (name, folder.condition(name)) for name in folder.conditions
+        )
+        if not isinstance(folded, bool)
+    }
+    if conditions:
+        output["Conditions"] = conditions
+    else:
+        output.pop("Conditions", None)
+    return output
@@ -0,0 +1,125 @@
+"""Synth-time checks for cross-stack exports and imports.
+
+CloudFormation only reports a duplicate export name or an import of an export
+that doesn't exist when a stack is deployed. `ExportIndex` catches both
+across any number of templates before anything is deployed.
+"""
+
+from typing import Dict, List, NamedTuple, Union
+
+from nimbus_core.graph import template_references
+from nimbus_core.output import Export, ImportValue
+from nimbus_core.template import Template
+
+
+class ExportLocation(NamedTuple):
+    stack: str
+    output_logical_id: str
+
+
+class DuplicateExport(NamedTuple):
+    name: str
+    locations: List[ExportLocation]
+
+    def __str__(self) -> str:
+        locations = ", ".join(
+            f"{location.stack}.{location.output_logical_id}"
+            for location in self.locations
+        )
+        return f"Export {self.name!r} is defined more than once: {locations}"
+
+
+class DanglingImport(NamedTuple):
+    stack: str
+    section: str
+    logical_id: str
+    path: str
+    name: str
+
+    def __str__(self) -> str:
+        return (
+            f"{self.stack}: {self.section}.{self.logical_id}.{self.path} "
+            f"imports {self.name!r}, which no stack exports"
+        )
+
+
+class UnknownExport(Exception):
+    pass
+
+
+class ExportErrors(Exception):
+    def __init__(
+        self, duplicates: List[DuplicateExport], dangling: List[DanglingImport]
+    ) -> None:
+        super().__init__("\n".join(str(e) for e in [*duplicates, *dangling]))
+        self.duplicates = duplicates
+        self.dangling = dangling
+
+
+class ExportIndex:
+    """An index of the exports of a set of templates, keyed by stack name.
+
+    Lookups by export name are O(1); building the index and checking
+    imports are linear in the size of the templates.
+    """
+
+    def __init__(self, templates: Dict[str, Template]) -> None:
+        self.templates: Dict[str, Template] = {}
+        self.exports: Dict[str, ExportLocation] = {}
+        self.duplicates: Dict[str, List[ExportLocation]] = {}
+        for stack, template in templates.items():
+            self.add(stack, template)
+
+    def add(self, stack: str, template: Template) -> None:
+        self.templates[stack] = template
+        for logical_id, output in (template.outputs or {}).items():
+            if output.Export is None:
+                continue
+            name = output.Export.Name
+            location = ExportLocation(stack, logical_id)
+            existing = self.exports.get(name)
+            if existing is None:
+                self.exports[name] = location
+            elif name in self.duplicates:
+                self.duplicates[name].append(location)
+            else:
+                self.duplicates[name] = [existing, location]
+
+    def resolve(self, export: Union[str, Export, ImportValue]) -> ExportLocation:
+        if isinstance(export, ImportValue):
+            export = export.export_name
+        elif isinstance(export, Export):
+            export = export.Name
+        try:
+            return self.exports[export]
+        except KeyError:
+            raise UnknownExport(export)
+
+    def duplicate_exports(self) -> List[DuplicateExport]:
+        return [
+            DuplicateExport(name, locations)
+            for name, locations in self.duplicates.items()
+        ]
+
+    def dangling_imports(self) -> List[DanglingImport]:
+        dangling: List[DanglingImport] = []
+        for stack, template in self.templates.items():
+            for section, logical_id, path, node in template_references(template):
+                if (
+                    isinstance(node, ImportValue)
+                    and node.export_name not in self.exports
+                ):
+                    dangling.append(
+                        DanglingImport(
+                            stack, section, logical_id, path, node.export_name
+                        )
+                    )
+        return dangling
+
+    def validate(self) -> None:
+        """Raise `ExportErrors` if any export name is defined twice or any
+        import refers to an export that no template defines."""
+        duplicates = self.duplicate_exports()
+        dangling = self.dangling_imports()
+        if duplicates or dangling:
+            raise ExportErrors(duplicates, dangling)
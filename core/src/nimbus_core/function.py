@@ -0,0 +1,25 @@
+from typing import Any, Callable, Dict, NamedTuple
+
+from nimbus_core.parameter import Parameter
+from nimbus_core.reference import property_json_reference
+from nimbus_core.resource import Resource
+
+
+class Fn(NamedTuple):
+    """An intrinsic function nimbus has no dedicated type for, e.g.
+    `Fn("Fn::Join", ["-", [AWS_STACK_NAME, bucket]])`. The arguments may
+    contain resources, parameters and other intrinsic functions."""
+
+    function: str
+    arguments: Any
+
+    def intrinsic_to_cloudformation(
+        self,
+        resource_logical_id: Callable[[Resource], str],
+        parameter_logical_id: Callable[[Parameter], str],
+    ) -> Dict[str, Any]:
+        return {
+            self.function: property_json_reference(
+                self.arguments, resource_logical_id, parameter_logical_id
+            )
+        }
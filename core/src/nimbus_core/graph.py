@@ -0,0 +1,266 @@
+"""Traversal of the object graph behind a template, without rendering it."""
+
+from typing import Any, Iterable, Iterator, List, NamedTuple, Set, Tuple
+
+from nimbus_core.attribute import Attribute
+from nimbus_core.function import Fn
+from nimbus_core.intrinsic import _SUB_VARIABLE, Sub
+from nimbus_core.parameter import PARAMETER_TYPES
+from nimbus_core.template import (
+    LogicalIDIndex,
+    Template,
+    UnknownParameter,
+    UnknownResource,
+)
+
+
+# https://docs.aws.amazon.com/AWSCloudFormation/latest/UserGuide/pseudo-parameter-reference.html
+_PSEUDO_PARAMETERS = frozenset(
+    [
+        "AWS::AccountId",
+        "AWS::NotificationARNs",
+        "AWS::NoValue",
+        "AWS::Partition",
+        "AWS::Region",
+        "AWS::StackId",
+        "AWS::StackName",
+        "AWS::URLSuffix",
+    ]
+)
+
+
+def is_resource(value: Any) -> bool:
+    """A cheaper `isinstance(value, Resource)` for the hot path."""
+    return hasattr(type(value), "resource_to_cloudformation")
+
+
+def _join(path: str, key: str) -> str:
+    return f"{path}.{key}" if path else key
+
+
+def walk(value: Any, path: str = "") -> Iterator[Tuple[str, Any]]:
+    """Yield `(path, node)` for `value` and every node reachable from it.
+
+    Parameters and resources reached from `value` are yielded but not
+    descended into (they are references to other entries of the template,
+    not part of `value`); everything else — property types, `Sub`s,
+    attributes, dicts, lists and other intrinsic functions — is. Paths use
+    `.` for field names and dict keys and `[i]` for list indices.
+    """
+    yield path, value
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return
+    if isinstance(value, PARAMETER_TYPES):
+        return
+    if isinstance(value, Attribute):
+        yield path, value.resource
+        return
+    if isinstance(value, Sub):
+        for key, substitute in value.substitutes.items():
+            yield from walk(substitute, _join(path, key))
+        return
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from walk(item, _join(path, str(key)))
+        return
+    if isinstance(value, (list, tuple)) and not hasattr(value, "_fields"):
+        for i, item in enumerate(value):
+            yield from walk(item, f"{path}[{i}]")
+        return
+    if path and is_resource(value):
+        return
+    for field in getattr(value, "_fields", ()):
+        item = getattr(value, field)
+        if item is not None:
+            yield from walk(item, _join(path, field))
+
+
+def template_references(template: Template) -> Iterator[Tuple[str, str, str, Any]]:
+    """Yield `(section, logical_id, path, node)` for every node below every
+    condition, resource and output of the template; see `walk()`."""
+    for name, condition in (template.conditions or {}).items():
+        for path, node in walk(condition):
+            if path:
+                yield "Conditions", name, path, node
+    for logical_id, resource in template.resources.items():
+        for path, node in walk(resource):
+            if path:
+                yield "Resources", logical_id, path, node
+    for logical_id, output in (template.outputs or {}).items():
+        for path, node in walk(output.Value, "Value"):
+            yield "Outputs", logical_id, path, node
+
+
+class DanglingReference(NamedTuple):
+    logical_id: str
+    path: str
+    target: Any
+    section: str = "Resources"
+
+    def __str__(self) -> str:
+        where = f"{self.section}.{self.logical_id}.{self.path}"
+        if isinstance(self.target, str):
+            return (
+                f"{where} references {self.target!r}, which is neither a "
+                "parameter nor a resource of the template"
+            )
+        kind = "parameter" if isinstance(self.target, PARAMETER_TYPES) else "resource"
+        return f"{where} references a {kind} that is not in the template: {self.target}"
+
+
+class DanglingReferences(Exception):
+    def __init__(self, references: List[DanglingReference]) -> None:
+        super().__init__("\n".join(str(reference) for reference in references))
+        self.references = references
+
+
+def dangling_references(template: Template) -> List[DanglingReference]:
+    """Find every reference to a resource or parameter that is missing from
+    the template. References by logical ID (`Fn("Ref", "Name")` and the like,
+    and Sub format string variables) are reported with the ID as `target`.
+
+    This is a single walk over the template's objects with identity lookups,
+    so it is cheaper than a render and reports every problem instead of
+    stopping at the first `UnknownResource`/`UnknownParameter`.
+    """
+    index = LogicalIDIndex(template)
+    dangling: List[DanglingReference] = []
+    for section, logical_id, path, node in template_references(template):
+        if isinstance(node, (Fn, Sub)):
+            for target in _named_targets(node):
+                if not (
+                    target in template.parameters
+                    or target in template.resources
+                    or target in _PSEUDO_PARAMETERS
+                ):
+                    dangling.append(
+                        DanglingReference(logical_id, path, target, section)
+                    )
+            continue
+        try:
+            if isinstance(node, PARAMETER_TYPES):
+                index.parameter_logical_id(node)
+            elif is_resource(node):
+                index.resource_logical_id(node)
+        except (UnknownParameter, UnknownResource):
+            dangling.append(DanglingReference(logical_id, path, node, section))
+    return dangling
+
+
+def validate_references(template: Template) -> None:
+    """Raise `DanglingReferences` listing every dangling reference, if any."""
+    dangling = dangling_references(template)
+    if dangling:
+        raise DanglingReferences(dangling)
+
+
+class DeadCode(NamedTuple):
+    parameters: List[str]
+    resources: List[str]
+
+
+def _sub_targets(format_string: Any, variables: Any) -> List[str]:
+    if not isinstance(format_string, str):
+        return []
+    return [
+        match[1].split(".", 1)[0]
+        for match in _SUB_VARIABLE.finditer(format_string)
+        if match[1] not in variables
+    ]
+
+
+def _named_targets(node: Any) -> List[str]:
+    # `Fn("Ref", "Name")`, `Fn("Fn::GetAtt", ["Name", "Arn"])` and the
+    # variables of Sub format strings (`${Name}`, `${Name.Arn}`) that the Sub
+    # doesn't bind itself refer to entries by logical ID rather than by object.
+    if isinstance(node, Sub):
+        return _sub_targets(node.format_string, node.substitutes)
+    if node.function == "Ref" and isinstance(node.arguments, str):
+        return [node.arguments]
+    if node.function == "Fn::GetAtt":
+        target = node.arguments
+        if isinstance(target, (list, tuple)) and target:
+            target = target[0]
+        if isinstance(target, str):
+            return [target.split(".", 1)[0]]
+    if node.function == "Fn::Sub":
+        if isinstance(node.arguments, str):
+            return _sub_targets(node.arguments, {})
+        if isinstance(node.arguments, (list, tuple)) and len(node.arguments) == 2:
+            format_string, variables = node.arguments
+            if isinstance(variables, dict):
+                return _sub_targets(format_string, variables)
+    return []
+
+
+def dead_code(template: Template, prunable: Iterable[str] = ()) -> DeadCode:
+    """Find the parameters nothing in the template references, and the
+    resources in `prunable` that nothing reachable references.
+
+    Every resource not in `prunable`, every condition and every output is a
+    root. Each root and each reachable resource is walked once and lookups
+    are by identity, so this is linear in the size of the template. A
+    parameter added under two logical IDs is only reachable under the first,
+    which is the one rendering uses.
+    """
+    index = LogicalIDIndex(template)
+    prunable = set(prunable)
+    live_parameters: Set[str] = set()
+    live_resources = {lid for lid in template.resources if lid not in prunable}
+    pending = list(live_resources)
+
+    def reach(target: str) -> None:
+        if target in template.parameters:
+            live_parameters.add(target)
+        elif target in template.resources and target not in live_resources:
+            live_resources.add(target)
+            pending.append(target)
+
+    def visit(value: Any) -> None:
+        for path, node in walk(value):
+            if isinstance(node, PARAMETER_TYPES):
+                try:
+                    live_parameters.add(index.parameter_logical_id(node))
+                except UnknownParameter:
+                    pass
+            elif isinstance(node, (Fn, Sub)):
+                for target in _named_targets(node):
+                    reach(target)
+            elif path and is_resource(node):
+                try:
+                    reach(index.resource_logical_id(node))
+                except UnknownResource:
+                    pass
+
+    for condition in (template.conditions or {}).values():
+        visit(condition)
+    for output in (template.outputs or {}).values():
+        visit(output.Value)
+    while pending:
+        visit(template.resources[pending.pop()])
+    return DeadCode(
+        parameters=[lid for lid in template.parameters if lid not in live_parameters],
+        resources=[lid for lid in template.resources if lid not in live_resources],
+    )
+
+
+def eliminate_dead_code(template: Template, prunable: Iterable[str] = ()) -> Template:
+    """Return `template` without the entries `dead_code()` finds."""
+    dead = dead_code(template, prunable)
+    parameters, resources = set(dead.parameters), set(dead.resources)
+    resource_conditions = template.resource_conditions
+    if resource_conditions is not None:
+        resource_conditions = {
+            lid: condition
+            for lid, condition in resource_conditions.items()
+            if lid not in resources
+        }
+    return template._replace(
+        parameters={
+            lid: p for lid, p in template.parameters.items() if lid not in parameters
+        },
+        resources={
+            lid: r for lid, r in template.resources.items() if lid not in resources
+        },
+        resource_conditions=resource_conditions,
+    )
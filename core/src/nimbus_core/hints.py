@@ -0,0 +1,36 @@
+"""Dispatch on the type hints of the fields of generated classes."""
+
+import typing
+from typing import Any, Callable, Dict, TypeVar
+
+_T = TypeVar("_T")
+
+
+def compile_hint(
+    hint: Any,
+    primitives: Dict[Any, _T],
+    list_of: Callable[[_T], _T],
+    dict_of: Callable[[_T], _T],
+    struct: Callable[[type], _T],
+) -> _T:
+    """Compile a type hint of a generated class, taking primitive property
+    types from `primitives` and compiling lists, maps and property types
+    with `list_of`, `dict_of` and `struct`."""
+    args = [arg for arg in typing.get_args(hint) if arg is not type(None)]
+    if typing.get_origin(hint) is typing.Union:
+        # Optional[...]; Optional[PropertyString] is flattened into the
+        # PropertyString union.
+        hint = args[0] if len(args) == 1 else typing.Union[tuple(args)]
+        args = list(typing.get_args(hint))
+    if hint in primitives:
+        return primitives[hint]
+    origin = typing.get_origin(hint)
+    if origin is list:
+        return list_of(compile_hint(args[0], primitives, list_of, dict_of, struct))
+    if origin is dict:
+        return dict_of(compile_hint(args[1], primitives, list_of, dict_of, struct))
+    if hasattr(hint, "__supertype__"):
+        return compile_hint(hint.__supertype__, primitives, list_of, dict_of, struct)
+    if isinstance(hint, type) and hasattr(hint, "_fields"):
+        return struct(hint)
+    raise TypeError(f"Unsupported property type: {hint}")
@@ -0,0 +1,90 @@
+"""Streaming of resources from row-oriented files into template files."""
+
+import csv
+import json
+import typing
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from nimbus_core.loader import converter
+from nimbus_core.resource import Resource
+from nimbus_core.serialize import TemplateSize, write_compact
+from nimbus_core.template import Template
+
+Row = Dict[str, Any]
+
+
+class UnknownRowFormat(Exception):
+    pass
+
+
+def read_jsonl(path: str) -> Iterator[Row]:
+    """Yield the objects of a JSON Lines file, skipping blank lines."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_csv(path: str) -> Iterator[Row]:
+    """Yield the rows of a CSV file with a header row as dicts."""
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+def read_rows(path: str) -> Iterator[Row]:
+    """Yield the rows of a `.jsonl`/`.ndjson` or `.csv` file."""
+    if path.endswith((".jsonl", ".ndjson")):
+        return read_jsonl(path)
+    if path.endswith(".csv"):
+        return read_csv(path)
+    raise UnknownRowFormat(path)
+
+
+def row_resource(
+    cls: Callable[..., Resource], logical_id: str = "LogicalId"
+) -> Callable[[Row], Tuple[str, Resource]]:
+    """A row mapper for rows whose keys are the fields of `cls` plus a
+    `logical_id` key.
+
+    Values are converted to the types of the fields the way
+    `load_template()` converts property values (e.g. the CSV cell `"300"`
+    of an integer field becomes `300`, and objects become property types).
+    Empty CSV cells are treated as missing. Rows can't contain intrinsic
+    functions, since there is no template to resolve them in.
+    """
+    hints = typing.get_type_hints(cls)
+    converters = {
+        field: converter(hints[field]) for field in cls._fields  # type: ignore
+    }
+
+    def to_resource(row: Row) -> Tuple[str, Resource]:
+        row_id = row[logical_id]
+        fields = {}
+        for key, value in row.items():
+            if key == logical_id or value == "":
+                continue
+            convert = converters.get(key)
+            if convert is None:
+                raise TypeError(f"{cls.__name__} has no field {key!r}")
+            fields[key] = convert(value, f"{row_id}.{key}")
+        return row_id, cls(**fields)
+
+    return to_resource
+
+
+def stream_template(
+    template: Template,
+    rows: Iterable[Row],
+    to_resource: Callable[[Row], Tuple[str, Resource]],
+    path: str,
+    budget: Optional[int] = None,
+) -> TemplateSize:
+    """Write `template` to `path` as minified JSON, with a resource for each
+    of `rows` (mapped by `to_resource`) added after its own resources.
+
+    Rows are read, mapped, rendered and written one at a time, so memory
+    doesn't grow with the number of rows. Logical IDs of the rows aren't
+    checked for duplicates, which would take memory per row.
+    """
+    with open(path, "wb") as f:
+        return write_compact(template, f, budget, (to_resource(row) for row in rows))
@@ -1,4 +1,5 @@
-from typing import Any, Callable, Dict, Union
+import re
+from typing import Any, Callable, Dict, NamedTuple, Union
 
 from nimbus_core.attribute import Attribute
 from nimbus_core.parameter import Parameter
@@ -19,7 +20,31 @@ class IntrinsicFunction(Protocol):
 Substitutable = Union[Resource, "PropertyString", Attribute, Parameter]
 
 
+# A variable (`${Name}` or `${Resource.Attribute}`) in a Sub format string;
+# `${!...}` is a literal.
+_SUB_VARIABLE = re.compile(r"\$\{(?!!)([^}]*)\}")
+
+
 class Sub:
     def __init__(self, format_string: str, **substitutes: Substitutable) -> None:
         self.format_string = format_string
         self.substitutes = dict(substitutes)
+
+
+class PseudoParameter(NamedTuple):
+    # https://docs.aws.amazon.com/AWSCloudFormation/latest/UserGuide/pseudo-parameter-reference.html
+    name: str
+
+    def intrinsic_to_cloudformation(
+        self,
+        resource_logical_id: Callable[[Resource], str],
+        parameter_logical_id: Callable[[Parameter], str],
+    ) -> Dict[str, Any]:
+        return {"Ref": self.name}
+
+
+AWS_ACCOUNT_ID = PseudoParameter("AWS::AccountId")
+AWS_NO_VALUE = PseudoParameter("AWS::NoValue")
+AWS_PARTITION = PseudoParameter("AWS::Partition")
+AWS_REGION = PseudoParameter("AWS::Region")
+AWS_STACK_NAME = PseudoParameter("AWS::StackName")
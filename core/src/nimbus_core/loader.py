@@ -0,0 +1,579 @@
+"""Load existing CloudFormation templates into nimbus objects.
+
+`load_template()` parses a JSON or YAML template and builds the matching
+generated `nimbus_resources` objects, parameters, outputs and conditions,
+with every `Ref` and `Fn::GetAtt` resolved back into a reference to the
+object it names:
+
+    template = load_template("legacy.yaml")
+    template.template_to_cloudformation()
+
+Resource classes are looked up by type name and their modules are only
+imported when a template uses them; `register_resource_class()` adds or
+overrides entries. Template features nimbus can't represent (e.g. `DependsOn`
+or `Mappings`) raise `TemplateLoadError` rather than being dropped.
+"""
+
+import gc
+import importlib
+import json
+import typing
+from datetime import datetime
+from contextlib import contextmanager
+from functools import lru_cache, partial
+from typing import Any, Callable, Dict, Iterator, Optional, Set, Type
+
+from nimbus_core.attribute import AttributeString
+from nimbus_core.condition import And, Condition, Equals, If, Not, Or
+from nimbus_core.function import Fn
+from nimbus_core.hints import compile_hint
+from nimbus_core.intrinsic import PseudoParameter, Sub
+from nimbus_core.output import Export, ImportValue, Output
+from nimbus_core.parameter import (
+    Parameter,
+    ParameterCommaDelineatedList,
+    ParameterNumber,
+    ParameterNumberList,
+    ParameterString,
+)
+from nimbus_core.property import (
+    PropertyBoolean,
+    PropertyDouble,
+    PropertyInteger,
+    PropertyJSON,
+    PropertyLong,
+    PropertyString,
+    PropertyTimestamp,
+)
+from nimbus_core.resource import Resource, property_name
+from nimbus_core.template import Template
+
+
+class TemplateLoadError(Exception):
+    def __init__(self, path: str, message: str) -> None:
+        super().__init__(f"{path}: {message}")
+        self.path = path
+
+
+_RESOURCE_CLASSES: Dict[str, type] = {}
+
+
+def register_resource_class(resource_type: str, cls: type) -> None:
+    _RESOURCE_CLASSES[resource_type] = cls
+
+
+def resource_class(resource_type: str) -> type:
+    """The generated class for a resource type, importing its module (and
+    only its module) the first time the type is looked up."""
+    cls = _RESOURCE_CLASSES.get(resource_type)
+    if cls is not None:
+        return cls
+    # Mirrors the module layout of nimbus_codegen.write_resources_package()
+    name = resource_type
+    if name.startswith("AWS::"):
+        name = name[len("AWS::") :]
+    parts = name.split("::")
+    try:
+        module = importlib.import_module(
+            "nimbus_resources." + ".".join(part.lower() for part in parts)
+        )
+        cls = getattr(module, parts[-1])
+    except (ImportError, AttributeError):
+        raise KeyError(resource_type)
+    _RESOURCE_CLASSES[resource_type] = cls
+    return cls
+
+
+_Convert = Callable[["_Loader", Any, str], Any]
+
+
+def _is_intrinsic(value: Any) -> bool:
+    if not isinstance(value, dict) or len(value) != 1:
+        return False
+    key = next(iter(value))
+    return key == "Ref" or key.startswith("Fn::")
+
+
+def _string(loader: "_Loader", value: Any, path: str) -> Any:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return loader.intrinsic(value, path, _string)
+
+
+def _integer(loader: "_Loader", value: Any, path: str) -> Any:
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            raise TemplateLoadError(path, f"{value!r} is not an integer")
+    return loader.intrinsic(value, path, _integer)
+
+
+def _double(loader: "_Loader", value: Any, path: str) -> Any:
+    if isinstance(value, (int, float, str)) and not isinstance(value, bool):
+        try:
+            return float(value)
+        except ValueError:
+            raise TemplateLoadError(path, f"{value!r} is not a number")
+    return loader.intrinsic(value, path, _double)
+
+
+def _boolean(loader: "_Loader", value: Any, path: str) -> Any:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    return loader.intrinsic(value, path, _boolean)
+
+
+def _timestamp(loader: "_Loader", value: Any, path: str) -> Any:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            raise TemplateLoadError(path, f"{value!r} is not a timestamp")
+    return loader.intrinsic(value, path, _timestamp)
+
+
+def _json(loader: "_Loader", value: Any, path: str) -> Any:
+    return loader.any(value, path)
+
+
+# The attribute class `Fn::GetAtt` is loaded as, by the converter of the value
+# it stands in for (`_json` for values of unknown type). The
+# `property_*_reference` functions of the other primitive types can't render
+# attributes, so a GetAtt in their place is a load error.
+_ATTRIBUTE_CLASSES: Dict[_Convert, type] = {
+    _string: AttributeString,
+    _json: AttributeString,
+}
+
+
+_PRIMITIVE_CONVERTERS: Dict[Any, _Convert] = {
+    PropertyString: _string,
+    PropertyInteger: _integer,
+    PropertyLong: _integer,
+    PropertyDouble: _double,
+    PropertyBoolean: _boolean,
+    PropertyTimestamp: _timestamp,
+    PropertyJSON: _json,
+}
+
+
+class _StructConverter:
+    """Converts a dict of properties into a generated resource or property
+    type class. Field converters are compiled from the class's type hints
+    the first time the class is used (lazily, because property types can be
+    recursive)."""
+
+    def __init__(self, cls: type) -> None:
+        self.cls = cls
+        self.fields: Optional[Dict[str, Any]] = None
+
+    def _compile(self) -> Dict[str, Any]:
+        hints = typing.get_type_hints(self.cls)
+        fields = {}
+        for field in self.cls._fields:  # type: ignore
+            fields[property_name(field)] = (field, _converter(hints[field]))
+        return fields
+
+    def __call__(self, loader: "_Loader", value: Any, path: str) -> Any:
+        if _is_intrinsic(value):
+            # Generated code renders property type values by calling their
+            # `reference()` method, which only `If` provides.
+            if "Fn::If" not in value:
+                raise TemplateLoadError(
+                    path, f"{next(iter(value))} can't stand in for a property type"
+                )
+            return loader.intrinsic(value, path, self)
+        if not isinstance(value, dict):
+            raise TemplateLoadError(path, f"expected an object, got {value!r}")
+        if self.fields is None:
+            self.fields = self._compile()
+        kwargs = {}
+        for name, item in value.items():
+            try:
+                field, convert = self.fields[name]
+            except KeyError:
+                raise TemplateLoadError(
+                    path, f"{self.cls.__name__} has no property {name!r}"
+                )
+            kwargs[field] = convert(loader, item, f"{path}.{name}")
+        try:
+            return self.cls(**kwargs)
+        except TypeError as e:
+            raise TemplateLoadError(path, str(e))
+
+
+_STRUCT_CONVERTERS: Dict[type, _StructConverter] = {}
+
+
+def _struct_converter(cls: type) -> _StructConverter:
+    converter = _STRUCT_CONVERTERS.get(cls)
+    if converter is None:
+        converter = _STRUCT_CONVERTERS[cls] = _StructConverter(cls)
+    return converter
+
+
+def _list_converter(convert_item: _Convert) -> _Convert:
+    def convert(loader: "_Loader", value: Any, path: str) -> Any:
+        if not isinstance(value, list):
+            raise TemplateLoadError(
+                path,
+                f"expected a list, got {value!r} (nimbus can't use intrinsic "
+                "functions in place of lists)",
+            )
+        return [
+            convert_item(loader, item, f"{path}[{i}]") for i, item in enumerate(value)
+        ]
+
+    return convert
+
+
+def _dict_converter(convert_value: _Convert) -> _Convert:
+    def convert(loader: "_Loader", value: Any, path: str) -> Any:
+        if not isinstance(value, dict) or _is_intrinsic(value):
+            raise TemplateLoadError(path, f"expected a map, got {value!r}")
+        return {
+            key: convert_value(loader, item, f"{path}.{key}")
+            for key, item in value.items()
+        }
+
+    return convert
+
+
+def _converter(hint: Any) -> _Convert:
+    """Compile a converter for a type hint of a generated class."""
+    return compile_hint(
+        hint,
+        _PRIMITIVE_CONVERTERS,
+        _list_converter,
+        _dict_converter,
+        _struct_converter,
+    )
+
+
+_PARAMETER_KEYS = {
+    "Type",
+    "Description",
+    "Default",
+    "NoEcho",
+    "AllowedValues",
+    "AllowedPattern",
+    "MinLength",
+    "MaxLength",
+    "MinValue",
+    "MaxValue",
+    "ConstraintDescription",
+}
+_RESOURCE_KEYS = {"Type", "Properties", "Condition"}
+_OUTPUT_KEYS = {"Value", "Description", "Export", "Condition"}
+_SECTIONS = {
+    "AWSTemplateFormatVersion",
+    "Description",
+    "Parameters",
+    "Conditions",
+    "Resources",
+    "Outputs",
+}
+
+
+def _check_keys(value: Any, allowed: Set[str], path: str) -> None:
+    if not isinstance(value, dict):
+        raise TemplateLoadError(path, f"expected an object, got {value!r}")
+    unsupported = value.keys() - allowed
+    if unsupported:
+        raise TemplateLoadError(
+            path, f"unsupported keys: {', '.join(sorted(unsupported))}"
+        )
+
+
+def _parameter(value: Any, path: str) -> Parameter:
+    _check_keys(value, _PARAMETER_KEYS, path)
+    type_ = value["Type"]
+    cls: Type[Parameter]
+    if type_ == "Number":
+        cls = ParameterNumber
+    elif type_ == "List<Number>":
+        cls = ParameterNumberList
+    elif type_ == "CommaDelimitedList" or type_.startswith("List<"):
+        cls = ParameterCommaDelineatedList
+    else:
+        # String and the AWS-specific parameter types
+        cls = ParameterString
+    # Constraints only apply to some types of parameters
+    _check_keys(value, set(cls._fields), path)
+    fields = dict(value)
+    if isinstance(fields.get("NoEcho"), str):
+        fields["NoEcho"] = fields["NoEcho"].lower() == "true"
+    return cls(**fields)
+
+
+class _Loader:
+    def __init__(self, document: Dict[str, Any]) -> None:
+        self.document = document
+        self.parameters = {
+            logical_id: _parameter(value, f"Parameters.{logical_id}")
+            for logical_id, value in document.get("Parameters", {}).items()
+        }
+        self.raw_resources: Dict[str, Any] = document.get("Resources", {})
+        self.resources: Dict[str, Resource] = {}
+        self.building: Set[str] = set()
+
+    def resource(self, logical_id: str, path: str) -> Resource:
+        resource = self.resources.get(logical_id)
+        if resource is not None:
+            return resource
+        if logical_id not in self.raw_resources:
+            raise TemplateLoadError(path, f"unknown resource {logical_id!r}")
+        if logical_id in self.building:
+            raise TemplateLoadError(path, f"circular reference to {logical_id!r}")
+        self.building.add(logical_id)
+        resource_path = f"Resources.{logical_id}"
+        raw = self.raw_resources[logical_id]
+        _check_keys(raw, _RESOURCE_KEYS, resource_path)
+        try:
+            cls = resource_class(raw["Type"])
+        except KeyError:
+            raise TemplateLoadError(
+                resource_path, f"unknown resource type {raw['Type']!r}"
+            )
+        resource = _struct_converter(cls)(
+            self, raw.get("Properties", {}), f"{resource_path}.Properties"
+        )
+        self.building.discard(logical_id)
+        self.resources[logical_id] = resource
+        return resource
+
+    def ref(self, name: str, path: str) -> Any:
+        parameter = self.parameters.get(name)
+        if parameter is not None:
+            return parameter
+        if name in self.raw_resources:
+            return self.resource(name, path)
+        if name.startswith("AWS::"):
+            return PseudoParameter(name)
+        raise TemplateLoadError(path, f"unknown Ref {name!r}")
+
+    def intrinsic(self, value: Any, path: str, convert: _Convert) -> Any:
+        """Convert an intrinsic function. `convert` converts the values that
+        `Fn::If` may choose between."""
+        if not _is_intrinsic(value):
+            raise TemplateLoadError(path, f"unexpected value {value!r}")
+        [(function, args)] = value.items()
+        path = f"{path}.{function}"
+        if function == "Ref":
+            return self.ref(args, path)
+        if function == "Fn::GetAtt":
+            if isinstance(args, str):
+                args = args.split(".", 1)
+            logical_id, attribute_name = args
+            attribute_class = _ATTRIBUTE_CLASSES.get(convert)
+            if attribute_class is None:
+                raise TemplateLoadError(
+                    path, "nimbus can only use Fn::GetAtt in place of strings"
+                )
+            return attribute_class(self.resource(logical_id, path), attribute_name)
+        if function == "Fn::Sub":
+            if isinstance(args, str):
+                return Sub(args)
+            format_string, variables = args
+            return Sub(
+                format_string,
+                **{
+                    key: self.any(item, f"{path}.{key}")
+                    for key, item in variables.items()
+                },
+            )
+        if function == "Fn::ImportValue":
+            if not isinstance(args, str):
+                raise TemplateLoadError(path, "only literal export names are supported")
+            return ImportValue(args)
+        if function == "Fn::If":
+            name, value_if_true, value_if_false = args
+            return If(
+                name,
+                self.branch(value_if_true, f"{path}[1]", convert),
+                self.branch(value_if_false, f"{path}[2]", convert),
+            )
+        return Fn(function, self.any(args, path))
+
+    def branch(self, value: Any, path: str, convert: _Convert) -> Any:
+        if value == {"Ref": "AWS::NoValue"}:
+            return PseudoParameter("AWS::NoValue")
+        return convert(self, value, path)
+
+    def any(self, value: Any, path: str) -> Any:
+        if isinstance(value, dict):
+            if _is_intrinsic(value):
+                return self.intrinsic(value, path, _json)
+            return {key: self.any(item, f"{path}.{key}") for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.any(item, f"{path}[{i}]") for i, item in enumerate(value)]
+        return value
+
+    def condition(self, value: Any, path: str) -> Any:
+        if not isinstance(value, dict) or len(value) != 1:
+            raise TemplateLoadError(path, f"invalid condition {value!r}")
+        [(function, args)] = value.items()
+        path = f"{path}.{function}"
+        if function == "Condition":
+            return Condition(args)
+        if function == "Fn::Equals":
+            return Equals(
+                self.any(args[0], f"{path}[0]"), self.any(args[1], f"{path}[1]")
+            )
+        if function == "Fn::Not":
+            return Not(self.condition(args[0], f"{path}[0]"))
+        if function in ("Fn::And", "Fn::Or"):
+            conditions = [
+                self.condition(arg, f"{path}[{i}]") for i, arg in enumerate(args)
+            ]
+            return And(conditions) if function == "Fn::And" else Or(conditions)
+        raise TemplateLoadError(path, f"unsupported condition function {function}")
+
+    def output(self, value: Any, path: str) -> Output:
+        _check_keys(value, _OUTPUT_KEYS, path)
+        export = value.get("Export")
+        if export is not None:
+            if not isinstance(export.get("Name"), str):
+                raise TemplateLoadError(
+                    f"{path}.Export", "only literal export names are supported"
+                )
+            export = Export(Name=export["Name"])
+        return Output(
+            Value=self.any(value["Value"], f"{path}.Value"),
+            Description=value.get("Description"),
+            Export=export,
+            Condition=value.get("Condition"),
+        )
+
+    def template(self) -> Template:
+        _check_keys(self.document, _SECTIONS, "Template")
+        for logical_id in self.raw_resources:
+            self.resource(logical_id, f"Resources.{logical_id}")
+        resource_conditions = {
+            logical_id: raw["Condition"]
+            for logical_id, raw in self.raw_resources.items()
+            if "Condition" in raw
+        }
+        return Template(
+            description=self.document.get("Description", ""),
+            parameters=self.parameters,
+            # In the document's order, not the order they were built in
+            resources={
+                logical_id: self.resources[logical_id]
+                for logical_id in self.raw_resources
+            },
+            outputs=(
+                {
+                    logical_id: self.output(value, f"Outputs.{logical_id}")
+                    for logical_id, value in self.document["Outputs"].items()
+                }
+                if "Outputs" in self.document
+                else None
+            ),
+            conditions=(
+                {
+                    name: self.condition(value, f"Conditions.{name}")
+                    for name, value in self.document["Conditions"].items()
+                }
+                if "Conditions" in self.document
+                else None
+            ),
+            resource_conditions=resource_conditions or None,
+        )
+
+
+@contextmanager
+def _gc_paused() -> Iterator[None]:
+    # Loading allocates many objects and frees almost none, so the cyclic
+    # garbage collector's passes over them are wasted; they took about half
+    # the time of loading a large template.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+# Converts values outside of any template, so intrinsic functions in them
+# can't refer to anything.
+_NO_TEMPLATE = _Loader({})
+
+
+def converter(hint: Any) -> Callable[[Any, str], Any]:
+    """A function converting values to `hint`, the type hint of a field of a
+    generated class, the way `load_template()` converts property values:
+    e.g. `"300"` to `300` for an integer, and dicts to property types. It's
+    called with the value and the value's location, which `TemplateLoadError`
+    reports if the value can't be converted."""
+    return partial(_converter(hint), _NO_TEMPLATE)
+
+
+def template_from_cloudformation(document: Dict[str, Any]) -> Template:
+    """Build a `Template` from a parsed CloudFormation document."""
+    with _gc_paused():
+        return _Loader(document).template()
+
+
+@lru_cache()
+def _yaml_loader() -> Any:
+    import yaml
+
+    base = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+    class CloudFormationLoader(base):  # type: ignore
+        pass
+
+    # Template values like `AWSTemplateFormatVersion: 2010-09-09` are strings
+    # to CloudFormation, not dates.
+    CloudFormationLoader.yaml_implicit_resolvers = {
+        first: [
+            (tag, regexp)
+            for tag, regexp in resolvers
+            if tag != "tag:yaml.org,2002:timestamp"
+        ]
+        for first, resolvers in base.yaml_implicit_resolvers.items()
+    }
+
+    def short_form(loader: Any, suffix: str, node: Any) -> Dict[str, Any]:
+        if isinstance(node, yaml.ScalarNode):
+            value: Any = loader.construct_scalar(node)
+        elif isinstance(node, yaml.SequenceNode):
+            value = loader.construct_sequence(node, deep=True)
+        else:
+            value = loader.construct_mapping(node, deep=True)
+        if suffix in ("Ref", "Condition"):
+            return {suffix: value}
+        if suffix == "GetAtt" and isinstance(value, str):
+            value = value.split(".", 1)
+        return {f"Fn::{suffix}": value}
+
+    CloudFormationLoader.add_multi_constructor("!", short_form)
+    return CloudFormationLoader
+
+
+def parse_template(text: str) -> Template:
+    """Parse a JSON or YAML CloudFormation template."""
+    with _gc_paused():
+        if text.lstrip().startswith("{"):
+            return template_from_cloudformation(json.loads(text))
+        import yaml
+
+        return template_from_cloudformation(yaml.load(text, Loader=_yaml_loader()))
+
+
+def load_template(path: str) -> Template:
+    with open(path) as f:
+        return parse_template(f.read())
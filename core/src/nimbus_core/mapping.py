@@ -0,0 +1,142 @@
+"""Hoisting of repeated literals into the Mappings section."""
+
+import json
+from typing import Any, Dict, List
+
+# Intrinsics whose arguments must stay literal (logical IDs, attribute
+# names, `Fn::Sub` format strings, ...).
+_OPAQUE = frozenset(
+    (
+        "Condition",
+        "Fn::FindInMap",
+        "Fn::GetAZs",
+        "Fn::GetAtt",
+        "Fn::ImportValue",
+        "Fn::Sub",
+        "Fn::Transform",
+        "Ref",
+    )
+)
+
+# Argument positions of intrinsics that must stay literal (condition names,
+# delimiters, indices and counts); the other arguments are visited.
+_LITERAL_ARGUMENTS = {
+    "Fn::Cidr": (1, 2),
+    "Fn::If": (0,),
+    "Fn::Join": (0,),
+    "Fn::Select": (0,),
+    "Fn::Split": (0,),
+}
+
+# Literals per top-level key, keeping each key under CloudFormation's limit
+# on attributes per mapping.
+_GROUP_SIZE = 100
+
+
+def _size(value: Any) -> int:
+    return len(json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode())
+
+
+class _Hoister:
+    def __init__(self, min_length: int) -> None:
+        self.min_length = min_length
+        self.counts: Dict[str, int] = {}
+        self.replacements: Dict[str, Any] = {}
+
+    def _visit(self, value: Any, replace: bool) -> Any:
+        if isinstance(value, str):
+            if not replace:
+                if len(value) >= self.min_length:
+                    self.counts[value] = self.counts.get(value, 0) + 1
+                return value
+            return self.replacements.get(value, value)
+        if isinstance(value, list):
+            return [self._visit(item, replace) for item in value]
+        if isinstance(value, dict):
+            if len(value) == 1:
+                ((key, arguments),) = value.items()
+                if key in _OPAQUE:
+                    return value
+                literal = _LITERAL_ARGUMENTS.get(key)
+                if literal is not None and isinstance(arguments, list):
+                    return {
+                        key: [
+                            item if i in literal else self._visit(item, replace)
+                            for i, item in enumerate(arguments)
+                        ]
+                    }
+            return {key: self._visit(item, replace) for key, item in value.items()}
+        return value
+
+    def visit(self, document: Dict[str, Any], replace: bool) -> Dict[str, Any]:
+        output = dict(document)
+        resources = {}
+        for logical_id, resource in document.get("Resources", {}).items():
+            resource = dict(resource)
+            if "Properties" in resource:
+                resource["Properties"] = self._visit(resource["Properties"], replace)
+            resources[logical_id] = resource
+        output["Resources"] = resources
+        if "Outputs" in document:
+            outputs = {}
+            for logical_id, out in document["Outputs"].items():
+                out = dict(out)
+                out["Value"] = self._visit(out["Value"], replace)
+                outputs[logical_id] = out
+            output["Outputs"] = outputs
+        return output
+
+
+def hoist_literals(
+    document: Dict[str, Any], min_length: int = 32, mapping_name: str = "Literals"
+) -> Dict[str, Any]:
+    """Move string literals that are repeated in a rendered template's
+    resource properties and output values into a mapping, replacing each
+    occurrence with an `Fn::FindInMap`.
+
+    Only strings at least `min_length` characters long are considered, and
+    only those that pay for their mapping entry are hoisted. If the result
+    isn't smaller than `document` (measured as compact JSON), `document` is
+    returned unchanged.
+    """
+    mappings = document.get("Mappings", {})
+    name = mapping_name
+    suffix = 1
+    while name in mappings:
+        suffix += 1
+        name = f"{mapping_name}{suffix}"
+
+    hoister = _Hoister(min_length)
+    hoister.visit(document, replace=False)
+    literals: List[str] = []
+    for literal, count in hoister.counts.items():
+        if count < 2:
+            continue
+        key = len(literals)
+        group, item = f"G{key // _GROUP_SIZE}", f"L{key % _GROUP_SIZE}"
+        reference = {"Fn::FindInMap": [name, group, item]}
+        # The entry costs `"L0":"literal",` in the mapping.
+        entry = _size(item) + _size(literal) + 2
+        if count * (_size(literal) - _size(reference)) > entry:
+            hoister.replacements[literal] = reference
+            literals.append(literal)
+    if not literals:
+        return document
+
+    mapping: Dict[str, Dict[str, str]] = {}
+    for key, literal in enumerate(literals):
+        group = mapping.setdefault(f"G{key // _GROUP_SIZE}", {})
+        group[f"L{key % _GROUP_SIZE}"] = literal
+    hoisted = hoister.visit(document, replace=True)
+    output: Dict[str, Any] = {}
+    for section, value in hoisted.items():
+        if (
+            section in ("Conditions", "Resources", "Outputs")
+            and "Mappings" not in output
+        ):
+            output["Mappings"] = {**mappings, name: mapping}
+        if section != "Mappings":
+            output[section] = value
+    if _size(output) >= _size(document):
+        return document
+    return output
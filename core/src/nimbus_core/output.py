@@ -0,0 +1,61 @@
+from typing import Any, Callable, Dict, NamedTuple, Optional, Union
+
+from nimbus_core.parameter import Parameter
+from nimbus_core.reference import property_json_reference
+from nimbus_core.resource import Resource
+
+# Outputs
+# https://docs.aws.amazon.com/AWSCloudFormation/latest/UserGuide/outputs-section-structure.html
+
+
+class Export(NamedTuple):
+    # Export names are plain strings (rather than `PropertyString`s) so other
+    # templates can import them and `ExportIndex` can check them at synth
+    # time.
+    Name: str
+
+
+class Output(NamedTuple):
+    Value: Any
+    Description: Optional[str] = None
+    Export: Optional[Export] = None
+    Condition: Optional[str] = None
+
+
+class ImportValue(NamedTuple):
+    """`Fn::ImportValue` of another stack's export. `export` is either the
+    export name or the `Export` object from the other nimbus template."""
+
+    export: Union[str, Export]
+
+    @property
+    def export_name(self) -> str:
+        if isinstance(self.export, Export):
+            return self.export.Name
+        return self.export
+
+    def intrinsic_to_cloudformation(
+        self,
+        resource_logical_id: Callable[[Resource], str],
+        parameter_logical_id: Callable[[Parameter], str],
+    ) -> Dict[str, Any]:
+        return {"Fn::ImportValue": self.export_name}
+
+
+def output_to_cloudformation(
+    output: Output,
+    resource_logical_id: Callable[[Resource], str],
+    parameter_logical_id: Callable[[Parameter], str],
+) -> Dict[str, Any]:
+    rendered: Dict[str, Any] = {
+        "Value": property_json_reference(
+            output.Value, resource_logical_id, parameter_logical_id
+        )
+    }
+    if output.Description is not None:
+        rendered["Description"] = output.Description
+    if output.Export is not None:
+        rendered["Export"] = {"Name": output.Export.Name}
+    if output.Condition is not None:
+        rendered["Condition"] = output.Condition
+    return rendered
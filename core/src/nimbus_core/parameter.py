@@ -5,8 +5,9 @@ from typing_extensions import Literal
 # Parameters
 # https://docs.aws.amazon.com/AWSCloudFormation/latest/UserGuide/parameters-section-structure.html
 # NOTE: Distinct types of parameters for better type-checking support (can't
-# pass a number param into a PropertyString)). All parameters must have the same
-# fields.
+# pass a number param into a PropertyString)). All parameters have the same
+# Type, Description, Default and NoEcho fields; constraint fields are only on
+# the types CloudFormation accepts them for.
 # TODO: Override __hash__ for the same reason as __eq__?
 
 
@@ -15,6 +16,11 @@ class ParameterString(NamedTuple):
     Description: Optional[str] = None
     Default: Optional[str] = None
     NoEcho: bool = False
+    AllowedValues: Optional[List[str]] = None
+    AllowedPattern: Optional[str] = None
+    MinLength: Optional[int] = None
+    MaxLength: Optional[int] = None
+    ConstraintDescription: Optional[str] = None
 
     def __eq__(self, other: object) -> bool:
         """Compare a Parameter with another object.
@@ -37,6 +43,10 @@ class ParameterNumber(NamedTuple):
     Description: Optional[str] = None
     Default: Optional[Union[int, float]] = None
     NoEcho: bool = False
+    AllowedValues: Optional[List[Union[int, float]]] = None
+    MinValue: Optional[Union[int, float]] = None
+    MaxValue: Optional[Union[int, float]] = None
+    ConstraintDescription: Optional[str] = None
 
     def __eq__(self, other: object) -> bool:
         """Compare a Parameter with another object.
@@ -57,8 +67,11 @@ class ParameterNumber(NamedTuple):
 class ParameterNumberList(NamedTuple):
     Type: Literal["List<Number>"] = "List<Number>"
     Description: Optional[str] = None
-    Default: Optional[List[Union[int, float]]] = None
+    # A list, or a string of comma-separated values as in a template
+    Default: Optional[Union[str, List[Union[int, float]]]] = None
     NoEcho: bool = False
+    AllowedValues: Optional[List[Union[int, float]]] = None
+    ConstraintDescription: Optional[str] = None
 
     def __eq__(self, other: object) -> bool:
         """Compare a Parameter with another object.
@@ -79,8 +92,12 @@ class ParameterNumberList(NamedTuple):
 class ParameterCommaDelineatedList(NamedTuple):
     Type: Literal["CommaDelineatedList"] = "CommaDelineatedList"
     Description: Optional[str] = None
-    Default: Optional[List[str]] = None
+    # A list, or a string of comma-separated values as in a template
+    Default: Optional[Union[str, List[str]]] = None
     NoEcho: bool = False
+    AllowedValues: Optional[List[str]] = None
+    AllowedPattern: Optional[str] = None
+    ConstraintDescription: Optional[str] = None
 
     def __eq__(self, other: object) -> bool:
         """Compare a Parameter with another object.
@@ -109,12 +126,31 @@ Parameter = Union[
 ]
 
 
+_CONSTRAINT_KEYS = (
+    "AllowedValues",
+    "AllowedPattern",
+    "MinLength",
+    "MaxLength",
+    "MinValue",
+    "MaxValue",
+    "ConstraintDescription",
+)
+
+
 def parameter_to_cloudformation(parameter: Parameter) -> Dict[str, Any]:
     output: Dict[str, Any] = {"Type": parameter.Type}
     if parameter.Description is not None:
         output["Description"] = parameter.Description
     if parameter.Default is not None:
-        output["Default"] = parameter.Default
+        default = parameter.Default
+        if isinstance(default, list):
+            # CloudFormation takes list defaults as comma-separated strings
+            default = ",".join(str(item) for item in default)
+        output["Default"] = default
     if parameter.NoEcho:
         output["NoEcho"] = parameter.NoEcho
+    for key in _CONSTRAINT_KEYS:
+        value = getattr(parameter, key, None)
+        if value is not None:
+            output[key] = value
     return output
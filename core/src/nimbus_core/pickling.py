@@ -0,0 +1,87 @@
+"""Compact pickling of object graphs of resources, property types,
+parameters and intrinsic functions."""
+
+import io
+import pickle
+from typing import Any, Dict, List, Tuple
+
+_REQUIRED = object()
+
+
+def _restore(cls: type, mask: int, *values: Any) -> Any:
+    fields = cls._fields  # type: ignore
+    defaults = cls._field_defaults  # type: ignore
+    it = iter(values)
+    return cls(
+        *(
+            next(it) if mask >> i & 1 else defaults[field]
+            for i, field in enumerate(fields)
+        )
+    )
+
+
+class _Pickler(pickle.Pickler):
+    """Pickles NamedTuples as their class, a bitmask of the fields that
+    aren't at their defaults and those fields' values, with equal strings
+    written once.
+
+    Classes and `_restore` are pickled once and referenced through the
+    memo afterwards, which makes them per-class type codes; the memo also
+    preserves object identity, so a parameter or resource referenced from
+    many places is still one object after loading.
+    """
+
+    def __init__(self, file: io.BytesIO, protocol: int) -> None:
+        super().__init__(file, protocol)
+        self.strings: Dict[str, str] = {}
+        # Per NamedTuple class, the default of each field (`_REQUIRED` for
+        # required fields).
+        self.defaults: Dict[type, List[Any]] = {}
+        # Copies of lists and dicts with interned strings, by id() of the
+        # original (kept alive alongside its copy so ids aren't reused).
+        self.copies: Dict[int, Tuple[Any, Any]] = {}
+
+    def intern(self, value: Any) -> Any:
+        if isinstance(value, str):
+            return self.strings.setdefault(value, value)
+        if isinstance(value, (list, dict)):
+            copied = self.copies.get(id(value))
+            if copied is None:
+                if isinstance(value, list):
+                    copy: Any = [self.intern(item) for item in value]
+                else:
+                    copy = {
+                        self.intern(key): self.intern(item)
+                        for key, item in value.items()
+                    }
+                copied = self.copies[id(value)] = (value, copy)
+            return copied[1]
+        return value
+
+    def reducer_override(self, obj: Any) -> Any:
+        cls = type(obj)
+        defaults = self.defaults.get(cls)
+        if defaults is None:
+            if not (isinstance(obj, tuple) and hasattr(cls, "_fields")):
+                return NotImplemented
+            field_defaults = cls._field_defaults  # type: ignore
+            defaults = self.defaults[cls] = [
+                field_defaults.get(field, _REQUIRED)
+                for field in cls._fields  # type: ignore
+            ]
+        mask = 0
+        values: List[Any] = []
+        for i, (default, value) in enumerate(zip(defaults, obj)):
+            if value is not default:
+                mask |= 1 << i
+                values.append(self.intern(value))
+        return _restore, (cls, mask, *values)
+
+
+def compact_dumps(obj: Any, protocol: int = pickle.HIGHEST_PROTOCOL) -> bytes:
+    """Pickle `obj` (e.g. a template) compactly; load it with
+    `pickle.loads()`. NamedTuple fields left at their defaults are
+    omitted, which is most fields of most generated classes."""
+    f = io.BytesIO()
+    _Pickler(f, protocol).dump(obj)
+    return f.getvalue()
@@ -0,0 +1,190 @@
+"""Optional render instrumentation.
+
+Pass a `RenderProfiler` to `Template.template_to_cloudformation()` to find
+out where render time goes:
+
+    profiler = RenderProfiler(on_resource=print)
+    template.template_to_cloudformation(profiler=profiler)
+    print(profiler.report.seconds_by_type())
+
+Renders without a profiler don't run any of this code, apart from a check
+in each reference function that no profiled render is running.
+"""
+
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from nimbus_core import reference
+from nimbus_core.parameter import Parameter
+from nimbus_core.reference import _reference_calls
+from nimbus_core.resource import Resource
+from nimbus_core.template import LogicalIDIndex, Template
+
+# The reference functions that render property values. They count their
+# calls (including those for values nested in JSON properties) while a
+# profiled render runs in the same context.
+REFERENCE_FUNCTIONS = (
+    "property_string_reference",
+    "property_long_reference",
+    "property_integer_reference",
+    "property_double_reference",
+    "property_boolean_reference",
+    "property_timestamp_reference",
+    "property_json_reference",
+)
+
+# Guards `reference._active_profilers` against renders in other threads.
+_active_profilers_lock = threading.Lock()
+
+
+class ResourceTiming(NamedTuple):
+    logical_id: str
+    resource_type: str
+    seconds: float
+    json_nodes: int
+
+
+class RenderReport(NamedTuple):
+    seconds: float
+    resources: List[ResourceTiming]
+    reference_calls: Dict[str, int]
+    logical_id_hits: int
+    logical_id_misses: int
+
+    @property
+    def json_nodes(self) -> int:
+        return sum(timing.json_nodes for timing in self.resources)
+
+    def seconds_by_type(self) -> Dict[str, float]:
+        """Total render time per resource type, slowest first."""
+        totals: Dict[str, float] = {}
+        for timing in self.resources:
+            totals[timing.resource_type] = (
+                totals.get(timing.resource_type, 0.0) + timing.seconds
+            )
+        return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+    def logical_id_hit_ratio(self) -> float:
+        """The fraction of logical ID lookups answered by the identity index
+        rather than by scanning the template. 1.0 if there were no lookups."""
+        lookups = self.logical_id_hits + self.logical_id_misses
+        if lookups == 0:
+            return 1.0
+        return self.logical_id_hits / lookups
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "Seconds": self.seconds,
+            "JSONNodes": self.json_nodes,
+            "LogicalIDHitRatio": self.logical_id_hit_ratio(),
+            "ReferenceCalls": dict(self.reference_calls),
+            "SecondsByType": self.seconds_by_type(),
+            "Resources": {
+                timing.logical_id: {
+                    "Type": timing.resource_type,
+                    "Seconds": timing.seconds,
+                    "JSONNodes": timing.json_nodes,
+                }
+                for timing in self.resources
+            },
+        }
+
+
+class _CountingIndex(LogicalIDIndex):
+    def __init__(self, template: Template, share_rendered: bool) -> None:
+        super().__init__(template, share_rendered)
+        self.hits = 0
+        self.misses = 0
+
+    def resource_logical_id(self, r: Resource) -> str:
+        if id(r) in self.resources:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return super().resource_logical_id(r)
+
+    def parameter_logical_id(self, p: Parameter) -> str:
+        if id(p) in self.parameters:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return super().parameter_logical_id(p)
+
+
+def _count_json_nodes(value: Any) -> int:
+    if isinstance(value, dict):
+        return 1 + sum(_count_json_nodes(v) for v in value.values())
+    if isinstance(value, list):
+        return 1 + sum(_count_json_nodes(v) for v in value)
+    return 1
+
+
+class RenderProfiler:
+    """Collects a `RenderReport` for each render it is passed to.
+
+    `on_resource` is called with a `ResourceTiming` as soon as each resource
+    is rendered and `on_report` with the finished `RenderReport`.
+
+    Reference calls are counted per context (thread or asyncio task), so
+    renders running concurrently with a profiled one aren't counted.
+    """
+
+    def __init__(
+        self,
+        on_resource: Optional[Callable[[ResourceTiming], None]] = None,
+        on_report: Optional[Callable[[RenderReport], None]] = None,
+    ) -> None:
+        self.on_resource = on_resource
+        self.on_report = on_report
+        self.reports: List[RenderReport] = []
+
+    @property
+    def report(self) -> Optional[RenderReport]:
+        """The report for the most recent render, if any."""
+        return self.reports[-1] if self.reports else None
+
+    def render(
+        self, template: Template, share_rendered: bool = False
+    ) -> Dict[str, Any]:
+        counts: Counter = Counter({name: 0 for name in REFERENCE_FUNCTIONS})
+        index = _CountingIndex(template, share_rendered)
+        timings: List[ResourceTiming] = []
+        resources: Dict[str, Any] = {}
+
+        start = time.perf_counter()
+        with _active_profilers_lock:
+            reference._active_profilers += 1
+        token = _reference_calls.set(counts)
+        try:
+            for logical_id, resource in template.resources.items():
+                resource_start = time.perf_counter()
+                output = template.render_resource(logical_id, resource, index)
+                timing = ResourceTiming(
+                    logical_id=logical_id,
+                    resource_type=output.get("Type", type(resource).__name__),
+                    seconds=time.perf_counter() - resource_start,
+                    json_nodes=_count_json_nodes(output),
+                )
+                resources[logical_id] = output
+                timings.append(timing)
+                if self.on_resource is not None:
+                    self.on_resource(timing)
+            document = template.document(index, resources)
+        finally:
+            _reference_calls.reset(token)
+            with _active_profilers_lock:
+                reference._active_profilers -= 1
+
+        report = RenderReport(
+            seconds=time.perf_counter() - start,
+            resources=timings,
+            reference_calls=dict(counts),
+            logical_id_hits=index.hits,
+            logical_id_misses=index.misses,
+        )
+        self.reports.append(report)
+        if self.on_report is not None:
+            self.on_report(report)
+        return document
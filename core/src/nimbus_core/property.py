@@ -11,30 +11,37 @@ from nimbus_core.attribute import (
 )
 from nimbus_core.parameter import ParameterNumber, ParameterString
 from nimbus_core.resource import Resource
-from nimbus_core.intrinsic import Sub
+from nimbus_core.intrinsic import IntrinsicFunction, Sub
 
 PROPERTY_STRING_TYPES = (str, AttributeString, ParameterString, Sub, Resource)
-PropertyString = Union[str, AttributeString, ParameterString, "Sub", Resource]
+# Any other intrinsic function (e.g. `ImportValue` or `If`) may also stand in
+# for a property value; the `property_*_reference` functions render it as a
+# last resort.
+PropertyString = Union[
+    str, AttributeString, ParameterString, Sub, Resource, IntrinsicFunction
+]
 
 
 PROPERTY_LONG_TYPES = (int, AttributeLong, ParameterNumber)
-PropertyLong = Union[int, AttributeLong, ParameterNumber]
+PropertyLong = Union[int, AttributeLong, ParameterNumber, IntrinsicFunction]
 
 
 PROPERTY_INTEGER_TYPES = (int, AttributeInteger, ParameterNumber)
-PropertyInteger = Union[int, AttributeInteger, ParameterNumber]
+PropertyInteger = Union[int, AttributeInteger, ParameterNumber, IntrinsicFunction]
 
 
 PROPERTY_DOUBLE_TYPES = (float, AttributeDouble, ParameterNumber)
-PropertyDouble = Union[float, AttributeDouble, ParameterNumber]
+PropertyDouble = Union[float, AttributeDouble, ParameterNumber, IntrinsicFunction]
 
 
 PROPERTY_BOOLEAN_TYPES = (bool, AttributeBoolean, ParameterString)
-PropertyBoolean = Union[bool, AttributeBoolean, ParameterString]
+PropertyBoolean = Union[bool, AttributeBoolean, ParameterString, IntrinsicFunction]
 
 
 PROPERTY_TIMESTAMP_TYPES = (datetime, AttributeTimestamp, ParameterString)
-PropertyTimestamp = Union[datetime, AttributeTimestamp, ParameterString]
+PropertyTimestamp = Union[
+    datetime, AttributeTimestamp, ParameterString, IntrinsicFunction
+]
 
 
 PropertyJSON = Dict[str, Any]
@@ -0,0 +1,29 @@
+"""Bulk creation of near-identical resources."""
+
+from typing import Any, Dict, Generic, Iterable, List, TypeVar
+
+R = TypeVar("R")
+
+
+class Prototype(Generic[R]):
+    """A resource to make variants of by overriding a few fields, e.g.
+
+        prototype = Prototype(Queue(MessageRetentionPeriod=1209600))
+        queues = prototype.variants({"QueueName": name} for name in names)
+
+    Variants share every field that isn't overridden with the prototype by
+    reference, so they cost one tuple each plus their overrides. When
+    variants of the same prototype are rendered one after another with
+    `share_rendered` (see `LogicalIDIndex`), the shared fields are rendered
+    once and spliced into every variant, so render time scales with the
+    overrides too.
+    """
+
+    def __init__(self, resource: R) -> None:
+        self.resource = resource
+
+    def variant(self, **overrides: Any) -> R:
+        return self.resource._replace(**overrides)  # type: ignore
+
+    def variants(self, overrides: Iterable[Dict[str, Any]]) -> List[R]:
+        return [self.variant(**fields) for fields in overrides]
@@ -1,5 +1,7 @@
+from collections import Counter
+from contextvars import ContextVar
 from datetime import datetime
-from typing import Any, Callable, Dict, List, Union
+from typing import Any, Callable, Dict, List, Optional, Union
 
 from nimbus_core.attribute import Attribute, AttributeString
 from nimbus_core.intrinsic import IntrinsicFunction, Sub, Substitutable
@@ -27,15 +29,43 @@ from nimbus_core.property import (
 from nimbus_core.resource import Resource
 
 
+# The number of profiled renders running (see `nimbus_core.profile`). The
+# reference functions below only count their calls while there are any, so
+# an unprofiled render pays for one global lookup per call.
+_active_profilers = 0
+
+# Calls to each of the reference functions below during a profiled render
+# in the current context, None otherwise.
+_reference_calls: ContextVar[Optional[Counter]] = ContextVar(
+    "reference_calls", default=None
+)
+
+
+def _count_call(name: str) -> None:
+    calls = _reference_calls.get()
+    if calls is not None:
+        calls[name] += 1
+
+
 def _ref(logical_id: str) -> Dict[str, Any]:
     return {"Ref": logical_id}
 
 
+def _no_resource_logical_id(resource: Resource) -> str:
+    # Non-string primitive properties aren't passed a resource_logical_id
+    # function, so intrinsic functions among them can't refer to resources.
+    raise TypeError(
+        f"Resources can't be referenced from non-string properties: {resource}"
+    )
+
+
 def property_string_reference(
     property_string: PropertyString,
     resource_logical_id: Callable[[Resource], str],
     parameter_logical_id: Callable[[Parameter], str],
 ) -> Union[str, Dict[str, Any]]:
+    if _active_profilers:
+        _count_call("property_string_reference")
     if isinstance(property_string, str):
         return property_string
     if isinstance(property_string, ParameterString):
@@ -48,6 +78,10 @@ def property_string_reference(
         return _ref(resource_logical_id(property_string))
     if isinstance(property_string, AttributeString):
         return property_string.attribute_to_cloudformation(resource_logical_id)
+    if isinstance(property_string, IntrinsicFunction):
+        return property_string.intrinsic_to_cloudformation(
+            resource_logical_id, parameter_logical_id
+        )
     raise TypeError(
         f"Invalid PropertyString: {property_string} ({type(property_string)})"
     )
@@ -56,10 +90,16 @@ def property_string_reference(
 def property_long_reference(
     property_long: PropertyLong, parameter_logical_id: Callable[[Parameter], str]
 ) -> Union[int, Dict[str, Any]]:
+    if _active_profilers:
+        _count_call("property_long_reference")
     if isinstance(property_long, int):
         return property_long
     if isinstance(property_long, ParameterNumber):
         return _ref(parameter_logical_id(property_long))
+    if isinstance(property_long, IntrinsicFunction):
+        return property_long.intrinsic_to_cloudformation(
+            _no_resource_logical_id, parameter_logical_id
+        )
     # TODO: handle AttributeLong
     raise TypeError(f"Invalid PropertyLong: {property_long} ({type(property_long)})")
 
@@ -67,10 +107,16 @@ def property_long_reference(
 def property_integer_reference(
     property_integer: PropertyInteger, parameter_logical_id: Callable[[Parameter], str],
 ) -> Union[int, Dict[str, Any]]:
+    if _active_profilers:
+        _count_call("property_integer_reference")
     if isinstance(property_integer, int):
         return property_integer
     if isinstance(property_integer, ParameterNumber):
         return _ref(parameter_logical_id(property_integer))
+    if isinstance(property_integer, IntrinsicFunction):
+        return property_integer.intrinsic_to_cloudformation(
+            _no_resource_logical_id, parameter_logical_id
+        )
     # TODO: handle AttributeInteger
     raise TypeError(
         f"Invalid PropertyInteger: {property_integer} ({type(property_integer)})"
@@ -80,10 +126,16 @@ def property_integer_reference(
 def property_double_reference(
     property_double: PropertyDouble, parameter_logical_id: Callable[[Parameter], str]
 ) -> Union[float, Dict[str, Any]]:
+    if _active_profilers:
+        _count_call("property_double_reference")
     if isinstance(property_double, float):
         return property_double
     if isinstance(property_double, ParameterNumber):
         return _ref(parameter_logical_id(property_double))
+    if isinstance(property_double, IntrinsicFunction):
+        return property_double.intrinsic_to_cloudformation(
+            _no_resource_logical_id, parameter_logical_id
+        )
     # TODO: handle AttributeDouble
     raise TypeError(
         f"Invalid PropertyDouble: {property_double} ({type(property_double)})"
@@ -93,10 +145,16 @@ def property_double_reference(
 def property_boolean_reference(
     property_boolean: PropertyBoolean, parameter_logical_id: Callable[[Parameter], str]
 ) -> Union[bool, Dict[str, Any]]:
+    if _active_profilers:
+        _count_call("property_boolean_reference")
     if isinstance(property_boolean, bool):
         return property_boolean
     if isinstance(property_boolean, ParameterString):
         return _ref(parameter_logical_id(property_boolean))
+    if isinstance(property_boolean, IntrinsicFunction):
+        return property_boolean.intrinsic_to_cloudformation(
+            _no_resource_logical_id, parameter_logical_id
+        )
     # TODO: handle AttributeBoolean
     raise TypeError(
         f"Invalid PropertyBoolean: {property_boolean} ({type(property_boolean)})"
@@ -107,10 +165,16 @@ def property_timestamp_reference(
     property_timestamp: PropertyTimestamp,
     parameter_logical_id: Callable[[Parameter], str],
 ) -> Union[datetime, Dict[str, Any]]:
+    if _active_profilers:
+        _count_call("property_timestamp_reference")
     if isinstance(property_timestamp, datetime):
         return property_timestamp
     if isinstance(property_timestamp, ParameterString):
         return _ref(parameter_logical_id(property_timestamp))
+    if isinstance(property_timestamp, IntrinsicFunction):
+        return property_timestamp.intrinsic_to_cloudformation(
+            _no_resource_logical_id, parameter_logical_id
+        )
     # TODO: handle AttributeTimestamp
     raise TypeError(
         f"Invalid PropertyTimestamp: {property_timestamp} ({type(property_timestamp)})"
@@ -126,6 +190,9 @@ def property_json_reference(
     resource_logical_id: Callable[[Resource], str],
     parameter_logical_id: Callable[[Parameter], str],
 ) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+    if _active_profilers:
+        _count_call("property_json_reference")
+
     def _process_value(value: Any) -> Any:
         if isinstance(value, PARAMETER_TYPES):
             return _ref(parameter_logical_id(value))
@@ -194,6 +261,10 @@ def substitutable_to_cloudformation(
         return substitutable.attribute_to_cloudformation(resource_logical_id)
     if isinstance(substitutable, PARAMETER_TYPES):
         return _ref(parameter_logical_id(substitutable))
+    if isinstance(substitutable, IntrinsicFunction):
+        return substitutable.intrinsic_to_cloudformation(
+            resource_logical_id, parameter_logical_id
+        )
     raise TypeError(
         f"Invalid Substitutable: {substitutable} (type={type(substitutable)})"
     )
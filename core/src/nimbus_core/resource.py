@@ -3,6 +3,10 @@ from typing import Any, Callable, Dict
 from nimbus_core.parameter import Parameter
 from typing_extensions import Protocol, runtime_checkable
 
+# Keep in sync with nimbus_codegen.ast.KEYWORDS: properties with these names
+# get a trailing underscore.
+_KEYWORDS = ("None",)
+
 
 @runtime_checkable
 class Resource(Protocol):
@@ -12,3 +16,10 @@ class Resource(Protocol):
         parameter_logical_id: Callable[[Parameter], str],
     ) -> Dict[str, Any]:
         ...
+
+
+def property_name(field: str) -> str:
+    """The CloudFormation property name for a field of a generated class."""
+    if field.endswith("_") and field[:-1] in _KEYWORDS:
+        return field[:-1]
+    return field
@@ -0,0 +1,216 @@
+"""Serialization of rendered templates."""
+
+import io
+import itertools
+import json
+import math
+import pickle
+from datetime import date, datetime, timezone
+from typing import Any, BinaryIO, Dict, Iterable, NamedTuple, Optional, Tuple, Union
+
+from nimbus_core.resource import Resource
+from nimbus_core.template import LogicalIDIndex, Template
+
+# CloudFormation's limits on the size of a template passed inline
+# (`TemplateBody`) and via S3 (`TemplateURL`), in bytes.
+TEMPLATE_BODY_LIMIT = 51_200
+TEMPLATE_URL_LIMIT = 1_000_000
+
+
+def _timestamp(value: datetime) -> str:
+    # Naive datetimes are taken to be UTC.
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    timestamp = value.strftime("%Y-%m-%dT%H:%M:%S")
+    if value.microsecond:
+        timestamp += f".{value.microsecond:06d}".rstrip("0")
+    return timestamp + "Z"
+
+
+def _canonical(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise ValueError(f"{value} can't be represented in JSON")
+        # 1.0 and 1 are the same number to CloudFormation; this also turns
+        # -0.0 into 0. Beyond 2**53 floats can't represent every integer, so
+        # leave those alone.
+        if value.is_integer() and abs(value) < 2 ** 53:
+            return int(value)
+        return value
+    if isinstance(value, datetime):
+        return _timestamp(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def canonical_json(template: Union[Template, Dict[str, Any]]) -> bytes:
+    """Serialize a template (or an already-rendered document) to canonical
+    JSON: UTF-8, no insignificant whitespace, object keys sorted, integral
+    floats written as integers and timestamps written as UTC ISO 8601
+    (`2020-01-02T03:04:05Z`).
+
+    The output depends only on the document's content, not on dict
+    insertion order or the Python version, so it is suitable for content
+    addressing. Key order carries no meaning anywhere in a CloudFormation
+    template, so sorting is always safe; list order is preserved.
+    """
+    if isinstance(template, Template):
+        template = template.template_to_cloudformation()
+    return json.dumps(
+        _canonical(template),
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        allow_nan=False,
+    ).encode("utf-8")
+
+
+class TemplateTooLarge(Exception):
+    def __init__(self, size: int, budget: int, logical_id: Optional[str]) -> None:
+        location = f" while writing {logical_id}" if logical_id is not None else ""
+        super().__init__(
+            f"template exceeds its {budget} byte budget{location} "
+            f"({size} bytes written so far)"
+        )
+        self.size = size
+        self.budget = budget
+        self.logical_id = logical_id
+
+
+class TemplateSize(NamedTuple):
+    size: int
+
+    @property
+    def fits_template_body(self) -> bool:
+        return self.size <= TEMPLATE_BODY_LIMIT
+
+    @property
+    def fits_template_url(self) -> bool:
+        return self.size <= TEMPLATE_URL_LIMIT
+
+
+def _compact_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return _timestamp(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} can't be represented in JSON")
+
+
+_COMPACT = json.JSONEncoder(
+    separators=(",", ":"),
+    ensure_ascii=False,
+    allow_nan=False,
+    default=_compact_default,
+)
+
+
+class _BudgetedWriter:
+    def __init__(self, fp: BinaryIO, budget: Optional[int]) -> None:
+        self.fp = fp
+        self.budget = budget
+        self.size = 0
+        self.logical_id: Optional[str] = None
+
+    def write(self, text: str) -> None:
+        data = text.encode("utf-8")
+        self.size += len(data)
+        if self.budget is not None and self.size > self.budget:
+            raise TemplateTooLarge(self.size, self.budget, self.logical_id)
+        self.fp.write(data)
+
+    def item(self, first: bool, key: str, value: Any) -> None:
+        self.write(("" if first else ",") + _COMPACT.encode(key) + ":")
+        self.write(_COMPACT.encode(value))
+
+
+def write_compact(
+    template: Template,
+    fp: BinaryIO,
+    budget: Optional[int] = TEMPLATE_URL_LIMIT,
+    resources: Iterable[Tuple[str, Resource]] = (),
+) -> TemplateSize:
+    """Write `template` to the binary file `fp` as minified JSON.
+
+    Insignificant whitespace is stripped, empty `Description`, `Parameters`
+    and resource `Properties` are omitted, and parameter fields left at
+    their defaults are dropped (as they always are). Resources are rendered
+    and written one at a time, and `TemplateTooLarge` is raised as soon as
+    the output grows beyond `budget` bytes, leaving whatever was already
+    written in `fp`. Pass `TEMPLATE_BODY_LIMIT` to check that the template
+    can be passed inline, or `None` for no budget.
+
+    `resources` are `(logical_id, resource)` pairs written after the
+    template's own resources. They are rendered as they are consumed, so a
+    generator of resources is written in constant memory; their properties
+    may reference the template's resources and parameters.
+    """
+    writer = _BudgetedWriter(fp, budget)
+    # Each resource is written before the next one is rendered, so nothing
+    # can modify the subtrees resources share.
+    index = LogicalIDIndex(template, share_rendered=True)
+    document = template.document(index, {})
+    if not document["Description"]:
+        del document["Description"]
+    if not document["Parameters"]:
+        del document["Parameters"]
+    writer.write("{")
+    for i, (section, value) in enumerate(document.items()):
+        if section != "Resources":
+            writer.item(i == 0, section, value)
+            continue
+        writer.write(("" if i == 0 else ",") + '"Resources":{')
+        all_resources = itertools.chain(template.resources.items(), resources)
+        for j, (logical_id, resource) in enumerate(all_resources):
+            writer.logical_id = logical_id
+            rendered = template.render_resource(logical_id, resource, index)
+            if rendered.get("Properties") == {}:
+                del rendered["Properties"]
+            writer.item(j == 0, logical_id, rendered)
+        writer.logical_id = None
+        writer.write("}")
+    writer.write("}")
+    return TemplateSize(writer.size)
+
+
+def compact_json(
+    template: Template, budget: Optional[int] = TEMPLATE_URL_LIMIT
+) -> bytes:
+    """Render `template` as minified JSON; see `write_compact()`."""
+    buffer = io.BytesIO()
+    write_compact(template, buffer, budget)
+    return buffer.getvalue()
+
+
+# Written before a handoff's pickle, so that a stage given anything else (a
+# JSON template, say) fails clearly instead of unpickling it.
+_HANDOFF_HEADER = b"nimbus-handoff-1\n"
+
+
+def dump_handoff(template: Union[Template, Dict[str, Any]], file: BinaryIO) -> None:
+    """Write a template (or an already-rendered document) rendered, for the
+    next stage of a pipeline to read with `load_handoff()`.
+
+    A handoff is a pickle of the rendered document, which is less than half
+    the size of its compact JSON and faster to write and to read.
+    Values JSON has no type for, like timestamps, come back as they were
+    rendered. Unpickling can run arbitrary code, so only hand off between
+    stages that trust each other, and hand templates to anything else as
+    JSON.
+    """
+    if isinstance(template, Template):
+        template = template.template_to_cloudformation()
+    file.write(_HANDOFF_HEADER)
+    pickle.dump(template, file, pickle.HIGHEST_PROTOCOL)
+
+
+def load_handoff(file: BinaryIO) -> Dict[str, Any]:
+    """Read a rendered template written by `dump_handoff()`."""
+    if file.read(len(_HANDOFF_HEADER)) != _HANDOFF_HEADER:
+        raise ValueError("not a template handoff written by dump_handoff()")
+    return pickle.load(file)
@@ -0,0 +1,157 @@
+"""Render one template for many sets of parameter values.
+
+StackSet-style rollouts deploy the same template to many accounts and
+regions with the parameters frozen to literals. Rather than rendering the
+template once per variant, `Specializer` renders it once with a "hole"
+wherever a frozen parameter is referenced, encodes the result, and then
+builds each variant by splicing the encoded parameter values into the holes.
+"""
+
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from nimbus_core.intrinsic import _SUB_VARIABLE
+from nimbus_core.parameter import (
+    Parameter,
+    ParameterCommaDelineatedList,
+    ParameterNumberList,
+)
+from nimbus_core.template import Template, UnknownParameter
+
+# Holes are rendered as JSON strings of the form "\u0000<index>\u0000", and
+# holes inside Sub format strings as "...\u0001<index>\u0001...", neither of
+# which can come out of an ordinary template.
+_HOLE = re.compile(r'"\\u0000(\d+)\\u0000"|\\u0001(\d+)\\u0001')
+
+
+_LIST_PARAMETERS = (ParameterNumberList, ParameterCommaDelineatedList)
+
+
+def _hole(index: int) -> str:
+    return f"\x00{index}\x00"
+
+
+def _sub_hole(index: int) -> str:
+    return f"\x01{index}\x01"
+
+
+def _substitute(value: Any) -> bytes:
+    # The value as it would appear inside a JSON-encoded Sub format string,
+    # with `${` escaped so that CloudFormation doesn't substitute into it.
+    text = value if isinstance(value, str) else json.dumps(value)
+    return json.dumps(text.replace("${", "${!"))[1:-1].encode()
+
+
+def _default(parameter: Parameter) -> Any:
+    # The value a Ref to the parameter takes by default. Defaults of list
+    # parameters may be given as CloudFormation takes them, comma-separated.
+    default = parameter.Default
+    if isinstance(parameter, _LIST_PARAMETERS) and isinstance(default, str):
+        return default.split(",")
+    return default
+
+
+class MissingParameterValue(Exception):
+    pass
+
+
+class Specializer:
+    """Renders `template` once and specializes it for sets of values of the
+    parameters named in `parameters`.
+
+    Every `{"Ref": <parameter>}` and every `${<parameter>}` in a Sub format
+    string (that isn't bound by the Sub's variable map) of a frozen parameter
+    is replaced by the parameter's value, and the frozen parameters are
+    removed from the Parameters section; all other parameters are left
+    alone. A variant costs one or two JSON encodings per frozen parameter
+    plus one join, no matter how large the template is.
+    """
+
+    def __init__(
+        self,
+        template: Template,
+        parameters: Iterable[str],
+        indent: Optional[int] = None,
+    ) -> None:
+        self.parameters = list(parameters)
+        document = template.template_to_cloudformation()
+        rendered_parameters = dict(document["Parameters"])
+        self.defaults: Dict[str, Any] = {}
+        for name in self.parameters:
+            try:
+                del rendered_parameters[name]
+            except KeyError:
+                raise UnknownParameter(name)
+            default = _default(template.parameters[name])
+            if default is not None:
+                self.defaults[name] = default
+        document["Parameters"] = rendered_parameters
+
+        holes = {name: i for i, name in enumerate(self.parameters)}
+        document = self._punch(document, holes)
+        text = json.dumps(document, indent=indent)
+
+        # `pieces` is literal text followed by the two groups of a hole, over
+        # and over: the index of a value hole or of a Sub format string hole.
+        pieces = _HOLE.split(text)
+        self.chunks: List[bytes] = [piece.encode() for piece in pieces[::3]]
+        self.holes: List[Tuple[int, bool]] = [
+            (int(value), False) if value is not None else (int(sub), True)
+            for value, sub in zip(pieces[1::3], pieces[2::3])
+        ]
+        self.substituted: Set[int] = {index for index, sub in self.holes if sub}
+
+    def _punch(self, value: Any, holes: Dict[str, int]) -> Any:
+        if isinstance(value, dict):
+            if len(value) == 1 and value.get("Ref") in holes:
+                return _hole(holes[value["Ref"]])
+            if len(value) == 1 and "Fn::Sub" in value:
+                return {"Fn::Sub": self._punch_sub(value["Fn::Sub"], holes)}
+            return {key: self._punch(item, holes) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._punch(item, holes) for item in value]
+        return value
+
+    def _punch_sub(self, sub: Any, holes: Dict[str, int]) -> Any:
+        if isinstance(sub, str):
+            format_string, variables = sub, None
+        else:
+            format_string, variables = sub
+
+        def punch(match: "re.Match[str]") -> str:
+            name = match[1]
+            if name in holes and (variables is None or name not in variables):
+                return _sub_hole(holes[name])
+            return match[0]
+
+        format_string = _SUB_VARIABLE.sub(punch, format_string)
+        if variables is None:
+            return format_string
+        return [format_string, self._punch(variables, holes)]
+
+    def render(self, values: Dict[str, Any]) -> bytes:
+        """Render the template with the frozen parameters set to `values`,
+        falling back to the parameters' defaults."""
+        encoded: List[bytes] = []
+        substituted: List[bytes] = []
+        for name in self.parameters:
+            if name in values:
+                value = values[name]
+            elif name in self.defaults:
+                value = self.defaults[name]
+            else:
+                raise MissingParameterValue(name)
+            encoded.append(json.dumps(value).encode())
+            index = len(substituted)
+            substituted.append(_substitute(value) if index in self.substituted else b"")
+
+        parts = [self.chunks[0]]
+        for (index, sub), chunk in zip(self.holes, self.chunks[1:]):
+            parts.append(substituted[index] if sub else encoded[index])
+            parts.append(chunk)
+        return b"".join(parts)
+
+    def render_many(self, variants: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+        for values in variants:
+            yield self.render(values)
@@ -1,7 +1,16 @@
-from typing import Any, Dict, NamedTuple
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional, Tuple
 
+from nimbus_core.condition import ConditionExpression
+from nimbus_core.output import Output, output_to_cloudformation
 from nimbus_core.parameter import Parameter, parameter_to_cloudformation
-from nimbus_core.resource import Resource
+from nimbus_core.resource import Resource, property_name
+
+if TYPE_CHECKING:
+    from nimbus_core.profile import RenderProfiler
+
+
+# Values that are as cheap to render as to splice.
+_PRIMITIVES = (str, bool, int, float)
 
 
 class UnknownResource(Exception):
@@ -16,6 +25,11 @@ class Template(NamedTuple):
     description: str
     parameters: Dict[str, Parameter]
     resources: Dict[str, Resource]
+    outputs: Optional[Dict[str, Output]] = None
+    conditions: Optional[Dict[str, ConditionExpression]] = None
+    # Maps resource logical IDs to the names of the conditions that decide
+    # whether the resources are created.
+    resource_conditions: Optional[Dict[str, str]] = None
 
     def resource_logical_id(self, r: Resource) -> str:
         for lid, resource in self.resources.items():
@@ -29,22 +43,159 @@ class Template(NamedTuple):
                 return lid
         raise UnknownParameter(p)
 
-    def template_to_cloudformation(self) -> Dict[str, Any]:
+    def parameters_to_cloudformation(self) -> Dict[str, Any]:
         return {
+            logical_id: parameter_to_cloudformation(parameter)
+            for logical_id, parameter in self.parameters.items()
+        }
+
+    def render_resource(
+        self, logical_id: str, resource: Resource, index: "LogicalIDIndex"
+    ) -> Dict[str, Any]:
+        rendered = index.render(resource)
+        if self.resource_conditions:
+            condition = self.resource_conditions.get(logical_id)
+            if condition is not None:
+                rendered["Condition"] = condition
+        return rendered
+
+    def document(
+        self, index: "LogicalIDIndex", resources: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Render the template around its already-rendered resources (see
+        `render_resource()`)."""
+        document: Dict[str, Any] = {
             "AWSTemplateFormatVersion": "2010-09-09",
             "Description": self.description,
-            "Parameters": {
-                logical_id: parameter_to_cloudformation(parameter)
-                for logical_id, parameter in self.parameters.items()
-            },
-            "Resources": {
-                logical_id: resource.resource_to_cloudformation(
-                    resource_logical_id=self.resource_logical_id,
-                    parameter_logical_id=self.parameter_logical_id,
+            "Parameters": self.parameters_to_cloudformation(),
+        }
+        if self.conditions:
+            document["Conditions"] = {
+                name: condition.intrinsic_to_cloudformation(
+                    index.resource_logical_id, index.parameter_logical_id
+                )
+                for name, condition in self.conditions.items()
+            }
+        document["Resources"] = resources
+        if self.outputs:
+            document["Outputs"] = {
+                logical_id: output_to_cloudformation(
+                    output, index.resource_logical_id, index.parameter_logical_id
                 )
+                for logical_id, output in self.outputs.items()
+            }
+        return document
+
+    def template_to_cloudformation(
+        self, profiler: Optional["RenderProfiler"] = None, share_rendered: bool = False,
+    ) -> Dict[str, Any]:
+        """Render the template.
+
+        If a `profiler` is given, the render is instrumented and its report
+        is recorded on the profiler. Without one, the only instrumentation
+        code that runs is a check in each reference function that no
+        profiled render is running. See `LogicalIDIndex` for
+        `share_rendered`.
+        """
+        if profiler is not None:
+            return profiler.render(self, share_rendered)
+        index = LogicalIDIndex(self, share_rendered)
+        return self.document(
+            index,
+            {
+                logical_id: self.render_resource(logical_id, resource, index)
                 for logical_id, resource in self.resources.items()
             },
-        }
+        )
 
     def cloudformation(self) -> Dict[str, Any]:
         return self.template_to_cloudformation()
+
+
+class LogicalIDIndex:
+    """Identity-keyed logical ID lookups for a template.
+
+    `Template.resource_logical_id()` and `Template.parameter_logical_id()`
+    scan the template on every call, which makes rendering quadratic in the
+    number of resources. The index maps `id()` of every resource and
+    parameter to its logical ID (the first one, if an object was added
+    twice) and only falls back to the template's scan for objects that are
+    not in the template by identity, e.g. equal copies of a resource.
+
+    With `share_rendered`, the index also remembers the last resource of
+    each class it rendered, so that a resource sharing fields with it by
+    identity (e.g. variants of a `Prototype`) only renders the fields that
+    differ and splices in the rendered output of the others. Rendered
+    resources then share subtrees and must not be modified in place.
+
+    The index must not outlive changes to the template it was built from.
+    """
+
+    def __init__(self, template: Template, share_rendered: bool = False) -> None:
+        self.template = template
+        self.share_rendered = share_rendered
+        self.resources: Dict[int, str] = {}
+        self.parameters: Dict[int, str] = {}
+        self.rendered: Dict[type, Tuple[Resource, Dict[str, Any]]] = {}
+        for lid, resource in template.resources.items():
+            self.resources.setdefault(id(resource), lid)
+        for lid, parameter in template.parameters.items():
+            self.parameters.setdefault(id(parameter), lid)
+
+    def resource_logical_id(self, r: Resource) -> str:
+        lid = self.resources.get(id(r))
+        if lid is None:
+            return self.template.resource_logical_id(r)
+        return lid
+
+    def parameter_logical_id(self, p: Parameter) -> str:
+        lid = self.parameters.get(id(p))
+        if lid is None:
+            return self.template.parameter_logical_id(p)
+        return lid
+
+    def render(self, resource: Resource) -> Dict[str, Any]:
+        cls = type(resource)
+        shared: List[str] = []
+        previous = self.rendered.get(cls)
+        if previous is not None:
+            last, last_properties = previous
+            for field in getattr(cls, "_field_defaults", ()):
+                value = getattr(resource, field)
+                if (
+                    value is getattr(last, field)
+                    and value is not None
+                    and not isinstance(value, _PRIMITIVES)
+                ):
+                    shared.append(field)
+        if not shared:
+            rendered = resource.resource_to_cloudformation(
+                resource_logical_id=self.resource_logical_id,
+                parameter_logical_id=self.parameter_logical_id,
+            )
+        else:
+            rendered = resource._replace(  # type: ignore
+                **dict.fromkeys(shared)
+            ).resource_to_cloudformation(
+                resource_logical_id=self.resource_logical_id,
+                parameter_logical_id=self.parameter_logical_id,
+            )
+            delta = rendered["Properties"]
+            spliced = {property_name(field) for field in shared}
+            if all(name in last_properties for name in delta):
+                # Keep the order a full render would have.
+                rendered["Properties"] = {
+                    name: delta[name] if name in delta else value
+                    for name, value in last_properties.items()
+                    if name in delta or name in spliced
+                }
+            else:
+                # Without a rendered neighbour to take the order of the new
+                # properties from, render in full.
+                rendered = resource.resource_to_cloudformation(
+                    resource_logical_id=self.resource_logical_id,
+                    parameter_logical_id=self.parameter_logical_id,
+                )
+        if self.share_rendered and "Properties" in rendered:
+            self.rendered[cls] = (resource, rendered["Properties"])
+        return rendered
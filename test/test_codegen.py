@@ -0,0 +1,202 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from nimbus_codegen.ast import (
+    Block,
+    CallExpr,
+    IfStmt,
+    ReturnStmt,
+    StringLiteral,
+    Variable,
+    Writer,
+)
+from nimbus_codegen.codegen import (
+    FORMATTER_BLACK,
+    FORMATTER_NONE,
+    MANIFEST,
+    _module,
+    format_source,
+    render_module,
+    write_resources_package,
+)
+from nimbus_codegen.spec import load
+from nimbus_codegen.typedef import resource_namespace
+
+try:
+    import black
+except ImportError:
+    black = None
+
+# The version in 3rdParty/BUILD, which the generated source is laid out for.
+PINNED_BLACK = "19.10b0"
+
+
+def _render(resource_type: str) -> str:
+    module = _module(resource_type)
+    return render_module(module, resource_namespace(module, load(), resource_type))
+
+
+class FormattingTests(unittest.TestCase):
+    @unittest.skipIf(
+        black is None or black.__version__ != PINNED_BLACK,
+        f"black {PINNED_BLACK} is not installed",
+    )
+    def test_generated_source_is_black_formatted(self):
+        # Between them, these split subscripts, annotations, calls, defs,
+        # dict literals and conditional expressions.
+        for resource_type in [
+            "AWS::Redshift::Cluster",
+            "AWS::ApiGateway::Method",
+            "AWS::AppSync::DataSource",
+            "Alexa::ASK::Skill",
+        ]:
+            with self.subTest(resource_type):
+                source = _render(resource_type)
+                self.assertEqual(FORMATTER_BLACK(source), source)
+
+
+class WriterTests(unittest.TestCase):
+    def test_statements_are_laid_out_at_their_indentation(self):
+        # 84 characters, which only fit on one line at the top level.
+        call = ReturnStmt(
+            CallExpr(Variable("g"), [StringLiteral("a" * 34), StringLiteral("b" * 34)])
+        )
+        writer = Writer()
+        call.write_stmt(writer)
+        writer.blank_line()
+        writer.line("def f(x):")
+        with writer.indented():
+            IfStmt(Variable("x"), Block([call])).write_stmt(writer)
+            IfStmt(Variable("x"), Block([])).write_stmt(writer)
+        a, b = "a" * 34, "b" * 34
+        self.assertEqual(
+            f'return g("{a}", "{b}")\n'
+            "\n"
+            "def f(x):\n"
+            "    if x:\n"
+            "        return g(\n"
+            f'            "{a}", "{b}"\n'
+            "        )\n"
+            "    if x:\n"
+            "        pass\n",
+            writer.getvalue(),
+        )
+
+
+class FormatSourceTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patch = mock.patch.dict(os.environ, {"NIMBUS_CACHE_DIR": directory.name})
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.formatted = os.path.join(directory.name, "formatted")
+
+    @unittest.skipIf(black is None, "black is not installed")
+    def test_black_output_is_cached(self):
+        source = "x = [1,\n  2]\n"
+        self.assertEqual("x = [1, 2]\n", format_source(FORMATTER_BLACK, source))
+        (name,) = os.listdir(self.formatted)
+        with open(os.path.join(self.formatted, name), "w") as f:
+            f.write("cached\n")
+        self.assertEqual("cached\n", format_source(FORMATTER_BLACK, source))
+        self.assertEqual(
+            "x = [1, 2]\n", format_source(FORMATTER_BLACK, source, cache=False)
+        )
+        self.assertEqual(
+            "y = 1\n", format_source(FORMATTER_BLACK, "y = 1\n", cache=False)
+        )
+        self.assertEqual([name], os.listdir(self.formatted))
+
+    def test_other_formatters_are_not_cached(self):
+        for formatter in [FORMATTER_NONE, str.upper]:
+            with self.subTest(formatter.__name__):
+                self.assertEqual(
+                    formatter("x = 1\n"), format_source(formatter, "x = 1\n")
+                )
+        self.assertFalse(os.path.exists(self.formatted))
+
+
+class WriteResourcesPackageTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        patch = mock.patch.dict(
+            os.environ, {"NIMBUS_CACHE_DIR": os.path.join(self.directory, "cache")}
+        )
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.spec = load().select(["AWS::SQS::Queue", "AWS::SNS::Topic"])
+        self.queue = os.path.join(self.directory, "src/nimbus_resources/sqs/queue.py")
+        self.topic = os.path.join(self.directory, "src/nimbus_resources/sns/topic.py")
+
+    def _tamper(self, path):
+        with open(path, "a") as f:
+            f.write("# tampered\n")
+
+    def _tampered(self, path):
+        with open(path) as f:
+            return f.read().endswith("# tampered\n")
+
+    def _tree(self, directory):
+        tree = {}
+        for root, _, files in os.walk(directory):
+            for name in files:
+                path = os.path.join(root, name)
+                with open(path, "rb") as f:
+                    tree[os.path.relpath(path, directory)] = f.read()
+        return tree
+
+    def test_workers_write_the_same_tree(self):
+        spec = load().select(["AWS::SQS::*", "AWS::SNS::*", "AWS::S3::*"])
+        one = os.path.join(self.directory, "one")
+        two = os.path.join(self.directory, "two")
+        write_resources_package(spec, one, workers=1)
+        write_resources_package(spec, two, workers=2)
+        tree = self._tree(one)
+        self.assertIn("src/nimbus_resources/s3/bucket.py", tree)
+        self.assertEqual(tree, self._tree(two))
+
+    def test_writes_setup_py(self):
+        write_resources_package(self.spec, self.directory)
+        with open(os.path.join(self.directory, "setup.py")) as f:
+            source = f.read()
+        self.assertIn('name="nimbus-resources"', source)
+        self.assertTrue(source.endswith(")\n"))
+
+    def test_only_regenerates_modules_whose_inputs_changed(self):
+        write_resources_package(self.spec, self.directory)
+        self._tamper(self.queue)
+        self._tamper(self.topic)
+        queue = self.spec.ResourceTypes["AWS::SQS::Queue"]
+        changed = self.spec._replace(
+            ResourceTypes=dict(
+                self.spec.ResourceTypes,
+                **{"AWS::SQS::Queue": queue._replace(Documentation="changed")},
+            )
+        )
+        write_resources_package(changed, self.directory)
+        self.assertFalse(self._tampered(self.queue))
+        self.assertTrue(self._tampered(self.topic))
+
+        os.remove(self.topic)
+        write_resources_package(changed, self.directory)
+        self.assertTrue(os.path.exists(self.topic))
+
+        self._tamper(self.queue)
+        write_resources_package(changed, self.directory, force=True)
+        self.assertFalse(self._tampered(self.queue))
+
+    def test_removes_modules_of_dropped_resource_types(self):
+        write_resources_package(self.spec, self.directory)
+        write_resources_package(self.spec.select(["AWS::SQS::*"]), self.directory)
+        self.assertTrue(os.path.exists(self.queue))
+        self.assertFalse(os.path.exists(os.path.dirname(self.topic)))
+        with open(os.path.join(self.directory, MANIFEST)) as f:
+            self.assertEqual(
+                ["src/nimbus_resources/sqs/queue.py"], list(json.load(f)["modules"])
+            )
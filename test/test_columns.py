@@ -0,0 +1,99 @@
+import unittest
+
+from nimbus_core import (
+    ParameterString,
+    ResourceColumns,
+    Template,
+    columns_to_cloudformation,
+)
+from nimbus_resources.route53.recordset import RecordSet
+
+
+class ResourceColumnsTests(unittest.TestCase):
+    def test_matches_resource_objects(self):
+        zone = ParameterString()
+        names = [f"host{i}.example.com." for i in range(5)]
+        values = [[f"10.0.0.{i}"] for i in range(5)]
+        ttls = ["300", None, "60", None, "300"]
+        logical_ids = [f"Record{i}" for i in range(5)]
+        template = Template(description="", parameters={"Zone": zone}, resources={})
+        document = columns_to_cloudformation(
+            template,
+            [
+                ResourceColumns(
+                    RecordSet,
+                    logical_ids,
+                    Name=names,
+                    Type=["A"] * 5,
+                    ResourceRecords=values,
+                    HostedZoneId=[zone] * 5,
+                    TTL=ttls,
+                )
+            ],
+        )
+        expected = template._replace(
+            resources={
+                logical_id: RecordSet(
+                    Name=name,
+                    Type="A",
+                    ResourceRecords=value,
+                    HostedZoneId=zone,
+                    TTL=ttl,
+                )
+                for logical_id, name, value, ttl in zip(
+                    logical_ids, names, values, ttls
+                )
+            }
+        ).template_to_cloudformation()
+        self.assertEqual(expected, document)
+        for logical_id in logical_ids:
+            self.assertEqual(
+                list(expected["Resources"][logical_id]["Properties"]),
+                list(document["Resources"][logical_id]["Properties"]),
+            )
+
+    def test_property_order_does_not_depend_on_the_first_row(self):
+        template = Template(description="", parameters={}, resources={})
+        document = columns_to_cloudformation(
+            template,
+            [
+                ResourceColumns(
+                    RecordSet,
+                    ["Record0", "Record1"],
+                    Name=["a.example.com.", "b.example.com."],
+                    Type=["A", "A"],
+                    TTL=[None, "60"],
+                    Comment=[None, "b"],
+                )
+            ],
+        )
+        self.assertEqual(
+            ["Comment", "Name", "TTL", "Type"],
+            list(document["Resources"]["Record1"]["Properties"]),
+        )
+
+    def test_validation(self):
+        with self.assertRaises(TypeError):
+            ResourceColumns(RecordSet, ["Record"], Name=["a.example.com."])
+        with self.assertRaises(TypeError):
+            ResourceColumns(RecordSet, ["Record"], Name=["a"], Type=["A"], Nope=[1])
+        with self.assertRaises(ValueError):
+            ResourceColumns(RecordSet, ["Record"], Name=["a", "b"], Type=["A"])
+        with self.assertRaises(ValueError):
+            ResourceColumns(
+                RecordSet, ["Record", "Record"], Name=["a", "b"], Type=["A"] * 2
+            )
+        template = Template(
+            description="",
+            parameters={},
+            resources={"Record": RecordSet(Name="a", Type="A")},
+        )
+        with self.assertRaises(ValueError):
+            columns_to_cloudformation(
+                template,
+                [ResourceColumns(RecordSet, ["Record"], Name=["b"], Type=["A"])],
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
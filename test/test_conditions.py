@@ -0,0 +1,150 @@
+import unittest
+
+from nimbus_core import (
+    AWS_NO_VALUE,
+    AWS_REGION,
+    And,
+    Condition,
+    Equals,
+    If,
+    Not,
+    Or,
+    Output,
+    ParameterString,
+    Template,
+    fold_conditions,
+)
+from nimbus_resources.s3.bucket import Bucket, VersioningConfiguration
+
+
+def _template():
+    env = ParameterString()
+    bucket = Bucket(
+        BucketName=If("IsProd", "prod-bucket", "dev-bucket"),
+        VersioningConfiguration=If(
+            "IsProd", VersioningConfiguration(Status="Enabled"), AWS_NO_VALUE
+        ),
+    )
+    return Template(
+        description="",
+        parameters={"Env": env},
+        resources={"Bucket": bucket, "Backups": Bucket()},
+        outputs={"Backups": Output(Value=bucket, Condition="IsProdInUSEast1")},
+        conditions={
+            "IsProd": Equals(env, "prod"),
+            "IsUSEast1": Equals(AWS_REGION, "us-east-1"),
+            "IsProdInUSEast1": And([Condition("IsProd"), Condition("IsUSEast1")]),
+            "IsDevOrTest": Or([Not(Condition("IsProd")), Equals(env, "test")]),
+        },
+        resource_conditions={"Backups": "IsProdInUSEast1"},
+    )
+
+
+class ConditionTests(unittest.TestCase):
+    def test_render(self):
+        rendered = _template().template_to_cloudformation()
+        self.assertEqual(
+            {
+                "IsProd": {"Fn::Equals": [{"Ref": "Env"}, "prod"]},
+                "IsUSEast1": {"Fn::Equals": [{"Ref": "AWS::Region"}, "us-east-1"]},
+                "IsProdInUSEast1": {
+                    "Fn::And": [{"Condition": "IsProd"}, {"Condition": "IsUSEast1"}]
+                },
+                "IsDevOrTest": {
+                    "Fn::Or": [
+                        {"Fn::Not": [{"Condition": "IsProd"}]},
+                        {"Fn::Equals": [{"Ref": "Env"}, "test"]},
+                    ]
+                },
+            },
+            rendered["Conditions"],
+        )
+        self.assertEqual(
+            {
+                "BucketName": {"Fn::If": ["IsProd", "prod-bucket", "dev-bucket"]},
+                "VersioningConfiguration": {
+                    "Fn::If": [
+                        "IsProd",
+                        {"Status": "Enabled"},
+                        {"Ref": "AWS::NoValue"},
+                    ]
+                },
+            },
+            rendered["Resources"]["Bucket"]["Properties"],
+        )
+        self.assertEqual(
+            "IsProdInUSEast1", rendered["Resources"]["Backups"]["Condition"]
+        )
+        self.assertEqual("IsProdInUSEast1", rendered["Outputs"]["Backups"]["Condition"])
+
+    def test_fold_false_conditions(self):
+        folded = fold_conditions(
+            _template().template_to_cloudformation(), {"Env": "dev"}
+        )
+        self.assertEqual(
+            {"IsUSEast1": {"Fn::Equals": [{"Ref": "AWS::Region"}, "us-east-1"]}},
+            folded["Conditions"],
+        )
+        self.assertEqual(
+            {
+                "Bucket": {
+                    "Type": "AWS::S3::Bucket",
+                    "Properties": {"BucketName": "dev-bucket"},
+                }
+            },
+            folded["Resources"],
+        )
+        self.assertNotIn("Outputs", folded)
+
+    def test_fold_everything(self):
+        folded = fold_conditions(
+            _template().template_to_cloudformation(),
+            {"Env": "prod", "AWS::Region": "us-east-1"},
+        )
+        self.assertNotIn("Conditions", folded)
+        self.assertEqual({"Bucket", "Backups"}, set(folded["Resources"]))
+        self.assertNotIn("Condition", folded["Resources"]["Backups"])
+        self.assertEqual({"Value": {"Ref": "Bucket"}}, folded["Outputs"]["Backups"])
+
+    def test_fold_leaves_residual_conditions(self):
+        folded = fold_conditions(
+            _template().template_to_cloudformation(), {"Env": "prod"}
+        )
+        self.assertEqual(
+            {"IsProdInUSEast1": {"Fn::Equals": [{"Ref": "AWS::Region"}, "us-east-1"]}},
+            {
+                name: condition
+                for name, condition in folded["Conditions"].items()
+                if name == "IsProdInUSEast1"
+            },
+        )
+        self.assertEqual({"IsUSEast1", "IsProdInUSEast1"}, set(folded["Conditions"]))
+        self.assertEqual(
+            {
+                "BucketName": "prod-bucket",
+                "VersioningConfiguration": {"Status": "Enabled"},
+            },
+            folded["Resources"]["Bucket"]["Properties"],
+        )
+        self.assertEqual("IsProdInUSEast1", folded["Resources"]["Backups"]["Condition"])
+
+    def test_fold_keeps_pruned_branches_of_residual_if(self):
+        template = _template()
+        template.resources["Logs"] = Bucket(
+            BucketName=If(
+                "IsUSEast1", If("IsProd", AWS_NO_VALUE, "dev-bucket"), "other-bucket"
+            )
+        )
+        folded = fold_conditions(template.template_to_cloudformation(), {"Env": "prod"})
+        self.assertEqual(
+            {
+                "BucketName": {
+                    "Fn::If": ["IsUSEast1", {"Ref": "AWS::NoValue"}, "other-bucket"]
+                }
+            },
+            folded["Resources"]["Logs"]["Properties"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
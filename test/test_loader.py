@@ -0,0 +1,210 @@
+import typing
+import unittest
+
+from nimbus_core import (
+    AttributeString,
+    ParameterString,
+    TemplateLoadError,
+    converter,
+    parse_template,
+    template_from_cloudformation,
+)
+from nimbus_resources.s3.bucket import Bucket, VersioningConfiguration
+
+DOCUMENT = {
+    "AWSTemplateFormatVersion": "2010-09-09",
+    "Description": "Legacy template",
+    "Parameters": {"Env": {"Type": "String", "Default": "dev"}},
+    "Conditions": {"IsProd": {"Fn::Equals": [{"Ref": "Env"}, "prod"]}},
+    "Resources": {
+        "Policy": {
+            "Type": "AWS::IAM::ManagedPolicy",
+            "Properties": {
+                "PolicyDocument": {
+                    "Statement": [
+                        {
+                            "Effect": "Allow",
+                            "Resource": {
+                                "Fn::Sub": [
+                                    "${Arn}/*",
+                                    {"Arn": {"Fn::GetAtt": "Bucket.Arn"}},
+                                ]
+                            },
+                        }
+                    ]
+                }
+            },
+        },
+        "Bucket": {
+            "Type": "AWS::S3::Bucket",
+            "Properties": {
+                "BucketName": {
+                    "Fn::Join": ["-", [{"Ref": "Env"}, {"Ref": "AWS::Region"}]]
+                },
+                "Tags": [{"Key": "env", "Value": {"Ref": "Env"}}],
+                "VersioningConfiguration": {
+                    "Fn::If": [
+                        "IsProd",
+                        {"Status": "Enabled"},
+                        {"Ref": "AWS::NoValue"},
+                    ]
+                },
+            },
+            "Condition": "IsProd",
+        },
+    },
+    "Outputs": {
+        "Arn": {
+            "Value": {"Fn::GetAtt": "Bucket.Arn"},
+            "Export": {"Name": "bucket-arn"},
+        }
+    },
+}
+
+
+class LoaderTests(unittest.TestCase):
+    def test_round_trip(self):
+        template = template_from_cloudformation(DOCUMENT)
+        self.assertEqual(DOCUMENT, template.template_to_cloudformation())
+
+    def test_references_are_resolved_to_objects(self):
+        template = template_from_cloudformation(DOCUMENT)
+        bucket = template.resources["Bucket"]
+        self.assertIsInstance(bucket, Bucket)
+        self.assertIsInstance(template.parameters["Env"], ParameterString)
+        self.assertIs(template.parameters["Env"], bucket.Tags[0].Value)
+        self.assertIsInstance(
+            bucket.VersioningConfiguration.value_if_true, VersioningConfiguration
+        )
+        arn = template.outputs["Arn"].Value
+        self.assertEqual(AttributeString(bucket, "Arn"), arn)
+        self.assertIs(bucket, arn.resource)
+
+    def test_yaml_short_forms(self):
+        template = parse_template(
+            """
+AWSTemplateFormatVersion: 2010-09-09
+Description: Legacy template
+Parameters:
+  Env:
+    Type: String
+    Default: dev
+Conditions:
+  IsProd: !Equals [!Ref Env, prod]
+Resources:
+  Policy:
+    Type: AWS::IAM::ManagedPolicy
+    Properties:
+      PolicyDocument:
+        Statement:
+          - Effect: Allow
+            Resource: !Sub
+              - "${Arn}/*"
+              - Arn: !GetAtt Bucket.Arn
+  Bucket:
+    Type: AWS::S3::Bucket
+    Condition: IsProd
+    Properties:
+      BucketName: !Join ["-", [!Ref Env, !Ref "AWS::Region"]]
+      Tags:
+        - Key: env
+          Value: !Ref Env
+      VersioningConfiguration:
+        !If [IsProd, {Status: Enabled}, !Ref "AWS::NoValue"]
+Outputs:
+  Arn:
+    Value: !GetAtt Bucket.Arn
+    Export:
+      Name: bucket-arn
+"""
+        )
+        self.assertEqual(DOCUMENT, template.template_to_cloudformation())
+
+    def test_errors_have_paths(self):
+        document = {
+            "Resources": {
+                "Bucket": {
+                    "Type": "AWS::S3::Bucket",
+                    "Properties": {"VersioningConfiguration": {"State": "On"}},
+                }
+            }
+        }
+        with self.assertRaises(TemplateLoadError) as ctx:
+            template_from_cloudformation(document)
+        self.assertEqual(
+            "Resources.Bucket.Properties.VersioningConfiguration", ctx.exception.path
+        )
+
+    def test_parameters(self):
+        parameters = {
+            "InstanceType": {
+                "Type": "String",
+                "Default": "t3.micro",
+                "AllowedValues": ["t3.micro", "t3.small", "t3.medium"],
+                "Description": "EC2 instance type",
+            },
+            "DBName": {
+                "Type": "String",
+                "MinLength": "1",
+                "MaxLength": "64",
+                "AllowedPattern": "[a-zA-Z][a-zA-Z0-9]*",
+                "ConstraintDescription": "must begin with a letter",
+            },
+            "DBPassword": {"Type": "String", "NoEcho": "true", "MinLength": 8},
+            "Port": {"Type": "Number", "Default": 5432, "MinValue": 1150},
+            "Subnets": {"Type": "List<AWS::EC2::Subnet::Id>"},
+            "Zones": {"Type": "CommaDelimitedList", "Default": "a, b,c"},
+        }
+        document = {"Parameters": parameters, "Resources": {}}
+        rendered = template_from_cloudformation(document).template_to_cloudformation()
+        self.assertEqual(
+            dict(parameters, DBPassword=dict(parameters["DBPassword"], NoEcho=True)),
+            rendered["Parameters"],
+        )
+
+    def test_converter(self):
+        hints = typing.get_type_hints(Bucket)
+        versioning = converter(hints["VersioningConfiguration"])
+        self.assertEqual(
+            VersioningConfiguration(Status="Enabled"),
+            versioning({"Status": "Enabled"}, "Row"),
+        )
+        with self.assertRaises(TemplateLoadError) as ctx:
+            versioning({"Ref": "Missing"}, "Row")
+        self.assertEqual("Row", ctx.exception.path)
+
+    def test_constraints_of_other_parameter_types_are_errors(self):
+        for parameter, key in [
+            ({"Type": "Number", "MinLength": 1}, "MinLength"),
+            ({"Type": "String", "MaxValue": 1}, "MaxValue"),
+            ({"Type": "List<Number>", "MinValue": 1}, "MinValue"),
+            ({"Type": "CommaDelimitedList", "MaxLength": 1}, "MaxLength"),
+        ]:
+            with self.subTest(parameter["Type"]):
+                document = {"Parameters": {"P": parameter}, "Resources": {}}
+                with self.assertRaises(TemplateLoadError) as ctx:
+                    template_from_cloudformation(document)
+                self.assertEqual("Parameters.P", ctx.exception.path)
+                self.assertIn(f"unsupported keys: {key}", str(ctx.exception))
+
+    def test_get_att_in_place_of_a_non_string_is_an_error(self):
+        document = {
+            "Resources": {
+                "Queue": {"Type": "AWS::SQS::Queue"},
+                "Other": {
+                    "Type": "AWS::SQS::Queue",
+                    "Properties": {
+                        "DelaySeconds": {"Fn::GetAtt": ["Queue", "QueueName"]}
+                    },
+                },
+            }
+        }
+        with self.assertRaises(TemplateLoadError) as ctx:
+            template_from_cloudformation(document)
+        self.assertEqual(
+            "Resources.Other.Properties.DelaySeconds.Fn::GetAtt", ctx.exception.path
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import json
+import unittest
+
+from nimbus_core import Template, hoist_literals
+from nimbus_resources.ec2.instance import Instance
+
+IMAGE = "123456789012.dkr.ecr.us-east-1.amazonaws.com/service:0123456789abcdef"
+
+
+class HoistLiteralsTests(unittest.TestCase):
+    def test_hoists_repeated_literals(self):
+        document = Template(
+            description="",
+            parameters={},
+            resources={f"Instance{i}": Instance(ImageId=IMAGE) for i in range(10)},
+        ).template_to_cloudformation()
+        document["Resources"]["Instance0"]["Properties"]["UserData"] = {
+            "Fn::Sub": IMAGE
+        }
+        hoisted = hoist_literals(document)
+        self.assertEqual({"Literals": {"G0": {"L0": IMAGE}}}, hoisted["Mappings"])
+        self.assertEqual(
+            {"Fn::FindInMap": ["Literals", "G0", "L0"]},
+            hoisted["Resources"]["Instance3"]["Properties"]["ImageId"],
+        )
+        # Fn::Sub format strings must stay literal.
+        self.assertEqual(
+            {"Fn::Sub": IMAGE},
+            hoisted["Resources"]["Instance0"]["Properties"]["UserData"],
+        )
+        self.assertLess(len(json.dumps(hoisted)), len(json.dumps(document)))
+        self.assertEqual(
+            IMAGE, document["Resources"]["Instance3"]["Properties"]["ImageId"]
+        )
+
+    def test_literal_arguments_stay_literal(self):
+        delimiter = ":" * 64
+        document = Template(
+            description="",
+            parameters={},
+            resources={f"Instance{i}": Instance(ImageId=IMAGE) for i in range(10)},
+        ).template_to_cloudformation()
+        for resource in document["Resources"].values():
+            resource["Properties"]["ImageId"] = {
+                "Fn::Select": [
+                    "0",
+                    {"Fn::Split": [delimiter, {"Fn::Join": [delimiter, [IMAGE]]}]},
+                ]
+            }
+        hoisted = hoist_literals(document, min_length=1)
+        self.assertEqual({"Literals": {"G0": {"L0": IMAGE}}}, hoisted["Mappings"])
+        self.assertEqual(
+            {
+                "Fn::Select": [
+                    "0",
+                    {
+                        "Fn::Split": [
+                            delimiter,
+                            {
+                                "Fn::Join": [
+                                    delimiter,
+                                    [{"Fn::FindInMap": ["Literals", "G0", "L0"]}],
+                                ]
+                            },
+                        ]
+                    },
+                ]
+            },
+            hoisted["Resources"]["Instance3"]["Properties"]["ImageId"],
+        )
+
+    def test_only_when_smaller(self):
+        document = Template(
+            description="",
+            parameters={},
+            resources={f"Instance{i}": Instance(ImageId=IMAGE) for i in range(2)},
+        ).template_to_cloudformation()
+        self.assertIs(document, hoist_literals(document, min_length=8))
+
+
+if __name__ == "__main__":
+    unittest.main()
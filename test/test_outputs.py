@@ -0,0 +1,121 @@
+import unittest
+
+from nimbus_core import (
+    Export,
+    ExportErrors,
+    ExportIndex,
+    ExportLocation,
+    ImportValue,
+    Output,
+    Sub,
+    Template,
+)
+from nimbus_resources.s3.bucket import Bucket
+
+
+def _exporting_template(export_name):
+    bucket = Bucket()
+    return Template(
+        description="",
+        parameters={},
+        resources={"Bucket": bucket},
+        outputs={
+            "BucketArn": Output(
+                Value=bucket.GetArn(),
+                Description="The bucket ARN",
+                Export=Export(Name=export_name),
+            )
+        },
+    )
+
+
+def _importing_template(export):
+    return Template(
+        description="",
+        parameters={},
+        resources={
+            "Bucket": Bucket(BucketName=Sub("${Arn}-copy", Arn=ImportValue(export)),),
+        },
+        outputs={"Imported": Output(Value=ImportValue(export))},
+    )
+
+
+class OutputTests(unittest.TestCase):
+    def test_render_outputs(self):
+        export = Export(Name="shared-bucket-arn")
+        self.assertEqual(
+            {
+                "BucketArn": {
+                    "Value": {"Fn::GetAtt": "Bucket.Arn"},
+                    "Description": "The bucket ARN",
+                    "Export": {"Name": "shared-bucket-arn"},
+                }
+            },
+            _exporting_template(export.Name).template_to_cloudformation()["Outputs"],
+        )
+        rendered = _importing_template(export).template_to_cloudformation()
+        self.assertEqual(
+            {
+                "Fn::Sub": [
+                    "${Arn}-copy",
+                    {"Arn": {"Fn::ImportValue": "shared-bucket-arn"}},
+                ]
+            },
+            rendered["Resources"]["Bucket"]["Properties"]["BucketName"],
+        )
+        self.assertEqual(
+            {"Value": {"Fn::ImportValue": "shared-bucket-arn"}},
+            rendered["Outputs"]["Imported"],
+        )
+
+    def test_no_outputs_section_without_outputs(self):
+        template = Template(description="", parameters={}, resources={})
+        self.assertNotIn("Outputs", template.template_to_cloudformation())
+
+
+class ExportIndexTests(unittest.TestCase):
+    def test_resolve(self):
+        index = ExportIndex(
+            {
+                "producer": _exporting_template("arn"),
+                "consumer": _importing_template("arn"),
+            }
+        )
+        self.assertEqual(
+            ExportLocation("producer", "BucketArn"), index.resolve(ImportValue("arn"))
+        )
+        index.validate()
+
+    def test_duplicates_and_dangling_imports(self):
+        index = ExportIndex(
+            {
+                "a": _exporting_template("arn"),
+                "b": _exporting_template("arn"),
+                "consumer": _importing_template("missing"),
+            }
+        )
+        with self.assertRaises(ExportErrors) as ctx:
+            index.validate()
+        self.assertEqual(
+            [
+                (
+                    "arn",
+                    [
+                        ExportLocation("a", "BucketArn"),
+                        ExportLocation("b", "BucketArn"),
+                    ],
+                )
+            ],
+            [tuple(duplicate) for duplicate in ctx.exception.duplicates],
+        )
+        self.assertEqual(
+            [
+                ("consumer", "Resources", "Bucket", "BucketName.Arn", "missing"),
+                ("consumer", "Outputs", "Imported", "Value", "missing"),
+            ],
+            [tuple(dangling) for dangling in ctx.exception.dangling],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
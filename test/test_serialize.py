@@ -0,0 +1,202 @@
+import io
+import json
+import os
+import pickle
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from nimbus_core import (
+    TEMPLATE_BODY_LIMIT,
+    ParameterString,
+    Template,
+    TemplateLoadError,
+    TemplateTooLarge,
+    canonical_json,
+    compact_dumps,
+    compact_json,
+    dump_handoff,
+    load_handoff,
+    read_rows,
+    row_resource,
+    stream_template,
+    write_compact,
+)
+from nimbus_resources.s3.bucket import Bucket, VersioningConfiguration
+from nimbus_resources.sqs.queue import Queue
+
+
+class CanonicalJSONTests(unittest.TestCase):
+    def test_independent_of_insertion_order(self):
+        self.assertEqual(
+            canonical_json({"b": [2, 1], "a": {"y": 1, "x": 2}}),
+            canonical_json({"a": {"x": 2, "y": 1}, "b": [2, 1]}),
+        )
+
+    def test_normalization(self):
+        self.assertEqual(
+            b'{"a":[1,0,1.5,"\xc3\xa9"],'
+            b'"t":["2020-01-02T01:04:05Z","2020-01-02T03:04:05.25Z"]}',
+            canonical_json(
+                {
+                    "t": [
+                        datetime(
+                            2020, 1, 2, 3, 4, 5, tzinfo=timezone(timedelta(hours=2))
+                        ),
+                        datetime(2020, 1, 2, 3, 4, 5, 250000),
+                    ],
+                    "a": [1.0, -0.0, 1.5, "é"],
+                }
+            ),
+        )
+
+
+class CompactJSONTests(unittest.TestCase):
+    def test_compact(self):
+        name = ParameterString()
+        template = Template(
+            description="",
+            parameters={"Name": name},
+            resources={"Empty": Bucket(), "Named": Bucket(BucketName=name)},
+        )
+        output = compact_json(template)
+        self.assertEqual(
+            b'{"AWSTemplateFormatVersion":"2010-09-09",'
+            b'"Parameters":{"Name":{"Type":"String"}},'
+            b'"Resources":{"Empty":{"Type":"AWS::S3::Bucket"},'
+            b'"Named":{"Type":"AWS::S3::Bucket",'
+            b'"Properties":{"BucketName":{"Ref":"Name"}}}}}',
+            output,
+        )
+        document = template.template_to_cloudformation()
+        del document["Description"]
+        del document["Resources"]["Empty"]["Properties"]
+        self.assertEqual(document, json.loads(output))
+
+        fp = io.BytesIO()
+        size = write_compact(template, fp)
+        self.assertEqual(len(output), size.size)
+        self.assertTrue(size.fits_template_body)
+
+    def test_budget(self):
+        template = Template(
+            description="",
+            parameters={},
+            resources={f"Bucket{i}": Bucket() for i in range(2000)},
+        )
+        fp = io.BytesIO()
+        with self.assertRaises(TemplateTooLarge) as context:
+            write_compact(template, fp, budget=TEMPLATE_BODY_LIMIT)
+        self.assertGreater(context.exception.size, TEMPLATE_BODY_LIMIT)
+        self.assertLessEqual(len(fp.getvalue()), TEMPLATE_BODY_LIMIT)
+        # Fails on the first resource that doesn't fit rather than at the end.
+        self.assertNotEqual("Bucket1999", context.exception.logical_id)
+
+
+class CompactPickleTests(unittest.TestCase):
+    def test_round_trip(self):
+        name = ParameterString(Description="Bucket name")
+        buckets = {
+            # Equal but distinct strings, as if read from a file.
+            f"Bucket{i}": Bucket(BucketName=name, AccessControl="".join("Private"))
+            for i in range(50)
+        }
+        template = Template(
+            description="Pickled", parameters={"Name": name}, resources=buckets
+        )
+        data = compact_dumps(template)
+        self.assertLess(len(data), len(pickle.dumps(template)))
+        loaded = pickle.loads(data)
+        self.assertEqual(
+            template.template_to_cloudformation(), loaded.template_to_cloudformation()
+        )
+        # Parameters are looked up by identity, so it must survive.
+        parameter = loaded.parameters["Name"]
+        self.assertIs(parameter, loaded.resources["Bucket7"].BucketName)
+
+
+class HandoffTests(unittest.TestCase):
+    def test_round_trip(self):
+        name = ParameterString()
+        template = Template(
+            description="Handed off",
+            parameters={"Name": name},
+            resources={f"Bucket{i}": Bucket(BucketName=name) for i in range(50)},
+        )
+        document = template.template_to_cloudformation()
+        for value in [template, document]:
+            with self.subTest(type(value).__name__):
+                fp = io.BytesIO()
+                dump_handoff(value, fp)
+                self.assertLess(len(fp.getvalue()), len(compact_json(template)))
+                fp.seek(0)
+                self.assertEqual(document, load_handoff(fp))
+
+    def test_rejects_other_files(self):
+        with self.assertRaises(ValueError):
+            load_handoff(io.BytesIO(b'{"Resources": {}}'))
+
+
+class StreamTemplateTests(unittest.TestCase):
+    def test_stream_rows(self):
+        name = ParameterString(Default="logs")
+        template = Template(
+            description="Streamed", parameters={"Name": name}, resources={}
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            rows = os.path.join(directory, "buckets.csv")
+            with open(rows, "w") as f:
+                f.write("LogicalId,BucketName\nFirst,first\nSecond,\n")
+            output = os.path.join(directory, "template.json")
+
+            def to_resource(row):
+                logical_id, bucket = row_resource(Bucket)(row)
+                if bucket.BucketName is None:
+                    bucket = bucket._replace(BucketName=name)
+                return logical_id, bucket
+
+            size = stream_template(template, read_rows(rows), to_resource, output)
+            with open(output, "rb") as f:
+                data = f.read()
+        self.assertEqual(len(data), size.size)
+        self.assertEqual(
+            {
+                "First": {
+                    "Type": "AWS::S3::Bucket",
+                    "Properties": {"BucketName": "first"},
+                },
+                "Second": {
+                    "Type": "AWS::S3::Bucket",
+                    "Properties": {"BucketName": {"Ref": "Name"}},
+                },
+            },
+            json.loads(data)["Resources"],
+        )
+
+    def test_row_values_are_converted(self):
+        to_resource = row_resource(Queue)
+        self.assertEqual(
+            ("Queue", Queue(DelaySeconds=5, FifoQueue=True, QueueName="7")),
+            to_resource(
+                {
+                    "LogicalId": "Queue",
+                    "DelaySeconds": "5",
+                    "FifoQueue": "true",
+                    "QueueName": 7,
+                    "VisibilityTimeout": "",
+                }
+            ),
+        )
+        self.assertEqual(
+            Bucket(VersioningConfiguration=VersioningConfiguration(Status="Enabled")),
+            row_resource(Bucket)(
+                {"LogicalId": "B", "VersioningConfiguration": {"Status": "Enabled"}}
+            )[1],
+        )
+        with self.assertRaises(TemplateLoadError) as ctx:
+            to_resource({"LogicalId": "Queue", "DelaySeconds": "soon"})
+        self.assertEqual("Queue.DelaySeconds", ctx.exception.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
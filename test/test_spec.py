@@ -0,0 +1,289 @@
+import copy
+import gzip
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+
+from nimbus_codegen.__main__ import main
+from nimbus_codegen.spec import (
+    Specification,
+    SpecificationError,
+    _cache_path,
+    _load_cached,
+    _source_version,
+    _store_cached,
+    load,
+    read_specification,
+)
+
+
+def _property(**fields):
+    return dict(Documentation="", Required=False, UpdateType="Mutable", **fields)
+
+
+SPEC = {
+    "ResourceSpecificationVersion": "1.0.0",
+    "PropertyTypes": {
+        "AWS::Test::Thing.Config": {
+            "Documentation": "",
+            "Properties": {"Name": _property(PrimitiveType="String")},
+        },
+        "Tag": {
+            "Documentation": "",
+            "Properties": {
+                "Key": _property(PrimitiveType="String"),
+                "Value": _property(PrimitiveType="String"),
+            },
+        },
+    },
+    "ResourceTypes": {
+        "AWS::Test::Thing": {
+            "Documentation": "",
+            "Attributes": {"Arn": {"PrimitiveType": "String"}},
+            "Properties": {
+                "Config": _property(Type="Config"),
+                "Tags": _property(Type="List", ItemType="Tag"),
+            },
+        },
+        "AWS::Other::Thing": {
+            "Documentation": "",
+            "Properties": {"Size": _property(PrimitiveType="Integer")},
+        },
+    },
+}
+
+
+class LoadTests(unittest.TestCase):
+    def test_packaged_specification(self):
+        spec = load(cache=False)
+        self.assertIn("AWS::S3::Bucket", spec.ResourceTypes)
+        self.assertEqual(
+            json.loads(read_specification())["ResourceSpecificationVersion"],
+            spec.ResourceSpecificationVersion,
+        )
+
+    def test_plain_and_gzipped_files(self):
+        data = json.dumps(SPEC).encode()
+        with tempfile.TemporaryDirectory() as directory:
+            plain = os.path.join(directory, "spec.json")
+            with open(plain, "wb") as f:
+                f.write(data)
+            gzipped = os.path.join(directory, "spec.json.gz")
+            with open(gzipped, "wb") as f:
+                f.write(gzip.compress(data))
+
+            self.assertEqual(data, read_specification(gzipped))
+            expected = Specification.from_dict(SPEC)
+            self.assertEqual(expected, load(plain, cache=False))
+            self.assertEqual(expected, load(gzipped, cache=False))
+
+
+class NamespaceTests(unittest.TestCase):
+    def test_namespace(self):
+        spec = Specification.from_dict(SPEC)
+        self.assertEqual(
+            {"Config": spec.PropertyTypes["AWS::Test::Thing.Config"]},
+            spec.namespace("AWS::Test::Thing"),
+        )
+        self.assertEqual({}, spec.namespace("AWS::Other::Thing"))
+        self.assertEqual({}, spec.namespace("AWS::Missing::Thing"))
+
+    def test_namespace_follows_property_types(self):
+        spec = Specification.from_dict(SPEC)
+        config = spec.PropertyTypes["AWS::Test::Thing.Config"]
+        direct = Specification(
+            PropertyTypes={"AWS::Other::Thing.Config": config},
+            ResourceSpecificationVersion="1.0.0",
+            ResourceTypes=spec.ResourceTypes,
+        )
+        self.assertEqual({"Config": config}, direct.namespace("AWS::Other::Thing"))
+        replaced = spec._replace(PropertyTypes=direct.PropertyTypes)
+        self.assertEqual({}, replaced.namespace("AWS::Test::Thing"))
+        self.assertEqual({"Config": config}, replaced.namespace("AWS::Other::Thing"))
+
+
+class SelectTests(unittest.TestCase):
+    def setUp(self):
+        self.spec = Specification.from_dict(SPEC)
+
+    def test_select(self):
+        thing = self.spec.select(["AWS::Test::*"])
+        self.assertEqual(["AWS::Test::Thing"], list(thing.ResourceTypes))
+        self.assertEqual(["AWS::Test::Thing.Config", "Tag"], list(thing.PropertyTypes))
+        self.assertEqual(
+            self.spec.namespace("AWS::Test::Thing"), thing.namespace("AWS::Test::Thing")
+        )
+
+        other = self.spec.select(exclude=["AWS::Test::*"])
+        self.assertEqual(["AWS::Other::Thing"], list(other.ResourceTypes))
+        self.assertEqual(["Tag"], list(other.PropertyTypes))
+        self.assertEqual({}, other.namespace("AWS::Test::Thing"))
+
+        self.assertEqual(self.spec, self.spec.select())
+        self.assertEqual({}, self.spec.select(["*::Thing"], ["AWS::*"]).ResourceTypes)
+
+    def test_include_matching_nothing_is_an_error(self):
+        with self.assertRaisesRegex(
+            ValueError, "no resource type matches 'AWS::Tset::\\*'"
+        ):
+            self.spec.select(["AWS::Test::*", "AWS::Tset::*"])
+
+    def test_main_include_and_exclude(self):
+        spec = self.spec
+        with mock.patch("nimbus_codegen.__main__.load", return_value=spec):
+            with mock.patch("nimbus_codegen.__main__.write_resources_package") as write:
+                main(["out"])
+                main(["out", "--include", "AWS::Test::*"])
+                main(["out", "--exclude", "AWS::Test::*", "--exclude", "AWS::Other::*"])
+                with mock.patch("sys.stderr"), self.assertRaises(SystemExit):
+                    main(["out", "--include", "AWS::Tset::*"])
+        self.assertEqual(
+            [list(spec.ResourceTypes), ["AWS::Test::Thing"], []],
+            [list(call[0][0].ResourceTypes) for call in write.call_args_list],
+        )
+        self.assertEqual("out", write.call_args[0][1])
+
+
+class ParseErrorTests(unittest.TestCase):
+    def assertParseError(self, path, message, change):
+        spec = copy.deepcopy(SPEC)
+        change(spec)
+        with self.assertRaises(SpecificationError) as ctx:
+            Specification.from_dict(spec)
+        self.assertEqual((path, message), (ctx.exception.path, ctx.exception.message))
+
+    def test_property_errors(self):
+        thing = "ResourceTypes.AWS::Test::Thing"
+        cases = [
+            (
+                f"{thing}.Properties.Config",
+                "has both PrimitiveType and Type",
+                lambda properties: properties["Config"].update(PrimitiveType="Json"),
+            ),
+            (
+                f"{thing}.Properties.Tags",
+                "List needs one of ItemType and PrimitiveItemType",
+                lambda properties: properties["Tags"].pop("ItemType"),
+            ),
+            (
+                f"{thing}.Properties.Tags",
+                "has both ItemType and PrimitiveItemType",
+                lambda properties: properties["Tags"].update(PrimitiveItemType="Json"),
+            ),
+            (
+                f"{thing}.Properties.Size",
+                "unknown primitive type 'Float'",
+                lambda properties: properties.update(
+                    Size=_property(PrimitiveType="Float")
+                ),
+            ),
+            (
+                f"{thing}.Properties.Config",
+                "missing key 'UpdateType'",
+                lambda properties: properties["Config"].pop("UpdateType"),
+            ),
+            (
+                f"{thing}.Properties.Config",
+                "expected an object, got 'Config'",
+                lambda properties: properties.update(Config="Config"),
+            ),
+        ]
+        for path, message, change in cases:
+            with self.subTest(message):
+                self.assertParseError(
+                    path,
+                    message,
+                    lambda spec: change(
+                        spec["ResourceTypes"]["AWS::Test::Thing"]["Properties"]
+                    ),
+                )
+
+    def test_unexpected_shapes(self):
+        self.assertParseError(
+            "ResourceTypes.AWS::Test::Thing.Attributes.Arn",
+            "unexpected PrimitiveMap attribute",
+            lambda spec: spec["ResourceTypes"]["AWS::Test::Thing"].update(
+                Attributes={"Arn": {"Type": "Map", "PrimitiveItemType": "String"}}
+            ),
+        )
+        self.assertParseError(
+            "PropertyTypes.AWS::Test::Thing.Config",
+            "unexpected PrimitiveMap property type",
+            lambda spec: spec["PropertyTypes"].update(
+                {
+                    "AWS::Test::Thing.Config": _property(
+                        Type="Map", PrimitiveItemType="String"
+                    )
+                }
+            ),
+        )
+        self.assertParseError(
+            "", "missing key 'ResourceTypes'", lambda spec: spec.pop("ResourceTypes")
+        )
+
+
+class CacheTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patch = mock.patch.dict(os.environ, {"NIMBUS_CACHE_DIR": directory.name})
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.directory = directory.name
+        self.spec = Specification.from_dict(SPEC)
+
+    def test_load_stores_and_reads_the_cache(self):
+        data = json.dumps(SPEC).encode()
+        path = os.path.join(self.directory, "spec.json")
+        with open(path, "wb") as f:
+            f.write(data)
+        digest = hashlib.sha256(data).hexdigest()
+
+        self.assertEqual(self.spec, load(path))
+        self.assertEqual(self.spec, _load_cached(digest))
+        self.assertIsNone(_load_cached("0" * 64))
+
+    def test_invalid_caches_are_ignored(self):
+        digest = "a" * 64
+        _store_cached(digest, self.spec)
+        with open(_cache_path(digest), "rb") as f:
+            data = f.read()
+
+        def checksummed(payload):
+            return hashlib.sha256(payload).digest() + payload
+
+        version = _source_version()
+        for name, contents in [
+            ("truncated", data[: len(data) // 2]),
+            ("empty", b""),
+            ("bad checksum", b"0" * 32 + data[32:]),
+            ("corrupt", checksummed(b"not a pickle")),
+            ("missing class", checksummed(b"cnimbus_codegen.spec\nMissing\n.")),
+            ("other source", checksummed(pickle.dumps(("0", digest, self.spec)))),
+            ("other digest", checksummed(pickle.dumps((version, "b", self.spec)))),
+            ("other object", checksummed(pickle.dumps((version, digest, None)))),
+        ]:
+            with self.subTest(name):
+                with open(_cache_path(digest), "wb") as f:
+                    f.write(contents)
+                self.assertIsNone(_load_cached(digest))
+
+    def test_corrupted_bytes_are_ignored(self):
+        digest = "a" * 64
+        _store_cached(digest, self.spec)
+        with open(_cache_path(digest), "rb") as f:
+            data = f.read()
+        for i in range(len(data)):
+            corrupted = bytearray(data)
+            corrupted[i] ^= 0x40
+            with open(_cache_path(digest), "wb") as f:
+                f.write(corrupted)
+            self.assertIsNone(_load_cached(digest), f"byte {i} flipped")
+
+
+if __name__ == "__main__":
+    unittest.main()
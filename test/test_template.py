@@ -0,0 +1,354 @@
+import json
+import unittest
+
+from nimbus_core import reference
+from nimbus_core import (
+    DanglingReferences,
+    DeadCode,
+    Fn,
+    MissingParameterValue,
+    ParameterCommaDelineatedList,
+    ParameterString,
+    Prototype,
+    RenderProfiler,
+    Specializer,
+    Sub,
+    Template,
+    dangling_references,
+    dead_code,
+    eliminate_dead_code,
+    property_long_reference,
+    validate_references,
+)
+from nimbus_resources.cloudwatch.alarm import Alarm, Dimension
+from nimbus_resources.iam.managedpolicy import ManagedPolicy
+from nimbus_resources.s3.bucket import Bucket
+
+
+def _template():
+    param_bucket_name = ParameterString(Description="Bucket name parameter")
+    bucket = Bucket(BucketName=param_bucket_name)
+    return Template(
+        description="Profiled template",
+        parameters={"BucketName": param_bucket_name},
+        resources={
+            "Bucket": bucket,
+            "Policy": ManagedPolicy(
+                PolicyDocument={
+                    "Resource": Sub("${Arn}/*", Arn=bucket.GetArn()),
+                    "Action": ["s3:GetObject"],
+                }
+            ),
+        },
+    )
+
+
+class ProfileTests(unittest.TestCase):
+    def test_profiled_render_matches_plain_render(self):
+        template = _template()
+        self.assertEqual(
+            template.template_to_cloudformation(),
+            template.template_to_cloudformation(profiler=RenderProfiler()),
+        )
+
+    def test_report(self):
+        timings = []
+        reports = []
+        profiler = RenderProfiler(on_resource=timings.append, on_report=reports.append)
+        _template().template_to_cloudformation(profiler=profiler)
+
+        report = profiler.report
+        self.assertEqual([report], reports)
+        self.assertEqual(report.resources, timings)
+        self.assertEqual(
+            [("Bucket", "AWS::S3::Bucket"), ("Policy", "AWS::IAM::ManagedPolicy")],
+            [(t.logical_id, t.resource_type) for t in report.resources],
+        )
+        self.assertEqual(
+            {"AWS::S3::Bucket", "AWS::IAM::ManagedPolicy"},
+            set(report.seconds_by_type()),
+        )
+        # The bucket name, and the Sub, its ARN and the action in the policy
+        # document.
+        self.assertEqual(4, report.reference_calls["property_string_reference"])
+        self.assertEqual(1, report.reference_calls["property_json_reference"])
+        self.assertEqual(2, report.logical_id_hits)
+        self.assertEqual(1.0, report.logical_id_hit_ratio())
+        self.assertGreater(report.json_nodes, 0)
+
+    def test_counts_references_bound_at_import(self):
+        profiler = RenderProfiler(
+            on_resource=lambda timing: property_long_reference(1, None)
+        )
+        _template().template_to_cloudformation(profiler=profiler)
+        property_long_reference(1, None)
+
+        self.assertEqual(2, profiler.report.reference_calls["property_long_reference"])
+
+    def test_counting_stops_after_the_render(self):
+        def fail(timing):
+            raise RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            _template().template_to_cloudformation(RenderProfiler(on_resource=fail))
+        self.assertEqual(0, reference._active_profilers)
+
+
+class DanglingReferenceTests(unittest.TestCase):
+    def test_no_dangling_references(self):
+        self.assertEqual([], dangling_references(_template()))
+
+    def test_reports_every_dangling_reference(self):
+        missing_param = ParameterString()
+        missing_bucket = Bucket(BucketName="missing")
+        template = Template(
+            description="",
+            parameters={},
+            resources={
+                "Bucket": Bucket(BucketName=missing_param),
+                "Policy": ManagedPolicy(
+                    PolicyDocument={
+                        "Statement": [
+                            {"Resource": Sub("${A}", A=missing_bucket.GetArn())}
+                        ]
+                    }
+                ),
+            },
+        )
+        self.assertEqual(
+            [
+                ("Bucket", "BucketName", missing_param, "Resources"),
+                (
+                    "Policy",
+                    "PolicyDocument.Statement[0].Resource.A",
+                    missing_bucket,
+                    "Resources",
+                ),
+            ],
+            [tuple(reference) for reference in dangling_references(template)],
+        )
+        with self.assertRaises(DanglingReferences) as ctx:
+            validate_references(template)
+        self.assertEqual(2, len(ctx.exception.references))
+
+    def test_reports_dangling_references_by_name(self):
+        name = ParameterString()
+        template = Template(
+            description="",
+            parameters={"Name": name},
+            resources={
+                "Bucket": Bucket(
+                    BucketName=Sub("${Missing}-${Name}-${AWS::Region}-${Bucket}")
+                ),
+                "Policy": ManagedPolicy(
+                    PolicyDocument={
+                        "Resource": Fn("Ref", "Gone"),
+                        "Known": Fn("Ref", "Name"),
+                        "Bound": Sub("${Bound}", Bound="x"),
+                    }
+                ),
+            },
+        )
+        self.assertEqual(
+            [
+                ("Bucket", "BucketName", "Missing", "Resources"),
+                ("Policy", "PolicyDocument.Resource", "Gone", "Resources"),
+            ],
+            [tuple(reference) for reference in dangling_references(template)],
+        )
+        self.assertEqual(
+            "Resources.Policy.PolicyDocument.Resource references 'Gone', which is "
+            "neither a parameter nor a resource of the template",
+            str(dangling_references(template)[1]),
+        )
+
+
+class SpecializerTests(unittest.TestCase):
+    def test_render_variants(self):
+        env = ParameterString(Default="dev")
+        name = ParameterString()
+        template = Template(
+            description="",
+            parameters={"Env": env, "Name": name},
+            resources={
+                "Bucket": Bucket(BucketName=Sub("${Env}-${Name}", Env=env, Name=name))
+            },
+        )
+        specializer = Specializer(template, ["Env"])
+        variants = [
+            json.loads(document)
+            for document in specializer.render_many([{"Env": "prod"}, {}])
+        ]
+        for variant, expected in zip(variants, ["prod", "dev"]):
+            self.assertEqual({"Name": {"Type": "String"}}, variant["Parameters"])
+            self.assertEqual(
+                {
+                    "Fn::Sub": [
+                        "${Env}-${Name}",
+                        {"Env": expected, "Name": {"Ref": "Name"}},
+                    ]
+                },
+                variant["Resources"]["Bucket"]["Properties"]["BucketName"],
+            )
+        with self.assertRaises(MissingParameterValue):
+            Specializer(template, ["Name"]).render({})
+
+    def test_render_substitutes_sub_variables(self):
+        env = ParameterString()
+        template = Template(
+            description="",
+            parameters={"Env": env},
+            resources={
+                "Logs": Bucket(BucketName=Sub("${Env}-logs-${!Env}")),
+                "Data": Bucket(BucketName=Sub("${Env}-${Name}", Name=env)),
+            },
+        )
+        document = json.loads(Specializer(template, ["Env"]).render({"Env": "${x}"}))
+        self.assertEqual(
+            {"Fn::Sub": "${!x}-logs-${!Env}"},
+            document["Resources"]["Logs"]["Properties"]["BucketName"],
+        )
+        self.assertEqual(
+            {"Fn::Sub": ["${!x}-${Name}", {"Name": "${x}"}]},
+            document["Resources"]["Data"]["Properties"]["BucketName"],
+        )
+
+    def test_list_parameter_defaults_are_lists(self):
+        arns = ParameterCommaDelineatedList(Default="arn:a,arn:b")
+        listed = ParameterCommaDelineatedList(Default=["arn:c"])
+        template = Template(
+            description="",
+            parameters={"Arns": arns, "Listed": listed},
+            resources={
+                "Policy": ManagedPolicy(
+                    PolicyDocument={"Resource": arns, "Other": listed}
+                )
+            },
+        )
+        document = json.loads(Specializer(template, ["Arns", "Listed"]).render({}))
+        self.assertEqual(
+            {"Resource": ["arn:a", "arn:b"], "Other": ["arn:c"]},
+            document["Resources"]["Policy"]["Properties"]["PolicyDocument"],
+        )
+
+
+class DeadCodeTests(unittest.TestCase):
+    def test_dead_code(self):
+        template = _template()
+        bucket = template.resources["Bucket"]
+        unused = ParameterString()
+        named = ParameterString()
+        logs = Bucket(BucketName=unused)
+        template.parameters.update(Unused=unused, Named=named, Again=unused)
+        template.resources.update(
+            Logs=logs,
+            Other=Bucket(BucketName=Fn("Ref", "Named")),
+            Orphan=Bucket(BucketName=unused),
+        )
+        # Policy references Bucket, so Bucket stays even though it's prunable.
+        prunable = ["Bucket", "Logs", "Orphan"]
+        self.assertEqual(
+            DeadCode(parameters=["Unused", "Again"], resources=["Logs", "Orphan"]),
+            dead_code(template, prunable),
+        )
+        pruned = eliminate_dead_code(template, prunable)
+        self.assertEqual(["BucketName", "Named"], list(pruned.parameters))
+        self.assertEqual(["Bucket", "Policy", "Other"], list(pruned.resources))
+        self.assertIs(bucket, pruned.resources["Bucket"])
+        self.assertEqual(
+            DeadCode(parameters=["Again"], resources=[]), dead_code(template)
+        )
+
+    def test_sub_variables_are_references(self):
+        template = _template()
+        env = ParameterString()
+        shadowed = ParameterString()
+        template.parameters.update(Env=env, Shadowed=shadowed, Unused=ParameterString())
+        template.resources.update(
+            Logs=Bucket(BucketName="logs"),
+            Data=Bucket(BucketName="data"),
+            Named=Bucket(
+                BucketName=Sub("${Env}-${Logs.Arn}-${Shadowed}-${!Data}", Shadowed="x")
+            ),
+            Raw=Bucket(BucketName=Fn("Fn::Sub", ["${Data}-${Env}", {"Env": "x"}])),
+        )
+        self.assertEqual(
+            DeadCode(parameters=["Shadowed", "Unused"], resources=[]),
+            dead_code(template, ["Logs", "Data"]),
+        )
+        self.assertEqual(
+            ["Bucket", "Policy", "Logs", "Data", "Named", "Raw"],
+            list(eliminate_dead_code(template, ["Logs", "Data"]).resources),
+        )
+        self.assertEqual(
+            DeadCode(parameters=["Shadowed", "Unused"], resources=["Data"]),
+            dead_code(
+                template._replace(resources=dict(template.resources, Raw=Bucket())),
+                ["Logs", "Data"],
+            ),
+        )
+
+
+class PrototypeTests(unittest.TestCase):
+    def test_variants_share_rendered_fields(self):
+        prototype = Prototype(
+            Alarm(
+                ComparisonOperator="GreaterThanThreshold",
+                EvaluationPeriods=1,
+                Threshold=1.0,
+                MetricName="Errors",
+                Namespace="AWS/Lambda",
+                AlarmActions=["arn:aws:sns:us-east-1:123456789012:alerts"],
+                Dimensions=[Dimension(Name="FunctionName", Value="default")],
+            )
+        )
+        alarms = prototype.variants({"AlarmName": f"Alarm{i}"} for i in range(3))
+        alarms.append(prototype.variant(AlarmName="Alarm3", Dimensions=None))
+        template = Template(
+            description="",
+            parameters={},
+            resources={alarm.AlarmName: alarm for alarm in alarms},
+        )
+        document = template.template_to_cloudformation(share_rendered=True)
+        for alarm in alarms:
+            expected = alarm.resource_to_cloudformation(
+                template.resource_logical_id, template.parameter_logical_id
+            )
+            rendered = document["Resources"][alarm.AlarmName]
+            self.assertEqual(expected, rendered)
+            self.assertEqual(list(expected["Properties"]), list(rendered["Properties"]))
+        resources = document["Resources"]
+        self.assertIs(
+            resources["Alarm0"]["Properties"]["Dimensions"],
+            resources["Alarm2"]["Properties"]["Dimensions"],
+        )
+        self.assertNotIn("Dimensions", resources["Alarm3"]["Properties"])
+
+    def test_variants_do_not_share_rendered_fields_by_default(self):
+        prototype = Prototype(
+            Alarm(
+                ComparisonOperator="GreaterThanThreshold",
+                EvaluationPeriods=1,
+                Dimensions=[Dimension(Name="FunctionName", Value="default")],
+            )
+        )
+        template = Template(
+            description="",
+            parameters={},
+            resources={
+                alarm.AlarmName: alarm
+                for alarm in prototype.variants(
+                    {"AlarmName": f"Alarm{i}"} for i in range(2)
+                )
+            },
+        )
+        resources = template.template_to_cloudformation()["Resources"]
+        resources["Alarm0"]["Properties"]["Dimensions"][0]["Value"] = "changed"
+        self.assertEqual(
+            [{"Name": "FunctionName", "Value": "default"}],
+            resources["Alarm1"]["Properties"]["Dimensions"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()